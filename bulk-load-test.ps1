@@ -0,0 +1,46 @@
+# Bulk Ingestion Benchmark - single-log path vs /api/logs/bulk
+Write-Host "Bulk Ingestion Benchmark" -ForegroundColor Cyan
+
+$total = 5000
+$batchSize = 1000
+$singleCount = 200
+
+$services = @("auth-service", "payment-service", "api-gateway", "order-service", "notification-service")
+$levels = @("info", "warn", "error", "debug")
+
+# Single-log path (sampled, then extrapolated to logs/sec)
+$start = Get-Date
+for ($i = 1; $i -le $singleCount; $i++) {
+    $body = @{
+        level = $levels | Get-Random
+        message = "Single ingest benchmark - Request #$i"
+        service = $services | Get-Random
+    } | ConvertTo-Json
+    Invoke-RestMethod -Uri http://localhost:3001/api/logs -Method Post -ContentType "application/json" -Body $body | Out-Null
+}
+$singleSeconds = ((Get-Date) - $start).TotalSeconds
+$singleRate = $singleCount / $singleSeconds
+
+# Bulk path, NDJSON bodies
+$start = Get-Date
+$accepted = 0
+for ($offset = 0; $offset -lt $total; $offset += $batchSize) {
+    $lines = for ($i = $offset + 1; $i -le [math]::Min($offset + $batchSize, $total); $i++) {
+        @{
+            level = $levels | Get-Random
+            message = "Bulk ingest benchmark - Request #$i"
+            service = $services | Get-Random
+        } | ConvertTo-Json -Compress
+    }
+    $result = Invoke-RestMethod -Uri http://localhost:3001/api/logs/bulk -Method Post -ContentType "application/x-ndjson" -Body ($lines -join "`n")
+    $accepted += $result.accepted
+    Write-Progress -Activity "Bulk ingest" -Status "$accepted/$total" -PercentComplete (($accepted / $total) * 100)
+}
+$bulkSeconds = ((Get-Date) - $start).TotalSeconds
+$bulkRate = $accepted / $bulkSeconds
+
+Write-Host ""
+Write-Host "Benchmark Results:" -ForegroundColor Green
+Write-Host "   Single-log path: $([math]::Round($singleRate, 1)) logs/sec ($singleCount logs)" -ForegroundColor White
+Write-Host "   Bulk path:       $([math]::Round($bulkRate, 1)) logs/sec ($accepted logs, batches of $batchSize)" -ForegroundColor White
+Write-Host "   Speedup:         $([math]::Round($bulkRate / $singleRate, 1))x" -ForegroundColor White
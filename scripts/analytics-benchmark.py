@@ -0,0 +1,183 @@
+"""
+Benchmark: Python-loop analytics vs server-side aggregation pipelines.
+
+Seeds a scratch database with N synthetic logs spread over 7 days and times
+the original `list(find()) + Counter` summary/trends against the analyzer's
+$match/$group/$facet pipelines.
+
+    # against a local mongod (recommended for 10M+)
+    python scripts/analytics-benchmark.py --sizes 1000000 10000000 50000000
+
+    # check the pipelines agree with the loop without a server
+    python scripts/analytics-benchmark.py --mock --sizes 5000
+
+mongomock evaluates pipelines in Python, so --mock runs only verify results;
+use a real mongod for timings. No run against a real mongod has been recorded
+yet, so the 1M/10M/50M comparison is still unmeasured.
+
+The Python loop materializes every document, so above --python-limit it is
+skipped rather than exhausting memory.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+SERVICES = ["auth-service", "payment-service", "api-gateway", "order-service", "notification-service"]
+LEVELS = ["info"] * 6 + ["warn"] * 2 + ["debug", "error"]
+MESSAGES = ["Request processed successfully", "High latency detected", "Connection failed", "Cache miss"]
+
+
+def seed(collection, size, chunk=20000):
+    """Fill the collection with `size` logs (reuses an existing seed of the right size)"""
+    existing = collection.estimated_document_count()
+    if existing == size:
+        print(f"   reusing {size:,} seeded logs")
+        return
+    collection.drop()
+    now = datetime.utcnow()
+    span = 7 * 24 * 3600
+    started = time.perf_counter()
+    for offset in range(0, size, chunk):
+        collection.insert_many([
+            {
+                "level": random.choice(LEVELS),
+                "message": f"{random.choice(MESSAGES)} - Request #{offset + i}",
+                "service": random.choice(SERVICES),
+                "timestamp": (now - timedelta(seconds=random.randint(0, span))).isoformat(),
+                "metadata": {"requestId": f"req-{random.randint(1000, 9999)}"},
+            }
+            for i in range(min(chunk, size - offset))
+        ], ordered=False)
+    collection.create_index("timestamp")
+    print(f"   seeded {size:,} logs in {time.perf_counter() - started:.1f}s")
+
+
+def python_summary(collection, start_time):
+    """The analyzer's original implementation"""
+    logs = list(collection.find({"timestamp": {"$gte": start_time.isoformat()}}))
+    levels = Counter([log.get('level', 'info') for log in logs])
+    services = Counter([log.get('service', 'unknown') for log in logs])
+    top_errors = [
+        {"message": log['message'][:100], "service": log.get('service')}
+        for log in logs if log.get('level') in ['error', 'fatal']
+    ][:5]
+    return len(logs), levels, services.most_common(10), top_errors
+
+
+def python_trends(collection, start_time):
+    hourly_data = {}
+    for log in collection.find({"timestamp": {"$gte": start_time.isoformat()}}).sort("timestamp", 1):
+        hour = log['timestamp'][:13]
+        if hour not in hourly_data:
+            hourly_data[hour] = {"total": 0, "errors": 0}
+        hourly_data[hour]["total"] += 1
+        if log.get('level') in ['error', 'fatal']:
+            hourly_data[hour]["errors"] += 1
+    return hourly_data
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+class MockAsyncCollection:
+    """Just enough of the async driver API over a mongomock collection for the analyzer's pipelines"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def aggregate(self, pipeline):
+        docs = list(self.collection.aggregate(pipeline))
+
+        class Cursor:
+            async def to_list(self, length=None):
+                return docs if length is None else docs[:length]
+        return Cursor()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analytics aggregation benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000_000, 10_000_000, 50_000_000])
+    parser.add_argument('--hours', type=int, default=168)
+    parser.add_argument('--mongo-uri', default=os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    parser.add_argument('--mock', action='store_true', help="use mongomock instead of a real server")
+    parser.add_argument('--python-limit', type=int, default=10_000_000,
+                        help="skip the Python loop above this many logs")
+    args = parser.parse_args()
+
+    if args.mock:
+        import mongomock
+        from mongomock import aggregate as mock_aggregate
+        # mongomock only implements the older $substr alias of $substrBytes
+        handle_string = mock_aggregate._Parser._handle_string_operator
+        mock_aggregate._Parser._handle_string_operator = lambda self, op, values: handle_string(
+            self, '$substr' if op == '$substrBytes' else op, values)
+        client = mongomock.MongoClient()
+    else:
+        from pymongo import AsyncMongoClient, MongoClient
+        client = MongoClient(args.mongo_uri)
+
+    # Reuse the analyzer's pipelines against the scratch collection
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services" / "log-analyzer"))
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services" / "common"))
+    os.environ.setdefault('REDIS_URL', 'redis://localhost:6379')
+    os.environ['MONGO_URI'] = args.mongo_uri
+    import analyzer
+
+    collection = client.logvizpro_benchmark.logs
+    # The analyzer's pipelines run on the async driver; one loop for every call
+    loop = asyncio.new_event_loop()
+    if args.mock:
+        analyzer.logs_collection = MockAsyncCollection(collection)
+    else:
+        analyzer.logs_collection = AsyncMongoClient(args.mongo_uri).logvizpro_benchmark.logs
+
+    def run(coroutine_fn):
+        return lambda *a: loop.run_until_complete(coroutine_fn(*a))
+    start_time = datetime.utcnow() - timedelta(hours=args.hours)
+
+    print(f"Analytics benchmark ({args.hours}h window)")
+    rows = []
+    for size in args.sizes:
+        print(f"\n{size:,} logs")
+        seed(collection, size)
+
+        agg_summary, (levels, _, _) = timed(run(analyzer.aggregate_summary), start_time)
+        agg_trends, _ = timed(run(analyzer.aggregate_hourly), start_time)
+
+        if size <= args.python_limit:
+            py_summary, (total, py_levels, _, _) = timed(python_summary, collection, start_time)
+            py_trends, _ = timed(python_trends, collection, start_time)
+            assert total == sum(levels.values()) and py_levels == levels, "results differ"
+        else:
+            py_summary = py_trends = None
+
+        rows.append((size, py_summary, agg_summary, py_trends, agg_trends))
+
+    def fmt(seconds):
+        return "skipped" if seconds is None else f"{seconds * 1000:,.0f} ms"
+
+    def speedup(before, after):
+        return "-" if before is None else f"{before / after:,.1f}x"
+
+    print("\n" + "=" * 96)
+    print(f"{'logs':>12} | {'summary loop':>14} {'summary agg':>12} {'speedup':>8} | "
+          f"{'trends loop':>14} {'trends agg':>12} {'speedup':>8}")
+    print("-" * 96)
+    for size, py_s, agg_s, py_t, agg_t in rows:
+        print(f"{size:>12,} | {fmt(py_s):>14} {fmt(agg_s):>12} {speedup(py_s, agg_s):>8} | "
+              f"{fmt(py_t):>14} {fmt(agg_t):>12} {speedup(py_t, agg_t):>8}")
+    print("=" * 96)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Benchmark: log-analyzer latency under concurrent requests.
+
+Starts the analyzer from one or two source trees, sends a mixed load of
+summary/trends/templates requests from many concurrent clients, and probes
+/health the whole time. Each request uses a different `hours` window, so most
+of them miss the response cache and reach MongoDB. /health latency shows
+whether slow queries hold up unrelated requests: with blocking handlers they
+queue behind the threadpool, with async handlers they don't.
+
+Compare the blocking analyzer with the current async one:
+
+    git worktree add /tmp/analyzer-before <commit before the async analyzer>
+    MONGO_URI=mongodb://localhost:27017 REDIS_URL=redis://localhost:6379 \
+        python scripts/analyzer-concurrency-benchmark.py \
+            --before /tmp/analyzer-before/services/log-analyzer --concurrency 16 64 256
+
+The analyzer reads the `logvizpro` database, so load it with logs first
+(load-test.ps1, the collector scaling benchmark, or a snapshot). Use --raw to
+skip the rollups so every request aggregates raw logs.
+
+No before/after run against a real MongoDB has been recorded yet, so the
+claim that the async handlers keep /health latency flat is unmeasured.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+ANALYZER_DIR = Path(__file__).resolve().parent.parent / "services" / "log-analyzer"
+ENDPOINTS = ["/api/analytics/summary", "/api/analytics/trends", "/api/analytics/templates"]
+
+
+def start_analyzer(service_dir, port, raw):
+    env = dict(os.environ, PORT=str(port))
+    if raw:
+        env["ANALYTICS_USE_ROLLUPS"] = "false"
+    process = subprocess.Popen(
+        [sys.executable, "analyzer.py"],
+        cwd=service_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            if requests.get(f"{url}/health", timeout=1).ok:
+                return process, url
+        except requests.RequestException:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"analyzer in {service_dir} did not start")
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def run_load(url, concurrency, requests_per_client):
+    """Fire the mixed load; returns (request latencies, errors, /health latencies, seconds)"""
+    latencies, errors, health = [], 0, []
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def client(_):
+        nonlocal errors
+        session = requests.Session()
+        for _ in range(requests_per_client):
+            path = random.choice(ENDPOINTS)
+            started = time.perf_counter()
+            try:
+                ok = session.get(f"{url}{path}", params={"hours": random.randint(1, 168)}, timeout=120).ok
+            except requests.RequestException:
+                ok = False
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                errors += 0 if ok else 1
+
+    def probe():
+        session = requests.Session()
+        while not done.is_set():
+            started = time.perf_counter()
+            try:
+                session.get(f"{url}/health", timeout=120)
+            except requests.RequestException:
+                pass
+            health.append(time.perf_counter() - started)
+            time.sleep(0.05)
+
+    prober = threading.Thread(target=probe, daemon=True)
+    started = time.perf_counter()
+    prober.start()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    prober.join()
+    return latencies, errors, health, elapsed
+
+
+def bench(label, service_dir, args):
+    process, url = start_analyzer(service_dir, args.port, args.raw)
+    rows = []
+    try:
+        for concurrency in args.concurrency:
+            latencies, errors, health, elapsed = run_load(url, concurrency, args.requests)
+            rows.append({
+                "label": label,
+                "concurrency": concurrency,
+                "rps": len(latencies) / elapsed,
+                "p50": statistics.median(latencies),
+                "p99": percentile(latencies, 0.99),
+                "health_p99": percentile(health, 0.99),
+                "errors": errors,
+            })
+            print(f"   {label:>7} x{concurrency:<4} {rows[-1]['rps']:>8.1f} req/s")
+    finally:
+        process.terminate()
+        try:
+            process.wait(20)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyzer concurrent request latency benchmark")
+    parser.add_argument('--before', help="log-analyzer directory of the version to compare against")
+    parser.add_argument('--after', default=str(ANALYZER_DIR))
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[16, 64, 256])
+    parser.add_argument('--requests', type=int, default=20, help="requests per client")
+    parser.add_argument('--raw', action='store_true', help="aggregate raw logs instead of rollups")
+    parser.add_argument('--port', type=int, default=8100)
+    args = parser.parse_args()
+
+    for name in ('MONGO_URI', 'REDIS_URL'):
+        if not os.getenv(name):
+            parser.error(f"{name} must point at a running server")
+
+    print(f"Analyzer concurrency benchmark: {args.requests} requests per client, raw={args.raw}")
+    rows = []
+    if args.before:
+        rows += bench("before", args.before, args)
+    rows += bench("after", args.after, args)
+
+    print("\n" + "=" * 80)
+    print(f"{'version':>8} {'clients':>8} | {'req/s':>8} {'p50':>9} {'p99':>9} | {'/health p99':>12} | {'errors':>6}")
+    print("-" * 80)
+    for row in rows:
+        print(f"{row['label']:>8} {row['concurrency']:>8} | {row['rps']:>8.1f} "
+              f"{row['p50'] * 1000:>7.1f}ms {row['p99'] * 1000:>7.1f}ms | "
+              f"{row['health_p99'] * 1000:>10.1f}ms | {row['errors']:>6}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Microbenchmark: cost of authenticating a request in the log-collector.
+
+Compares the original `token_required` work (decode the JWT, then
+find_one the user) with the collector's Authenticator: a cache hit, a miss
+on a token with embedded claims whose user version is cached, and a fully
+cold miss that reads the user's version.
+
+    MONGO_URI=mongodb://localhost:27017 python scripts/auth-benchmark.py
+
+    # no server: mongomock makes the lookup look far cheaper than a real round trip
+    python scripts/auth-benchmark.py --mock
+"""
+
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import jwt
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services" / "log-collector"))
+
+from auth import Authenticator  # noqa: E402
+
+SECRET = "benchmark-secret"
+
+
+def legacy_verify(users, token):
+    data = jwt.decode(token, SECRET, algorithms=["HS256"])
+    return users.find_one({'email': data['email']})
+
+
+def measure(fn, iterations):
+    """Per-call latencies in microseconds"""
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1e6)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Authenticated request overhead microbenchmark")
+    parser.add_argument('--iterations', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--mongo-uri', default=os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    parser.add_argument('--mock', action='store_true', help="use mongomock instead of a real server")
+    args = parser.parse_args()
+
+    if args.mock:
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        from pymongo import MongoClient
+        client = MongoClient(args.mongo_uri)
+    users = client.logvizpro_benchmark.users
+    users.drop()
+    users.insert_many([
+        {"name": f"User {i}", "email": f"user{i}@example.com", "role": "user", "password": b"x" * 60}
+        for i in range(args.users)
+    ])
+    users.create_index("email")
+
+    auth = Authenticator(users, SECRET, ttl=300)
+    exp = datetime.utcnow() + timedelta(days=1)
+    legacy_tokens = [jwt.encode({"email": f"user{i}@example.com", "exp": exp}, SECRET, algorithm="HS256")
+                     for i in range(args.users)]
+    claim_tokens = [auth.issue(users.find_one({"email": f"user{i}@example.com"})) for i in range(args.users)]
+
+    n = args.iterations
+    rows = []
+
+    i = itertools.count()
+    rows.append(("decode + find_one (before)",
+                 measure(lambda: legacy_verify(users, legacy_tokens[next(i) % args.users]), n)))
+
+    auth.drop_users([f"user{k}@example.com" for k in range(args.users)])
+    i = itertools.count()
+    rows.append(("cold miss: decode + version read",
+                 measure(lambda: auth.verify(claim_tokens[next(i) % args.users]), min(n, args.users))))
+
+    # Versions now cached; forget the tokens only
+    auth._tokens.clear()
+    i = itertools.count()
+    rows.append(("miss with cached version: decode only",
+                 measure(lambda: auth.verify(claim_tokens[next(i) % args.users]), min(n, args.users))))
+
+    i = itertools.count()
+    rows.append(("cache hit", measure(lambda: auth.verify(claim_tokens[next(i) % args.users]), n)))
+
+    print(f"Auth overhead per request ({'mongomock' if args.mock else args.mongo_uri}, {args.users} users)")
+    print("=" * 72)
+    print(f"{'path':<40} | {'p50':>9} {'p99':>9} {'mean':>9}")
+    print("-" * 72)
+    for name, samples in rows:
+        samples.sort()
+        print(f"{name:<40} | {statistics.median(samples):>7.1f}µs "
+              f"{samples[int(len(samples) * 0.99) - 1]:>7.1f}µs {statistics.fmean(samples):>7.1f}µs")
+    print("=" * 72)
+    print(f"Mongo lookups by the cache: {auth.stats['userLookups']} for {sum(len(s) for _, s in rows[1:]):,} verifications")
+
+    client.drop_database("logvizpro_benchmark")
+
+
+if __name__ == "__main__":
+    main()
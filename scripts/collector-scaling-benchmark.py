@@ -0,0 +1,170 @@
+"""
+Benchmark: log-collector ingest throughput vs. number of worker processes.
+
+For each worker count, starts the collector in production mode
+(COLLECTOR_WORKERS=N python app.py) on a scratch port, hammers it from
+several client processes for a fixed time and reports accepted logs/sec and
+request latency. Needs MongoDB and Redis:
+
+    MONGO_URI=mongodb://localhost:27017 REDIS_URL=redis://localhost:6379 \
+        python scripts/collector-scaling-benchmark.py --workers 1 2 4 8
+
+    # single-log POSTs instead of bulk batches
+    python scripts/collector-scaling-benchmark.py --batch 1 --clients 64
+
+With more than one worker the run uses SOCKETIO_MESSAGE_QUEUE=$REDIS_URL, the
+same clustered mode as production, so relay and message queue costs are
+included. Client processes are separate so the load generator isn't capped
+by one core either; keep --clients well above the worker count.
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import requests
+
+COLLECTOR_DIR = Path(__file__).resolve().parent.parent / "services" / "log-collector"
+SERVICES = ["auth-service", "payment-service", "api-gateway", "order-service", "notification-service"]
+LEVELS = ["info"] * 6 + ["warn"] * 2 + ["debug", "error"]
+
+
+def make_batch(size):
+    return [
+        {
+            "level": random.choice(LEVELS),
+            "message": f"Request processed - #{random.randint(0, 10**6)}",
+            "service": random.choice(SERVICES),
+            "metadata": {"requestId": f"req-{random.randint(1000, 9999)}"},
+        }
+        for _ in range(size)
+    ]
+
+
+def client(args):
+    """One load-generating process: POST until the deadline, return (logs, latencies)"""
+    url, batch, deadline = args
+    session = requests.Session()
+    accepted, latencies, throttled = 0, [], 0
+    payloads = [make_batch(batch) for _ in range(20)]
+    i = 0
+    while time.time() < deadline:
+        payload = payloads[i % len(payloads)]
+        i += 1
+        started = time.perf_counter()
+        if batch == 1:
+            response = session.post(f"{url}/api/logs", json=payload[0])
+        else:
+            response = session.post(f"{url}/api/logs/bulk", json=payload)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code == 202:
+            accepted += batch if batch == 1 else response.json().get("accepted", 0)
+        elif response.status_code == 429:
+            throttled += 1
+            time.sleep(float(response.headers.get("Retry-After", 1)))
+    return accepted, latencies, throttled
+
+
+def start_collector(workers, port, spill_dir):
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        COLLECTOR_WORKERS=str(workers),
+        WRITE_BUFFER_SPILL_PATH=str(Path(spill_dir) / "ingest-spill.jsonl"),
+    )
+    env.pop("FLASK_ENV", None)
+    env.pop("COLLECTOR_WORKER", None)
+    if workers > 1:
+        env["SOCKETIO_MESSAGE_QUEUE"] = env["REDIS_URL"]
+    else:
+        env.pop("SOCKETIO_MESSAGE_QUEUE", None)
+    process = subprocess.Popen(
+        [sys.executable, "app.py"],
+        cwd=COLLECTOR_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            if requests.get(f"{url}/health", timeout=1).ok:
+                return process, url
+        except requests.RequestException:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"collector with {workers} workers did not start")
+
+
+def run(workers, args):
+    spill_dir = tempfile.mkdtemp(prefix="collector-bench-")
+    process, url = start_collector(workers, args.port, spill_dir)
+    try:
+        # Warm up connections and the write-behind workers
+        client((url, args.batch, time.time() + 1))
+        deadline = time.time() + args.duration
+        with multiprocessing.Pool(args.clients) as pool:
+            results = pool.map(client, [(url, args.batch, deadline)] * args.clients)
+    finally:
+        process.terminate()
+        try:
+            process.wait(20)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+    accepted = sum(r[0] for r in results)
+    latencies = sorted(l for r in results for l in r[1])
+    throttled = sum(r[2] for r in results)
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0
+    return {
+        "workers": workers,
+        "logsPerSec": accepted / args.duration,
+        "requests": len(latencies),
+        "p50": statistics.median(latencies) if latencies else 0,
+        "p99": p99,
+        "throttled": throttled,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collector multi-worker ingest benchmark")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=32, help="load-generating processes")
+    parser.add_argument('--batch', type=int, default=100, help="logs per request (1 = POST /api/logs)")
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--port', type=int, default=3101)
+    args = parser.parse_args()
+
+    for name in ('MONGO_URI', 'REDIS_URL'):
+        if not os.getenv(name):
+            parser.error(f"{name} must point at a running server")
+
+    print(f"Collector scaling benchmark: {args.clients} clients, batch={args.batch}, {args.duration:.0f}s each")
+    rows = []
+    for workers in args.workers:
+        print(f"\n{workers} worker(s)...")
+        rows.append(run(workers, args))
+        print(f"   {rows[-1]['logsPerSec']:,.0f} logs/s")
+
+    base = rows[0]["logsPerSec"] or 1
+    print("\n" + "=" * 78)
+    print(f"{'workers':>8} | {'logs/s':>12} {'speedup':>8} | {'requests':>9} {'p50':>9} {'p99':>9} | {'429s':>6}")
+    print("-" * 78)
+    for row in rows:
+        print(f"{row['workers']:>8} | {row['logsPerSec']:>12,.0f} {row['logsPerSec'] / base:>7.2f}x | "
+              f"{row['requests']:>9,} {row['p50'] * 1000:>7.1f}ms {row['p99'] * 1000:>7.1f}ms | "
+              f"{row['throttled']:>6}")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
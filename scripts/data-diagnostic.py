@@ -27,9 +27,10 @@ def diagnose():
     
     # Check recent logs (last 24 hours)
     day_ago = datetime.utcnow() - timedelta(hours=24)
-    recent_logs = list(logs_collection.find({
-        "timestamp": {"$gte": day_ago.isoformat()}
-    }).limit(1000))
+    recent_logs = list(logs_collection.find({"$or": [
+        {"timestamp": {"$gte": day_ago}},
+        {"timestamp": {"$gte": day_ago.isoformat()}}
+    ]}).limit(1000))
     
     print(f"📅 Logs from last 24 hours: {len(recent_logs)}")
     
@@ -46,9 +47,11 @@ def diagnose():
     for log in recent_logs:
         try:
             ts_str = log.get('timestamp', '')
-            if isinstance(ts_str, str):
+            if isinstance(ts_str, datetime):
+                timestamps.append(ts_str)
+            elif isinstance(ts_str, str):
                 ts_str = ts_str.replace('Z', '+00:00')
-                timestamp = datetime.fromisoformat(ts_str)
+                timestamp = datetime.fromisoformat(ts_str).replace(tzinfo=None)
                 timestamps.append(timestamp)
         except Exception as e:
             invalid_count += 1
@@ -80,9 +83,11 @@ def diagnose():
     for i, log in enumerate(recent_logs):
         try:
             ts_str = log.get('timestamp', '')
-            if isinstance(ts_str, str):
+            if isinstance(ts_str, datetime):
+                timestamp = ts_str
+            elif isinstance(ts_str, str):
                 ts_str = ts_str.replace('Z', '+00:00')
-                timestamp = datetime.fromisoformat(ts_str)
+                timestamp = datetime.fromisoformat(ts_str).replace(tzinfo=None)
             else:
                 continue
             
@@ -0,0 +1,149 @@
+"""
+Benchmark: vectorized FeatureAccumulator vs the original per-log loop.
+
+The original implementation (kept here as the baseline) rescans every log for every 5-minute bucket and
+re-parses timestamps in the inner loop (O(buckets x logs)), so it is timed on
+a subsample and extrapolated; the two are checked for identical features on
+that subsample.
+
+    python scripts/feature-extraction-benchmark.py --logs 1000000 --hours 168
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+IST = ZoneInfo("Asia/Kolkata")
+SERVICE_DIR = Path(__file__).resolve().parent.parent / "services" / "ml-analyzer"
+SERVICES = ["auth-service", "payment-service", "api-gateway", "order-service", "notification-service"]
+LEVELS = ["info"] * 6 + ["warn"] * 2 + ["debug", "error"]
+
+
+def generate_logs(count, hours):
+    now = datetime.now(timezone.utc)
+    span = hours * 3600
+    logs = []
+    for i in range(count):
+        log = {
+            "level": random.choice(LEVELS),
+            "message": f"Benchmark log {i}",
+            "service": random.choice(SERVICES),
+            "timestamp": (now - timedelta(seconds=random.randint(0, span))).isoformat(),
+        }
+        if i % 3 == 0:
+            log["userId"] = f"user-{random.randint(1, 500)}"
+            log["responseTime"] = random.randint(5, 3000)
+            log["statusCode"] = random.choice([200, 200, 200, 201, 404, 500, 503])
+        logs.append(log)
+    return logs
+
+
+def legacy_bucket_time(timestamp):
+    """The original per-log bucket key: parse, convert to IST, floor to 5 minutes"""
+    try:
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        timestamp_ist = timestamp.astimezone(IST)
+        bucket = timestamp_ist.replace(minute=(timestamp_ist.minute // 5) * 5, second=0, microsecond=0)
+        return bucket.isoformat()
+    except Exception:
+        return None
+
+
+def legacy_extract(logs):
+    """The original bucket loop + per-bucket rescan"""
+    time_buckets = defaultdict(lambda: {"total": 0, "errors": 0, "warns": 0})
+    for log in logs:
+        bucket_key = legacy_bucket_time(log['timestamp'])
+        if bucket_key:
+            time_buckets[bucket_key]["total"] += 1
+            if log.get('level') == 'error':
+                time_buckets[bucket_key]["errors"] += 1
+            elif log.get('level') == 'warn':
+                time_buckets[bucket_key]["warns"] += 1
+
+    features, timestamps = [], []
+    for bucket_time, counts in sorted(time_buckets.items()):
+        bucket_logs = [log for log in logs if legacy_bucket_time(log['timestamp']) == bucket_time]
+        total = counts["total"]
+        response_times = [log.get('responseTime', 0) for log in bucket_logs if log.get('responseTime')]
+        features.append([
+            total,
+            counts["errors"],
+            counts["warns"],
+            (counts["errors"] / total * 100) if total > 0 else 0,
+            (counts["warns"] / total * 100) if total > 0 else 0,
+            len(set(log.get('service', 'unknown') for log in bucket_logs)),
+            len(set(log.get('userId', 'unknown') for log in bucket_logs)),
+            np.mean(response_times) if response_times else 0,
+            sum(1 for log in bucket_logs if str(log.get('statusCode', '')).startswith('5')),
+            sum(1 for log in bucket_logs if str(log.get('statusCode', '')).startswith('4')),
+            total / 5.0,
+        ])
+        timestamps.append(bucket_time)
+    return np.array(features), timestamps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Feature extraction benchmark")
+    parser.add_argument('--logs', type=int, default=1_000_000)
+    parser.add_argument('--hours', type=int, default=168)
+    parser.add_argument('--legacy-sample', type=int, default=20_000,
+                        help="logs to time the original O(buckets x logs) loop on")
+    args = parser.parse_args()
+
+    # detector.py keeps its model directory relative to the working directory
+    os.chdir(SERVICE_DIR)
+    sys.path.insert(0, str(SERVICE_DIR))
+    sys.path.insert(0, str(SERVICE_DIR.parent / "common"))
+    from detector import FeatureAccumulator, detector
+
+    def extract(logs):
+        accumulator = FeatureAccumulator()
+        accumulator.add(logs)
+        return accumulator.features(detector.feature_names)
+
+    random.seed(42)
+    print(f"Generating {args.logs:,} logs over {args.hours}h...")
+    logs = generate_logs(args.logs, args.hours)
+    sample = logs[:min(args.legacy_sample, len(logs))]
+
+    started = time.perf_counter()
+    features, timestamps = extract(logs)
+    vectorized = time.perf_counter() - started
+
+    started = time.perf_counter()
+    legacy_features, legacy_timestamps = legacy_extract(sample)
+    legacy_sample_time = time.perf_counter() - started
+
+    sample_features, sample_timestamps = extract(sample)
+    assert sample_timestamps == legacy_timestamps, "bucket keys differ"
+    assert np.allclose(sample_features, legacy_features), "features differ"
+
+    # Legacy cost grows with buckets x logs; buckets are capped by the window
+    buckets = len(timestamps)
+    scale = (len(logs) / len(sample)) * (buckets / max(len(legacy_timestamps), 1))
+    legacy_estimate = legacy_sample_time * scale
+
+    print("\n" + "=" * 60)
+    print(f"Logs: {len(logs):,}   Buckets: {buckets:,}")
+    print(f"Vectorized:        {vectorized:8.2f} s  ({len(logs) / vectorized:,.0f} logs/s)")
+    print(f"Original (sample): {legacy_sample_time:8.2f} s  on {len(sample):,} logs")
+    print(f"Original (est.):   {legacy_estimate:8.0f} s  on {len(logs):,} logs")
+    print(f"Speedup (est.):    {legacy_estimate / vectorized:8.0f}x")
+    print("Features identical on the sample: yes")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmark: historical analytics over the Parquet log archive.
+
+Writes a synthetic archive (--days x --services partitions, --per-day logs
+per day) in the collector's layout, then times the analyzer's columnar
+engine on typical history queries. For comparison it also runs the 30-day
+error rate by service the way the analyzer aggregates documents: one Python
+dict per log, folded in a loop.
+
+    python scripts/history-query-benchmark.py --days 30 --per-day 1000000
+
+    # reuse an archive written by an earlier run or by the collector
+    python scripts/history-query-benchmark.py --path /tmp/history-archive --keep
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services" / "log-analyzer"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services" / "common"))
+
+from logviz_common.archive import SCHEMA, COMPRESSION, ArchiveReader, partition_dir  # noqa: E402
+from history import HistoryEngine, HistoryQuery  # noqa: E402
+
+LEVELS = np.array(["info"] * 6 + ["warn"] * 2 + ["debug", "error"])
+MESSAGES = np.array([f"Request processed - template {i}" for i in range(50)])
+
+
+def write_archive(root, start, days, services, per_day, seed=7):
+    rng = np.random.default_rng(seed)
+    per_partition = per_day // len(services)
+    for d in range(days):
+        day = start + timedelta(days=d)
+        for s, service in enumerate(services):
+            n = per_partition
+            offsets = np.sort(rng.integers(0, 86_400_000, n))
+            timestamps = np.datetime64(day, "ms") + offsets.astype("timedelta64[ms]")
+            table = pa.table({
+                "_id": pa.array([f"{d:04d}{s:03d}{i:09d}" for i in range(n)]),
+                "timestamp": pa.array(timestamps, pa.timestamp("ms")),
+                "level": pa.array(rng.choice(LEVELS, n)),
+                "service": pa.array([service] * n),
+                "message": pa.array(rng.choice(MESSAGES, n)),
+                "metadata": pa.nulls(n, pa.string()),
+                "extra": pa.nulls(n, pa.string()),
+                "response_time": pa.array(rng.gamma(2.0, 60.0 * (s + 1), n)),
+                "status_code": pa.array(rng.choice([200, 200, 200, 201, 404, 500], n).astype("int32")),
+                "user_id": pa.array(rng.integers(0, 100_000, n).astype(str)),
+            }, schema=SCHEMA)
+            directory = partition_dir(root, day, service)
+            os.makedirs(directory, exist_ok=True)
+            pq.write_table(table, os.path.join(directory, "part-bench.parquet"), compression=COMPRESSION)
+
+
+def python_error_rate(reader, start, end):
+    """The row-at-a-time baseline: every log becomes a dict and is counted in Python"""
+    totals, errors = Counter(), Counter()
+    table = reader.scan(start, end, columns=["timestamp", "level", "service"])
+    for batch in table.to_batches(50_000):
+        for log in batch.to_pylist():
+            service = log["service"] or "unknown"
+            totals[service] += 1
+            if log["level"] in ("error", "fatal"):
+                errors[service] += 1
+    return {service: round(errors[service] / totals[service] * 100, 2) for service in totals}
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return result, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar history query benchmark")
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--services', type=int, default=8)
+    parser.add_argument('--per-day', type=int, default=500_000, help="logs per day across all services")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--path', help="archive directory (default: a temporary one)")
+    parser.add_argument('--keep', action='store_true', help="don't delete the archive afterwards")
+    parser.add_argument('--no-baseline', action='store_true', help="skip the row-at-a-time comparison")
+    args = parser.parse_args()
+
+    root = args.path or tempfile.mkdtemp(prefix="history-archive-")
+    services = [f"service-{i}" for i in range(args.services)]
+    end = datetime(2025, 1, 1) + timedelta(days=args.days)
+    start = end - timedelta(days=args.days)
+    reader = ArchiveReader(root)
+
+    if not reader.partitions(start, end):
+        print(f"Writing {args.days} days x {args.per_day:,} logs to {root}...")
+        started = time.perf_counter()
+        write_archive(root, start, args.days, services, args.per_day)
+        print(f"   {time.perf_counter() - started:.1f}s")
+    size = sum(os.path.getsize(path) for path in reader.files())
+    print(f"Archive: {len(reader.partitions())} partitions, {size / 1e6:,.1f} MB")
+
+    engine = HistoryEngine(reader)
+    week = end - timedelta(days=7)
+    queries = [
+        ("30d error rate by service",
+         HistoryQuery(start, end, group_by=["service"], metrics=["count", "errorRate"])),
+        ("30d p50/p99 response time by service",
+         HistoryQuery(start, end, group_by=["service"], metrics=["p50", "p99"])),
+        ("30d daily errors, one service (pruned)",
+         HistoryQuery(start, end, group_by=["bucket"], interval="1d", metrics=["errors"], services=[services[0]])),
+        ("7d hourly count x level",
+         HistoryQuery(week, end, group_by=["bucket", "level"], interval="1h", metrics=["count"])),
+        ("30d top 5 services by errors",
+         HistoryQuery(start, end, group_by=["service"], metrics=["errors"], limit=5)),
+        ("30d distinct users",
+         HistoryQuery(start, end, metrics=["users"])),
+    ]
+
+    rows = []
+    for name, query in queries:
+        _, samples = timed(lambda: engine.run(query), args.repeat)
+        rows.append((name, samples))
+    if not args.no_baseline:
+        _, samples = timed(lambda: python_error_rate(reader, start, end), 1)
+        rows.append(("30d error rate by service, row loop (before)", samples))
+
+    print("\n" + "=" * 76)
+    print(f"{'query':<48} | {'median':>10} {'max':>10}")
+    print("-" * 76)
+    for name, samples in rows:
+        print(f"{name:<48} | {statistics.median(samples) * 1000:>8.1f}ms {max(samples) * 1000:>8.1f}ms")
+    print("=" * 76)
+    print(f"Rows scanned: {engine.stats['rows']:,} over {engine.stats['queries']} queries")
+
+    if not args.keep and not args.path:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
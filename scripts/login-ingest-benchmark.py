@@ -0,0 +1,176 @@
+"""
+Benchmark: log-collector ingest latency while users are logging in.
+
+Starts a single collector worker, registers a user, then measures bulk
+ingest latency twice: on its own, and while --logins clients log in as fast
+as they can. With bcrypt running inline every login holds the eventlet hub
+for the whole hash, so ingest p99 grows by roughly one hash per concurrent
+login; with hashing on the bounded thread pool it should barely move.
+
+    git worktree add /tmp/collector-before <commit before the password pool>
+    MONGO_URI=mongodb://localhost:27017 REDIS_URL=redis://localhost:6379 \
+        python scripts/login-ingest-benchmark.py \
+            --before /tmp/collector-before/services/log-collector --logins 4 16
+
+The per-IP login limit is lifted for the run (every client is 127.0.0.1);
+logins refused with 503 because the hashing queue is full are counted.
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+COLLECTOR_DIR = Path(__file__).resolve().parent.parent / "services" / "log-collector"
+SERVICES = ["auth-service", "payment-service", "api-gateway", "order-service", "notification-service"]
+USER = {"name": "Bench User", "email": "login-bench@example.com", "password": "correct horse battery"}
+
+
+def start_collector(service_dir, port, spill_dir):
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        COLLECTOR_WORKERS="1",
+        LOGIN_MAX_ATTEMPTS=str(10**9),
+        WRITE_BUFFER_SPILL_PATH=str(Path(spill_dir) / "ingest-spill.jsonl"),
+    )
+    for name in ("FLASK_ENV", "COLLECTOR_WORKER", "SOCKETIO_MESSAGE_QUEUE"):
+        env.pop(name, None)
+    process = subprocess.Popen(
+        [sys.executable, "app.py"],
+        cwd=service_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            if requests.get(f"{url}/health", timeout=1).ok:
+                return process, url
+        except requests.RequestException:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"collector in {service_dir} did not start")
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def ingest_client(url, batch, deadline, latencies):
+    session = requests.Session()
+    payload = [
+        {"level": "info", "message": f"Request processed - #{random.randint(0, 10**6)}",
+         "service": random.choice(SERVICES)}
+        for _ in range(batch)
+    ]
+    while time.time() < deadline:
+        started = time.perf_counter()
+        session.post(f"{url}/api/logs/bulk", json=payload, timeout=60)
+        latencies.append(time.perf_counter() - started)
+        time.sleep(0.01)
+
+
+def login_client(url, deadline, results):
+    session = requests.Session()
+    credentials = {"email": USER["email"], "password": USER["password"]}
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            status = session.post(f"{url}/api/auth/login", json=credentials, timeout=60).status_code
+        except requests.RequestException:
+            status = 0
+        results.append((status, time.perf_counter() - started))
+
+
+def phase(url, args, logins):
+    """Ingest for --duration seconds with `logins` concurrent login clients"""
+    ingest_latencies, login_results = [], []
+    deadline = time.time() + args.duration
+    threads = [threading.Thread(target=ingest_client, args=(url, args.batch, deadline, ingest_latencies))
+               for _ in range(args.ingest_clients)]
+    threads += [threading.Thread(target=login_client, args=(url, deadline, login_results))
+                for _ in range(logins)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    succeeded = [elapsed for status, elapsed in login_results if status == 200]
+    return {
+        "logins": logins,
+        "ingestRequests": len(ingest_latencies),
+        "p50": statistics.median(ingest_latencies) if ingest_latencies else 0,
+        "p99": percentile(ingest_latencies, 0.99),
+        "loginsPerSec": len(succeeded) / args.duration,
+        "loginP99": percentile(succeeded, 0.99),
+        "busy": sum(1 for status, _ in login_results if status == 503),
+    }
+
+
+def bench(label, service_dir, args):
+    spill_dir = tempfile.mkdtemp(prefix="login-bench-")
+    process, url = start_collector(service_dir, args.port, spill_dir)
+    rows = []
+    try:
+        requests.post(f"{url}/api/auth/register", json=USER, timeout=30)
+        for logins in [0] + args.logins:
+            rows.append({"label": label, **phase(url, args, logins)})
+            print(f"   {label:>7} logins x{logins:<3} ingest p99 {rows[-1]['p99'] * 1000:.1f}ms")
+    finally:
+        process.terminate()
+        try:
+            process.wait(20)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        shutil.rmtree(spill_dir, ignore_errors=True)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collector ingest latency during concurrent logins")
+    parser.add_argument('--before', help="log-collector directory of the version to compare against")
+    parser.add_argument('--after', default=str(COLLECTOR_DIR))
+    parser.add_argument('--logins', type=int, nargs='+', default=[4, 16], help="concurrent login clients")
+    parser.add_argument('--ingest-clients', type=int, default=4)
+    parser.add_argument('--batch', type=int, default=50, help="logs per ingest request")
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--port', type=int, default=3102)
+    args = parser.parse_args()
+
+    for name in ('MONGO_URI', 'REDIS_URL'):
+        if not os.getenv(name):
+            parser.error(f"{name} must point at a running server")
+
+    print(f"Login/ingest benchmark: {args.ingest_clients} ingest clients, batch={args.batch}, "
+          f"{args.duration:.0f}s per phase")
+    rows = []
+    if args.before:
+        rows += bench("before", args.before, args)
+    rows += bench("after", args.after, args)
+
+    print("\n" + "=" * 86)
+    print(f"{'version':>8} {'logins':>7} | {'ingest reqs':>11} {'p50':>9} {'p99':>9} | "
+          f"{'logins/s':>9} {'login p99':>10} | {'503s':>5}")
+    print("-" * 86)
+    for row in rows:
+        print(f"{row['label']:>8} {row['logins']:>7} | {row['ingestRequests']:>11,} "
+              f"{row['p50'] * 1000:>7.1f}ms {row['p99'] * 1000:>7.1f}ms | "
+              f"{row['loginsPerSec']:>9.1f} {row['loginP99'] * 1000:>8.1f}ms | {row['busy']:>5}")
+    print("=" * 86)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Convert legacy string timestamps in db.logs to BSON datetimes.
+
+The services query both representations, so this can run online and be
+interrupted and resumed at any time. Strings that cannot be parsed are left
+untouched and reported.
+
+    python scripts/migrate-timestamps.py --dry-run
+    python scripts/migrate-timestamps.py --batch-size 5000
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+from pymongo import MongoClient, UpdateOne
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services" / "common"))
+from logviz_common.timestamps import parse_timestamp
+
+def migrate(logs_collection, batch_size, dry_run):
+    converted = unparseable = 0
+    last_id = None
+    started = time.perf_counter()
+
+    while True:
+        query = {"timestamp": {"$type": "string"}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = list(logs_collection.find(query, {"timestamp": 1}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+
+        operations = []
+        for doc in batch:
+            try:
+                parsed = parse_timestamp(doc["timestamp"])
+            except ValueError:
+                unparseable += 1
+                continue
+            # Guard on the old value so a concurrent rewrite is never clobbered
+            operations.append(UpdateOne(
+                {"_id": doc["_id"], "timestamp": doc["timestamp"]},
+                {"$set": {"timestamp": parsed}}
+            ))
+
+        if operations and not dry_run:
+            logs_collection.bulk_write(operations, ordered=False)
+        converted += len(operations)
+        print(f"   {converted:,} converted, {unparseable:,} unparseable "
+              f"({converted / max(time.perf_counter() - started, 1e-9):,.0f}/s)", end="\r")
+
+    print()
+    return converted, unparseable
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate log timestamps to BSON datetimes")
+    parser.add_argument('--mongo-uri', default=os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    parser.add_argument('--batch-size', type=int, default=2000)
+    parser.add_argument('--dry-run', action='store_true', help="count what would change without writing")
+    args = parser.parse_args()
+
+    logs_collection = MongoClient(args.mongo_uri).logvizpro.logs
+    remaining = logs_collection.count_documents({"timestamp": {"$type": "string"}})
+    print(f"Found {remaining:,} logs with string timestamps")
+
+    converted, unparseable = migrate(logs_collection, args.batch_size, args.dry_run)
+    verb = "Would convert" if args.dry_run else "Converted"
+    print(f"{verb} {converted:,} timestamps; {unparseable:,} could not be parsed and were left as-is")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark: exact vs sketched summary statistics.
+
+Generates --logs synthetic logs (Zipf-distributed services and messages,
+--users distinct users, gamma response times), splits them across
+--replicas collectors and --hours hourly buckets, and computes the summary
+statistics two ways:
+
+    exact     a set of users, Counters of services and messages and the
+              list of response times, as the analyzer builds from raw logs
+    sketches  one LogSketches per (hour, replica), merged at read time
+
+It reports each estimate's error next to its stated bound, the memory each
+approach holds, and the stored size of the sketches.
+
+    python scripts/sketch-accuracy-benchmark.py --logs 2000000 --users 500000
+"""
+
+import argparse
+import pickle
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services" / "common"))
+
+from logviz_common.sketches import LogSketches  # noqa: E402
+
+
+def generate(rng, n, users, services, messages):
+    service_ids = np.minimum(rng.zipf(1.4, n), services) - 1
+    message_ids = np.minimum(rng.zipf(1.2, n), messages) - 1
+    return [
+        {"service": f"service-{s}", "message": f"Request failed for order {m}",
+         "userId": f"user-{u}", "responseTime": float(rt)}
+        for s, m, u, rt in zip(service_ids, message_ids, rng.integers(0, users, n), rng.gamma(2.0, 80.0, n))
+    ]
+
+
+def exact(chunks):
+    users, services, messages, times = set(), Counter(), Counter(), []
+    for logs in chunks:
+        users.update(log["userId"] for log in logs)
+        services.update(log["service"] for log in logs)
+        messages.update(log["message"] for log in logs)
+        times.extend(log["responseTime"] for log in logs)
+    return users, services, messages, times
+
+
+def sketched(chunks, groups, batch):
+    """One LogSketches per group (hour x replica), fed in collector-sized batches"""
+    sketches = [LogSketches() for _ in range(groups)]
+    for i, logs in enumerate(chunks):
+        target = sketches[i % groups]
+        for start in range(0, len(logs), batch):
+            target.update(logs[start:start + batch])
+    return sketches
+
+
+def measured(fn):
+    """(result, seconds, peak bytes); timed on its own run, since tracing allocations slows it down"""
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exact vs sketched summary statistics")
+    parser.add_argument('--logs', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=200_000)
+    parser.add_argument('--services', type=int, default=5_000)
+    parser.add_argument('--messages', type=int, default=50_000)
+    parser.add_argument('--hours', type=int, default=24)
+    parser.add_argument('--replicas', type=int, default=4)
+    parser.add_argument('--batch', type=int, default=500, help="logs per write-behind flush")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    groups = args.hours * args.replicas
+    print(f"Generating {args.logs:,} logs over {args.hours} hours x {args.replicas} replicas...")
+    logs = generate(rng, args.logs, args.users, args.services, args.messages)
+    size = -(-len(logs) // groups)
+    chunks = [logs[i:i + size] for i in range(0, len(logs), size)]
+
+    (users, services, messages, times), exact_s, exact_mem = measured(lambda: exact(chunks))
+    parts, sketch_s, sketch_mem = measured(lambda: sketched(chunks, groups, args.batch))
+    docs = [part.to_doc() for part in parts]
+    stored = sum(len(pickle.dumps(doc)) for doc in docs)
+    merged, merge_s, _ = measured(lambda: LogSketches.merged(docs))
+
+    print("\n" + "=" * 76)
+    print(f"{'':<28} {'exact':>14} {'sketches':>14} {'error':>8} {'bound':>8}")
+    print("-" * 76)
+    estimate = merged.users.cardinality()
+    print(f"{'distinct users':<28} {len(users):>14,} {estimate:>14,} "
+          f"{abs(estimate / len(users) - 1):>8.2%} {merged.users.relative_error:>8.2%}")
+    estimate = merged.services.cardinality()
+    print(f"{'distinct services':<28} {len(services):>14,} {estimate:>14,} "
+          f"{abs(estimate / len(services) - 1):>8.2%} {merged.services.relative_error:>8.2%}")
+    for name, truth, sketch in (("service", services, merged.top_services), ("message", messages, merged.top_messages)):
+        top = sketch.top(10)
+        worst = max(count - truth[item] for item, count, _ in top)
+        hits = len({item for item, _, _ in top} & {item for item, _ in truth.most_common(10)})
+        print(f"{'top 10 ' + name + 's (overlap)':<28} {10:>14} {hits:>14} "
+              f"{worst:>8,} {max(error for _, _, error in top):>8,.0f}")
+    for q in (0.5, 0.95, 0.99):
+        truth = float(np.quantile(times, q))
+        estimate = merged.response_time.quantile(q)
+        print(f"{f'responseTime p{round(q * 100)}':<28} {truth:>14.1f} {estimate:>14.1f} "
+              f"{abs(estimate / truth - 1):>8.2%} {'':>8}")
+    print("-" * 76)
+    print(f"{'peak memory':<28} {exact_mem / 1e6:>12.1f}MB {sketch_mem / 1e6:>12.1f}MB")
+    print(f"{'build time':<28} {exact_s:>13.2f}s {sketch_s:>13.2f}s")
+    print(f"{'stored sketches':<28} {'':>14} {stored / 1e6:>12.2f}MB   ({groups} documents)")
+    print(f"{'merge at read time':<28} {'':>14} {merge_s * 1000:>12.0f}ms")
+    print("=" * 76)
+    print("Top-k error is the largest over-count among the reported items; its bound is the largest reported error.")
+
+
+if __name__ == "__main__":
+    main()
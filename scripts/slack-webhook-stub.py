@@ -0,0 +1,64 @@
+"""
+Local stand-in for a Slack incoming webhook.
+
+Run it, point the collector at it and fire an error storm to check that
+notifications are digested and rate-limited:
+
+    python scripts/slack-webhook-stub.py --port 9999
+    SLACK_WEBHOOK_URL=http://localhost:9999/webhook python services/log-collector/app.py
+"""
+
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+received = []
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    # Optional artificial latency / throttling to mimic a slow or angry Slack
+    delay = 0.0
+    rate_limit_every = 0
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        received.append((time.time(), payload))
+        time.sleep(self.delay)
+
+        if self.rate_limit_every and len(received) % self.rate_limit_every == 0:
+            self.send_response(429)
+            self.send_header('Retry-After', '2')
+            self.end_headers()
+            print(f"[{len(received)}] -> 429 (simulated rate limit)")
+            return
+
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+        window = [t for t, _ in received if t > time.time() - 60]
+        print(f"[{len(received)}] {payload.get('text', '')}  ({len(window)} in last 60s)")
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Slack webhook server")
+    parser.add_argument('--port', type=int, default=9999)
+    parser.add_argument('--delay', type=float, default=0.0, help="seconds to wait before responding")
+    parser.add_argument('--rate-limit-every', type=int, default=0, help="answer every Nth request with 429")
+    args = parser.parse_args()
+
+    WebhookHandler.delay = args.delay
+    WebhookHandler.rate_limit_every = args.rate_limit_every
+
+    server = ThreadingHTTPServer(('0.0.0.0', args.port), WebhookHandler)
+    print(f"Stub Slack webhook listening on http://localhost:{args.port}/webhook")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nReceived {len(received)} notifications")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: single-core throughput of the log-analyzer template miner.
+
+Feeds generated messages through TemplateMiner.add and reports messages/sec
+and how many templates were found. Messages follow the load-test.ps1 shapes
+(numbered requests), plus variable IDs, IPs and durations; --unique mixes in
+a share of messages with free-text variables the mask can't normalize, which
+forces them through the parse tree instead of the repeat cache.
+
+    python scripts/template-mining-benchmark.py --logs 500000
+    python scripts/template-mining-benchmark.py --unique 0.5
+"""
+
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services" / "log-analyzer"))
+
+from templates import TemplateMiner  # noqa: E402
+
+BASE_MESSAGES = [
+    "Request processed successfully",
+    "High latency detected",
+    "Connection failed",
+    "Cache miss",
+    "Rate limit approaching",
+    "Query execution slow",
+    "Service health check passed",
+    "Timeout warning",
+]
+SHAPES = [
+    lambda: f"{random.choice(BASE_MESSAGES)} - Request #{random.randint(1, 10**6)}",
+    lambda: f"Connection failed to {random.randint(10, 250)}.0.{random.randint(0, 255)}.{random.randint(1, 254)}:5432 "
+            f"after {random.randint(1, 5)} retries",
+    lambda: f"Payment {random.randint(10**5, 10**6)} declined: card ending {random.randint(1000, 9999)}",
+    lambda: f"Query execution slow - {random.randint(100, 5000)}ms on orders",
+    lambda: f"Session {random.getrandbits(64):016x} expired",
+]
+
+
+def free_text_message():
+    user = ''.join(random.choices(string.ascii_lowercase, k=6))
+    return random.choice([
+        f"User {user} logged in from web",
+        f"Cache miss for key {user} in region eu",
+        f"Job {user} finished with status ok",
+    ])
+
+
+def generate(count, unique_share):
+    return [
+        free_text_message() if random.random() < unique_share else random.choice(SHAPES)()
+        for _ in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Template miner throughput benchmark")
+    parser.add_argument('--logs', type=int, default=200000)
+    parser.add_argument('--unique', type=float, default=0.1,
+                        help="share of messages with unmaskable free-text variables")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    messages = generate(args.logs, args.unique)
+
+    miner = TemplateMiner()
+    started = time.perf_counter()
+    for message in messages:
+        miner.add(message)
+    elapsed = time.perf_counter() - started
+
+    print(f"Template mining: {args.logs:,} messages, {args.unique:.0%} free-text")
+    print(f"   {args.logs / elapsed:>12,.0f} messages/s ({elapsed * 1e6 / args.logs:.1f} µs each)")
+    print(f"   {miner.stats['clusters']:>12,} templates, {miner.stats['cacheHits'] / args.logs:.0%} cache hits")
+    print("\nLargest templates:")
+    for cluster in sorted(miner.clusters.values(), key=lambda c: -c.size)[:10]:
+        print(f"   {cluster.size:>9,}  {cluster.template}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""
+Modules shared by log-collector, log-analyzer and ml-analyzer.
+
+Each service's Docker image installs this package (see the service
+Dockerfiles); for local work, `pip install -e services/common`.
+"""
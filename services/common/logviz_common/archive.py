@@ -0,0 +1,284 @@
+"""
+Cold tier for logs: zstd-compressed Parquet files partitioned by day and service.
+
+    <ARCHIVE_PATH>/day=2025-01-01/service=auth-service/part-<run>.parquet
+
+Every compaction run adds its own `part-<run>` file to each partition it
+touches, so files are never rewritten. Files are written under a `.tmp`
+name and renamed once complete; readers skip anything else.
+
+Columns are the fields the collector stores. `metadata` is kept as JSON,
+and any other top-level fields of older documents go into `extra` (JSON)
+so nothing is lost on the way out of MongoDB. `response_time`,
+`status_code` and `user_id` are typed copies of the responseTime,
+statusCode and userId fields (top-level or in metadata) for analytics;
+files written before they existed read them as null.
+
+log-collector writes the archive and log-analyzer reads it.
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+from urllib.parse import quote, unquote
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+SCHEMA = pa.schema([
+    ("_id", pa.string()),
+    ("timestamp", pa.timestamp("ms")),
+    ("level", pa.string()),
+    ("service", pa.string()),
+    ("message", pa.string()),
+    ("metadata", pa.string()),
+    ("extra", pa.string()),
+    ("response_time", pa.float64()),
+    ("status_code", pa.int32()),
+    ("user_id", pa.string()),
+])
+COLUMNS = SCHEMA.names
+# Typed analytics columns and the log fields they copy
+TYPED_FIELDS = {"response_time": "responseTime", "status_code": "statusCode", "user_id": "userId"}
+# Top-level fields of archived logs, typed columns under their log names (`extra` holds any others)
+LOG_FIELDS = [TYPED_FIELDS.get(name, name) for name in COLUMNS if name != "extra"]
+# Low-cardinality columns are read dictionary-encoded: cheaper to decode, filter and group
+DICTIONARY_COLUMNS = ["level", "service"]
+READ_SCHEMA = pa.schema([
+    (field.name, pa.dictionary(pa.int32(), pa.string()) if field.name in DICTIONARY_COLUMNS else field.type)
+    for field in SCHEMA
+])
+READ_FORMAT = ds.ParquetFileFormat(read_options=ds.ParquetReadOptions(dictionary_columns=DICTIONARY_COLUMNS))
+ROW_GROUP_SIZE = 64 * 1024
+COMPRESSION = "zstd"
+UNKNOWN_SERVICE = "unknown"
+
+
+def day_floor(value):
+    return datetime(value.year, value.month, value.day)
+
+
+def partition_dir(root, day, service):
+    """Directory for one day (a date or datetime) and service"""
+    return os.path.join(root, f"day={day:%Y-%m-%d}", f"service={quote(service or UNKNOWN_SERVICE, safe='')}")
+
+
+def _number(value, kind):
+    try:
+        return kind(value) if value is not None and not isinstance(value, bool) else None
+    except (TypeError, ValueError):
+        return None
+
+
+def to_row(log, timestamp):
+    """Archive row for a stored log; `timestamp` is its parsed datetime (or None)"""
+    extra = {k: v for k, v in log.items() if k not in COLUMNS}
+    metadata = log.get("metadata") if isinstance(log.get("metadata"), dict) else {}
+
+    def field(name):
+        return log[name] if log.get(name) is not None else metadata.get(name)
+
+    return {
+        "_id": str(log["_id"]),
+        "timestamp": timestamp,
+        "level": log.get("level"),
+        "service": log.get("service"),
+        "message": log.get("message"),
+        "metadata": json.dumps(log["metadata"], default=str) if log.get("metadata") is not None else None,
+        "extra": json.dumps(extra, default=str) if extra else None,
+        "response_time": _number(field("responseTime"), float),
+        "status_code": _number(field("statusCode"), int),
+        "user_id": str(field("userId")) if field("userId") is not None else None,
+    }
+
+
+def from_row(row):
+    """Log document (as stored, minus BSON types) for an archive row"""
+    log = {k: row[k] for k in ("_id", "timestamp", "level", "service", "message") if k in row}
+    if row.get("metadata") is not None:
+        log["metadata"] = json.loads(row["metadata"])
+    if row.get("extra"):
+        for key, value in json.loads(row["extra"]).items():
+            log.setdefault(key, value)
+    return log
+
+
+class PartitionWriter:
+    """Streams rows into one new Parquet file per (day, service) partition"""
+
+    def __init__(self, root, run, row_group_size=ROW_GROUP_SIZE):
+        self.root = root
+        self.run = run
+        self.row_group_size = row_group_size
+        self._buffers = {}   # (day, service) -> [rows]
+        self._writers = {}   # (day, service) -> (ParquetWriter, tmp path)
+        self.rows = 0
+
+    def add(self, row, day):
+        key = (day, row["service"] or UNKNOWN_SERVICE)
+        rows = self._buffers.setdefault(key, [])
+        rows.append(row)
+        self.rows += 1
+        if len(rows) >= self.row_group_size:
+            self._flush(key)
+
+    def _flush(self, key):
+        rows = self._buffers.pop(key, None)
+        if not rows:
+            return
+        if key not in self._writers:
+            directory = partition_dir(self.root, *key)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{self.run}.parquet.tmp")
+            self._writers[key] = (pq.ParquetWriter(path, SCHEMA, compression=COMPRESSION), path)
+        self._writers[key][0].write_table(pa.Table.from_pylist(rows, schema=SCHEMA))
+
+    def commit(self):
+        """Finish every file and make them visible; returns their paths"""
+        for key in list(self._buffers):
+            self._flush(key)
+        paths = []
+        for writer, tmp in self._writers.values():
+            writer.close()
+            path = tmp[:-len(".tmp")]
+            os.replace(tmp, path)
+            paths.append(path)
+        self._writers = {}
+        return paths
+
+    def abort(self):
+        self._buffers = {}
+        for writer, tmp in self._writers.values():
+            try:
+                writer.close()
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        self._writers = {}
+
+
+class ArchiveReader:
+    """Reads archived logs, opening only the partitions a query can match"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def partitions(self, start=None, end=None, services=None):
+        """[(day, service, [files])] overlapping [start, end), oldest day first"""
+        if not os.path.isdir(self.root):
+            return []
+        wanted = {s or UNKNOWN_SERVICE for s in services} if services else None
+        found = []
+        for day_name in sorted(os.listdir(self.root)):
+            if not day_name.startswith("day="):
+                continue
+            try:
+                day = datetime.strptime(day_name[4:], "%Y-%m-%d")
+            except ValueError:
+                continue
+            if (start is not None and day + timedelta(days=1) <= start) or (end is not None and day >= end):
+                continue
+            day_path = os.path.join(self.root, day_name)
+            for service_name in sorted(os.listdir(day_path)):
+                if not service_name.startswith("service="):
+                    continue
+                service = unquote(service_name[8:])
+                if wanted is not None and service not in wanted:
+                    continue
+                service_path = os.path.join(day_path, service_name)
+                files = sorted(
+                    os.path.join(service_path, f) for f in os.listdir(service_path) if f.endswith(".parquet")
+                )
+                if files:
+                    found.append((day, service, files))
+        return found
+
+    def files(self, run=None):
+        """Every archive file, or those written by one compaction run (including unfinished ones)"""
+        if not os.path.isdir(self.root):
+            return []
+        paths = []
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                if run is None and name.endswith(".parquet") or run is not None and name.startswith(f"part-{run}."):
+                    paths.append(os.path.join(dirpath, name))
+        return paths
+
+    def scan(self, start=None, end=None, services=None, levels=None, columns=None):
+        """Rows in [start, end) as one Table, filtered by service and level.
+
+        `level` and `service` come back dictionary-encoded. Days that lie
+        wholly inside the range are read without a timestamp filter; only
+        the first and last day need one.
+        """
+        columns = [c for c in columns if c in COLUMNS] if columns else COLUMNS
+        inside, edges = [], []
+        for day, _, paths in self.partitions(start, end, services):
+            whole = (start is None or day >= start) and (end is None or day + timedelta(days=1) <= end)
+            (inside if whole else edges).extend(paths)
+
+        tables = []
+        for paths, condition in ((inside, filter_expression(None, None, services, levels)),
+                                 (edges, filter_expression(start, end, services, levels))):
+            if paths:
+                dataset = ds.dataset(paths, schema=READ_SCHEMA, format=READ_FORMAT)
+                tables.append(dataset.to_table(columns=columns, filter=condition))
+        if not tables:
+            return READ_SCHEMA.empty_table().select(columns)
+        return pa.concat_tables(tables).unify_dictionaries()
+
+    def iter_days(self, start=None, end=None, services=None, levels=None, columns=None):
+        """(day, Table) for each archived day, newest first, rows newest first within the day"""
+        days = sorted({day for day, _, _ in self.partitions(start, end, services)}, reverse=True)
+        for day in days:
+            table = self.scan(max(day, start) if start else day,
+                              min(day + timedelta(days=1), end) if end else day + timedelta(days=1),
+                              services, levels, columns)
+            if table.num_rows:
+                keys = [(k, "descending") for k in ("timestamp", "_id") if k in table.column_names]
+                yield day, table.sort_by(keys) if keys else table
+
+
+def filter_expression(start=None, end=None, services=None, levels=None):
+    """Row filter pushed down into the Parquet reader (None when there is nothing to filter)"""
+    clauses = []
+    if start is not None:
+        clauses.append(pc.field("timestamp") >= pa.scalar(start, pa.timestamp("ms")))
+    if end is not None:
+        clauses.append(pc.field("timestamp") < pa.scalar(end, pa.timestamp("ms")))
+    if services:
+        clauses.append(pc.field("service").isin(list(services)))
+    if levels:
+        clauses.append(pc.field("level").isin(list(levels)))
+    if not clauses:
+        return None
+    condition = clauses[0]
+    for clause in clauses[1:]:
+        condition = condition & clause
+    return condition
+
+
+def project(log, fields):
+    """Apply a Mongo-style inclusion projection (`{"a": 1, "metadata.b": 1}`) to a log"""
+    if not fields:
+        return log
+    projected = {}
+    for name in fields:
+        head, _, rest = name.partition(".")
+        if head not in log:
+            continue
+        if not rest:
+            projected[head] = log[head]
+        elif isinstance(log[head], dict) and rest in log[head]:
+            projected.setdefault(head, {})[rest] = log[head][rest]
+    return projected
+
+
+def columns_for(fields):
+    """Archive columns needed to answer a projection (None = all)"""
+    if not fields:
+        return None
+    heads = {name.partition(".")[0] for name in fields}
+    return [c for c in COLUMNS if c in heads or c == "extra" and heads - set(COLUMNS)]
@@ -0,0 +1,112 @@
+"""
+Tuned MongoDB and Redis clients.
+
+Every service builds its clients here rather than with driver defaults, so
+pool sizes, timeouts and write safety come from the same environment
+variables everywhere:
+
+    MONGO_MAX_POOL_SIZE (100)               REDIS_MAX_CONNECTIONS (100)
+    MONGO_MIN_POOL_SIZE (0)                 REDIS_SOCKET_TIMEOUT (5 s)
+    MONGO_MAX_IDLE_MS (60000)               REDIS_CONNECT_TIMEOUT (2 s)
+    MONGO_CONNECT_TIMEOUT_MS (5000)         REDIS_HEALTH_CHECK_INTERVAL (30 s)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS (5000)
+    MONGO_SOCKET_TIMEOUT_MS (60000)
+    MONGO_WAIT_QUEUE_TIMEOUT_MS (10000)
+    MONGO_WRITE_CONCERN (server default; a number or "majority")
+    MONGO_RETRY_WRITES (true)
+
+The defaults fail in seconds instead of the drivers' 30 s server selection
+and unbounded socket reads, so a lost database surfaces as errors and a
+failing health probe rather than hung requests. Blocking clients are for
+threads and the eventlet collector; the async ones for FastAPI endpoints.
+"""
+
+import os
+import time
+
+import redis
+from pymongo import MongoClient
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+def mongo_options(app_name):
+    options = {
+        "appname": app_name,
+        "maxPoolSize": _env_int('MONGO_MAX_POOL_SIZE', 100),
+        "minPoolSize": _env_int('MONGO_MIN_POOL_SIZE', 0),
+        "maxIdleTimeMS": _env_int('MONGO_MAX_IDLE_MS', 60000),
+        "connectTimeoutMS": _env_int('MONGO_CONNECT_TIMEOUT_MS', 5000),
+        "serverSelectionTimeoutMS": _env_int('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000),
+        "socketTimeoutMS": _env_int('MONGO_SOCKET_TIMEOUT_MS', 60000),
+        "waitQueueTimeoutMS": _env_int('MONGO_WAIT_QUEUE_TIMEOUT_MS', 10000),
+        "retryWrites": os.getenv('MONGO_RETRY_WRITES', 'true').lower() == 'true',
+        "retryReads": True,
+    }
+    write_concern = os.getenv('MONGO_WRITE_CONCERN')
+    if write_concern:
+        options["w"] = int(write_concern) if write_concern.isdigit() else write_concern
+    return options
+
+
+def redis_options():
+    return {
+        "decode_responses": True,
+        "max_connections": _env_int('REDIS_MAX_CONNECTIONS', 100),
+        "socket_timeout": float(os.getenv('REDIS_SOCKET_TIMEOUT', 5)),
+        "socket_connect_timeout": float(os.getenv('REDIS_CONNECT_TIMEOUT', 2)),
+        "socket_keepalive": True,
+        "health_check_interval": _env_int('REDIS_HEALTH_CHECK_INTERVAL', 30),
+    }
+
+
+def mongo_client(app_name, uri=None):
+    return MongoClient(uri or os.getenv('MONGO_URI', 'mongodb://localhost:27017'), **mongo_options(app_name))
+
+
+def redis_client(url=None):
+    return redis.from_url(url or os.getenv('REDIS_URL', 'redis://localhost:6379'), **redis_options())
+
+
+def async_mongo_client(app_name, uri=None):
+    from pymongo import AsyncMongoClient
+    return AsyncMongoClient(uri or os.getenv('MONGO_URI', 'mongodb://localhost:27017'), **mongo_options(app_name))
+
+
+def async_redis_client(url=None):
+    import redis.asyncio
+    return redis.asyncio.from_url(url or os.getenv('REDIS_URL', 'redis://localhost:6379'), **redis_options())
+
+
+def _timed(check):
+    started = time.perf_counter()
+    try:
+        check()
+        return {"ok": True, "latencyMs": round((time.perf_counter() - started) * 1000, 2)}
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+
+
+def probe(mongo, redis_conn):
+    """Round-trip each backend once; used by /health"""
+    return {
+        "mongo": _timed(lambda: mongo.admin.command('ping')),
+        "redis": _timed(redis_conn.ping),
+    }
+
+
+async def async_probe(mongo, redis_conn):
+    async def timed(check):
+        started = time.perf_counter()
+        try:
+            await check()
+            return {"ok": True, "latencyMs": round((time.perf_counter() - started) * 1000, 2)}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+    return {
+        "mongo": await timed(lambda: mongo.admin.command('ping')),
+        "redis": await timed(redis_conn.ping),
+    }
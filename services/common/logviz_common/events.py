@@ -0,0 +1,136 @@
+"""
+Consumer-group reader for the collector's `logs:stream` event bus.
+
+log-collector publishes every persisted log as JSON to a Redis Stream and
+trims it behind the slowest consumer group's oldest pending entry (MAXLEN
+is only a hard cap). Each downstream service reads it through its own consumer
+group, so services progress independently; entries stay pending until the
+consumer acknowledges them. On restart a consumer first replays its own
+pending entries, and entries left pending by a consumer that went away are
+claimed by a live one once they have been idle for `claim_idle_ms`.
+"""
+
+import json
+import logging
+import os
+import socket
+
+from redis.exceptions import ResponseError
+
+logger = logging.getLogger(__name__)
+
+LOGS_STREAM_KEY = "logs:stream"
+
+
+def default_consumer_name():
+    """Stable across restarts (container hostname) so we find our own pending entries"""
+    return os.getenv('STREAM_CONSUMER_NAME') or socket.gethostname()
+
+
+class StreamConsumer:
+    """Reads decoded log events for one consumer in a consumer group"""
+
+    def __init__(self, redis_client, group, consumer=None, stream=LOGS_STREAM_KEY,
+                 count=1000, block_ms=1000, claim_idle_ms=60000):
+        self.redis = redis_client
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer or default_consumer_name()
+        self.count = count
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+
+        # Start by re-reading whatever was delivered to us but never acknowledged
+        self._replay_cursor = "0"
+        self._claim_cursor = "0-0"
+        self.stats = {"read": 0, "acked": 0, "replayed": 0, "claimed": 0}
+
+    def ensure_group(self, start_id="$"):
+        """Create the consumer group (and the stream) if they don't exist yet"""
+        try:
+            self.redis.xgroup_create(self.stream, self.group, id=start_id, mkstream=True)
+            logger.info(f"Created consumer group {self.group} on {self.stream} at {start_id}")
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def read(self):
+        """Next batch of (entry id, log dict); pending entries come before new ones"""
+        if self._replay_cursor is not None:
+            entries = self._xreadgroup(self._replay_cursor, block=None)
+            if entries:
+                self._replay_cursor = entries[-1][0]
+                self.stats["replayed"] += len(entries)
+                return self._decode(entries)
+            self._replay_cursor = None
+
+        entries = self._claim_stale()
+        if entries:
+            return self._decode(entries)
+        return self._decode(self._xreadgroup(">", block=self.block_ms))
+
+    def ack(self, ids):
+        if not ids:
+            return
+        self.redis.xack(self.stream, self.group, *ids)
+        self.stats["acked"] += len(ids)
+
+    def replay_pending(self):
+        """Re-deliver our unacknowledged entries on the next read (e.g. after a failure)"""
+        self._replay_cursor = "0"
+
+    def lag(self):
+        """Entries in the stream not yet delivered to this group, if Redis reports it"""
+        try:
+            for info in self.redis.xinfo_groups(self.stream):
+                if info.get("name") == self.group:
+                    return {"pending": info.get("pending"), "lag": info.get("lag")}
+        except ResponseError:
+            pass
+        return {"pending": None, "lag": None}
+
+    def _xreadgroup(self, start_id, block):
+        try:
+            response = self.redis.xreadgroup(
+                self.group, self.consumer, {self.stream: start_id}, count=self.count, block=block
+            )
+        except ResponseError as e:
+            if "NOGROUP" not in str(e):
+                raise
+            # Stream or group was deleted underneath us (e.g. FLUSHALL)
+            self.ensure_group()
+            return []
+        entries = []
+        for _, stream_entries in response or []:
+            entries.extend(stream_entries)
+        return entries
+
+    def _claim_stale(self):
+        """Take over entries another consumer left pending for too long"""
+        if not self.claim_idle_ms:
+            return []
+        try:
+            result = self.redis.xautoclaim(
+                self.stream, self.group, self.consumer, self.claim_idle_ms,
+                start_id=self._claim_cursor, count=self.count
+            )
+        except ResponseError:
+            return []
+        self._claim_cursor, entries = result[0], result[1]
+        if entries:
+            self.stats["claimed"] += len(entries)
+        return entries
+
+    def _decode(self, entries):
+        decoded = []
+        dead = []
+        for entry_id, fields in entries:
+            try:
+                decoded.append((entry_id, json.loads(fields["data"])))
+            except (KeyError, TypeError, ValueError):
+                # Trimmed from the stream while pending, or not a log event
+                dead.append(entry_id)
+        if dead:
+            self.ack(dead)
+        self.stats["read"] += len(decoded)
+        return decoded
@@ -0,0 +1,23 @@
+"""
+Arbitrary values as MongoDB field names.
+
+Rollup documents count levels and services under field names
+(`services.auth-service`), so values are escaped on the way in (`.` and `$`
+aren't allowed in field names) and unescaped by readers.
+"""
+
+import re
+
+_ESCAPED = re.compile(r'\\(?:\\|u0024|u002e)')
+_UNESCAPE = {'\\\\': '\\', '\\u0024': '$', '\\u002e': '.'}
+
+
+def escape_key(key):
+    """Make a value safe to use as a MongoDB field name"""
+    return str(key).replace('\\', '\\\\').replace('$', '\\u0024').replace('.', '\\u002e')
+
+
+def unescape_key(key):
+    """Reverse `escape_key`"""
+    # One pass, so an escaped backslash followed by "u002e" isn't read as an escaped dot
+    return _ESCAPED.sub(lambda m: _UNESCAPE[m.group(0)], key)
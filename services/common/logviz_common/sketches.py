@@ -0,0 +1,364 @@
+"""
+Mergeable sketches for high-cardinality log statistics.
+
+    HyperLogLog  distinct counts (users, services); relative standard
+                 error 1.04 / sqrt(2**p), 1.6% at the default p=12
+    SpaceSaving  top-k heavy hitters (services, messages); every reported
+                 count over-estimates the true count by at most its
+                 `error`, and errors never exceed total / k
+    TDigest      quantiles (response time); rank error is smallest at the
+                 tails and shrinks as `compression` grows
+
+Each sketch has a fixed size whatever the input, and `merge` combines two
+sketches into the sketch of both streams. So per-bucket sketches can be
+merged across time buckets, and per-replica sketches of the same bucket
+across collector replicas. `to_doc`/`from_doc` convert to MongoDB documents.
+`LogSketches` bundles the sketches kept per group of logs.
+
+Hashing is deterministic (pandas' hash_array with its fixed key), so
+sketches built in different processes agree.
+"""
+
+import heapq
+import math
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+MESSAGE_PREFIX = 200
+_POWERS_OF_TWO = np.array([1 << i for i in range(64)], dtype=np.uint64)
+
+
+def _hash(values):
+    """64-bit hashes of values, compared by their string form"""
+    return pd.util.hash_array(np.array([str(v) for v in values], dtype=object), categorize=False)
+
+
+class HyperLogLog:
+    """Distinct count estimate in 2**p one-byte registers"""
+
+    def __init__(self, p=12, registers=None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = registers if registers is not None else np.zeros(self.m, dtype=np.uint8)
+
+    def update(self, values):
+        values = [v for v in values if v is not None]
+        if not values:
+            return
+        hashes = _hash(values)
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = hashes << np.uint64(self.p)
+        # Position of the first 1 bit in the remaining bits (bit_length via exact uint64 search)
+        bit_length = np.searchsorted(_POWERS_OF_TWO, rest, side="right")
+        rank = np.minimum(64 - bit_length + 1, 64 - self.p + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError("can't merge HyperLogLogs of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def cardinality(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are still empty
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def __len__(self):
+        """Estimated number of distinct values (so a sketch can stand in for a set)"""
+        return self.cardinality()
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(self.m)
+
+    def to_doc(self):
+        return {"p": self.p, "registers": self.registers.tobytes()}
+
+    @classmethod
+    def from_doc(cls, doc):
+        return cls(doc["p"], np.frombuffer(doc["registers"], dtype=np.uint8).copy())
+
+
+class SpaceSaving:
+    """The k most frequent items with over-estimated counts and their error bounds"""
+
+    def __init__(self, k=100):
+        self.k = k
+        self.counts = {}   # item -> [count, error]
+        self.total = 0
+
+    def update(self, values):
+        batch = Counter(v for v in values if v is not None)
+        self.total += sum(batch.values())
+        new = []
+        for item, n in batch.items():
+            entry = self.counts.get(item)
+            if entry is not None:
+                entry[0] += n
+            else:
+                new.append((n, item))
+
+        heap = None
+        for n, item in sorted(new, key=lambda pair: pair[0], reverse=True):
+            if len(self.counts) < self.k:
+                self.counts[item] = [n, 0]
+                continue
+            if heap is None:
+                # One heap per batch instead of a scan for the smallest item on every eviction
+                heap = [(count, key) for key, (count, _) in self.counts.items()]
+                heapq.heapify(heap)
+            floor, smallest = heapq.heappop(heap)
+            del self.counts[smallest]
+            self.counts[item] = [floor + n, floor]
+            heapq.heappush(heap, (floor + n, item))
+
+    def add(self, item, n=1):
+        self.total += n
+        entry = self.counts.get(item)
+        if entry is not None:
+            entry[0] += n
+        elif len(self.counts) < self.k:
+            self.counts[item] = [n, 0]
+        else:
+            # Replace the smallest item; the newcomer may have been it all along
+            smallest = min(self.counts, key=lambda key: self.counts[key][0])
+            floor = self.counts.pop(smallest)[0]
+            self.counts[item] = [floor + n, floor]
+
+    def _floor(self):
+        """Largest count an item missing from a full sketch could have"""
+        return min(c for c, _ in self.counts.values()) if len(self.counts) >= self.k else 0
+
+    def merge(self, other):
+        mine, theirs = self._floor(), other._floor()
+        combined = {}
+        for item in self.counts.keys() | other.counts.keys():
+            c1, e1 = self.counts.get(item, (mine, mine))
+            c2, e2 = other.counts.get(item, (theirs, theirs))
+            combined[item] = [c1 + c2, e1 + e2]
+        kept = sorted(combined.items(), key=lambda kv: kv[1][0], reverse=True)[:self.k]
+        self.counts = {item: entry for item, entry in kept}
+        self.total += other.total
+        return self
+
+    def top(self, n=10):
+        """[(item, count, error)] by count; the true count is in [count - error, count]"""
+        ranked = sorted(self.counts.items(), key=lambda kv: kv[1][0], reverse=True)[:n]
+        return [(item, count, error) for item, (count, error) in ranked]
+
+    @property
+    def max_error(self):
+        return self.total / self.k
+
+    def to_doc(self):
+        return {"k": self.k, "total": self.total, "items": [[i, c, e] for i, (c, e) in self.counts.items()]}
+
+    @classmethod
+    def from_doc(cls, doc):
+        sketch = cls(doc["k"])
+        sketch.total = doc["total"]
+        sketch.counts = {item: [count, error] for item, count, error in doc["items"]}
+        return sketch
+
+
+class TDigest:
+    """Merging t-digest: weighted centroids, small near the tails, for quantile estimates"""
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer = []   # (means, weights) not yet merged into the centroids
+        self._buffered = 0
+
+    @property
+    def count(self):
+        return float(self.weights.sum()) + self._buffered
+
+    def update(self, values):
+        values = np.asarray([v for v in values if v is not None], dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if values.size:
+            self._add(values, np.ones(values.size))
+
+    def _add(self, means, weights):
+        self.min = min(self.min, float(means.min()))
+        self.max = max(self.max, float(means.max()))
+        self._buffer.append((means, weights))
+        self._buffered += float(weights.sum())
+        if sum(m.size for m, _ in self._buffer) > 10 * self.compression:
+            self._compress()
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        means = np.concatenate([self.means] + [m for m, _ in self._buffer])
+        weights = np.concatenate([self.weights] + [w for _, w in self._buffer])
+        self._buffer, self._buffered = [], 0
+        order = np.argsort(means, kind="mergesort")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+
+        # k1 scale: centroids may span one unit of k(q) = compression / 2pi * asin(2q - 1)
+        scale = self.compression / (2 * math.pi)
+
+        def q_limit(q):
+            k = scale * math.asin(2 * q - 1) + 1
+            return 1.0 if k >= scale * math.pi / 2 else (math.sin(k / scale) + 1) / 2
+
+        new_means, new_weights = [], []
+        current_mean, current_weight = means[0], weights[0]
+        so_far = 0.0
+        limit = q_limit(0.0)
+        for mean, weight in zip(means[1:], weights[1:]):
+            if (so_far + current_weight + weight) / total <= limit:
+                current_weight += weight
+                current_mean += (mean - current_mean) * weight / current_weight
+            else:
+                new_means.append(current_mean)
+                new_weights.append(current_weight)
+                so_far += current_weight
+                limit = q_limit(so_far / total)
+                current_mean, current_weight = mean, weight
+        new_means.append(current_mean)
+        new_weights.append(current_weight)
+        self.means, self.weights = np.array(new_means), np.array(new_weights)
+
+    def merge(self, other):
+        other._compress()
+        if other.weights.size:
+            self._add(other.means, other.weights)
+            self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        """Estimated q-quantile (0..1), or None if nothing was added"""
+        self._compress()
+        if not self.weights.size:
+            return None
+        if self.weights.size == 1:
+            return float(self.means[0])
+        total = self.weights.sum()
+        target = q * total
+        # Each centroid's weight is centred on its mean; interpolate between neighbouring centres
+        centres = np.cumsum(self.weights) - self.weights / 2
+        if target <= centres[0]:
+            return float(self.min + (self.means[0] - self.min) * target / centres[0]) if centres[0] else self.min
+        if target >= centres[-1]:
+            tail = total - centres[-1]
+            return float(self.means[-1] + (self.max - self.means[-1]) * (target - centres[-1]) / tail) if tail else self.max
+        i = int(np.searchsorted(centres, target)) - 1
+        fraction = (target - centres[i]) / (centres[i + 1] - centres[i])
+        return float(self.means[i] + (self.means[i + 1] - self.means[i]) * fraction)
+
+    def to_doc(self):
+        self._compress()
+        return {
+            "compression": self.compression,
+            "means": self.means.tobytes(),
+            "weights": self.weights.tobytes(),
+            "min": self.min if self.weights.size else None,
+            "max": self.max if self.weights.size else None,
+        }
+
+    @classmethod
+    def from_doc(cls, doc):
+        digest = cls(doc["compression"])
+        digest.means = np.frombuffer(doc["means"], dtype=np.float64).copy()
+        digest.weights = np.frombuffer(doc["weights"], dtype=np.float64).copy()
+        if digest.weights.size:
+            digest.min, digest.max = doc["min"], doc["max"]
+        return digest
+
+
+def _field(log, name):
+    """A top-level field, or the same field in metadata"""
+    if log.get(name) is not None:
+        return log[name]
+    metadata = log.get('metadata')
+    return metadata.get(name) if isinstance(metadata, dict) else None
+
+
+def _number(value):
+    try:
+        return float(value) if value is not None and not isinstance(value, bool) else None
+    except (TypeError, ValueError):
+        return None
+
+
+class LogSketches:
+    """The sketches kept for a group of logs (one hour, one replica, or any merge of them)
+
+        users         HyperLogLog of userId (top-level or metadata)
+        services      HyperLogLog of service names
+        topServices   SpaceSaving of service names
+        topMessages   SpaceSaving of messages (first MESSAGE_PREFIX characters)
+        responseTime  TDigest of responseTime (top-level or metadata)
+    """
+
+    def __init__(self, top_k=100):
+        self.total = 0
+        self.users = HyperLogLog(12)
+        self.services = HyperLogLog(10)
+        self.top_services = SpaceSaving(top_k)
+        self.top_messages = SpaceSaving(2 * top_k)
+        self.response_time = TDigest()
+
+    def update(self, logs):
+        self.total += len(logs)
+        users = [_field(log, 'userId') for log in logs]
+        services = [log.get('service') or 'unknown' for log in logs]
+        self.users.update(users)
+        self.services.update(services)
+        self.top_services.update(services)
+        self.top_messages.update((log.get('message') or '')[:MESSAGE_PREFIX] for log in logs)
+        self.response_time.update([_number(_field(log, 'responseTime')) for log in logs])
+
+    def merge(self, other):
+        self.total += other.total
+        self.users.merge(other.users)
+        self.services.merge(other.services)
+        self.top_services.merge(other.top_services)
+        self.top_messages.merge(other.top_messages)
+        self.response_time.merge(other.response_time)
+        return self
+
+    @classmethod
+    def merged(cls, docs):
+        """One LogSketches for any number of stored documents (None if there are none)"""
+        merged = None
+        for doc in docs:
+            sketches = cls.from_doc(doc)
+            merged = sketches if merged is None else merged.merge(sketches)
+        return merged
+
+    def to_doc(self):
+        return {
+            "total": self.total,
+            "users": self.users.to_doc(),
+            "services": self.services.to_doc(),
+            "topServices": self.top_services.to_doc(),
+            "topMessages": self.top_messages.to_doc(),
+            "responseTime": self.response_time.to_doc(),
+        }
+
+    @classmethod
+    def from_doc(cls, doc):
+        sketches = cls()
+        sketches.total = doc.get("total", 0)
+        sketches.users = HyperLogLog.from_doc(doc["users"])
+        sketches.services = HyperLogLog.from_doc(doc["services"])
+        sketches.top_services = SpaceSaving.from_doc(doc["topServices"])
+        sketches.top_messages = SpaceSaving.from_doc(doc["topMessages"])
+        sketches.response_time = TDigest.from_doc(doc["responseTime"])
+        return sketches
@@ -0,0 +1,70 @@
+"""
+Timestamp normalization for stored logs.
+
+New logs store `timestamp` as a BSON datetime (naive UTC). Older documents
+hold ISO strings, so range queries go through `since_filter`, which matches
+both representations until scripts/migrate-timestamps.py has converted them.
+"""
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+def parse_timestamp(value):
+    """Parse a client-supplied timestamp into a naive UTC datetime.
+
+    Accepts datetimes, epoch seconds/milliseconds and ISO-8601 or RFC 2822
+    strings. Raises ValueError for anything else.
+    """
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, bool):
+        raise ValueError(f"invalid timestamp: {value!r}")
+    elif isinstance(value, (int, float)):
+        # Heuristic: anything past ~2286 in seconds is really milliseconds
+        seconds = value / 1000 if value > 1e10 else value
+        parsed = datetime.fromtimestamp(seconds, tz=timezone.utc)
+    elif isinstance(value, str) and value.strip():
+        text = value.strip()
+        try:
+            parsed = datetime.fromisoformat(text.replace('Z', '+00:00').replace('z', '+00:00'))
+        except ValueError:
+            try:
+                parsed = parsedate_to_datetime(text)
+            except (TypeError, ValueError):
+                raise ValueError(f"invalid timestamp: {value!r}")
+    else:
+        raise ValueError(f"invalid timestamp: {value!r}")
+
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def format_timestamp(value):
+    """ISO-8601 string for API responses (datetimes are UTC, suffixed with Z)"""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.isoformat(timespec='milliseconds') + 'Z'
+    return value
+
+
+def since_filter(start, field="timestamp"):
+    """Match documents at or after `start`, stored as datetimes or legacy strings"""
+    return {"$or": [
+        {field: {"$gte": start}},
+        {field: {"$gte": start.isoformat()}},
+    ]}
+
+
+def range_filter(start=None, end=None, field="timestamp"):
+    """Match documents in [start, end), stored as datetimes or legacy strings"""
+    as_dates, as_strings = {}, {}
+    if start is not None:
+        as_dates["$gte"], as_strings["$gte"] = start, start.isoformat()
+    if end is not None:
+        as_dates["$lt"], as_strings["$lt"] = end, end.isoformat()
+    if not as_dates:
+        return {}
+    return {"$or": [{field: as_dates}, {field: as_strings}]}
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from logviz_common import archive
+
+
+def test_log_fields_use_the_log_names_of_typed_columns():
+    assert set(archive.TYPED_FIELDS) <= set(archive.COLUMNS)
+    assert "extra" not in archive.LOG_FIELDS
+    assert {"responseTime", "statusCode", "userId"} <= set(archive.LOG_FIELDS)
+    assert not set(archive.TYPED_FIELDS) & set(archive.LOG_FIELDS)
+
+
+def test_archived_logs_fill_the_log_fields():
+    timestamp = datetime(2025, 1, 1, 12)
+    log = {
+        "_id": "abc", "timestamp": timestamp, "level": "error", "service": "api", "message": "boom",
+        "metadata": {"region": "eu"}, "responseTime": 120.5, "statusCode": 502, "userId": "u1",
+    }
+
+    restored = archive.from_row(archive.to_row(log, timestamp))
+
+    assert set(restored) == set(archive.LOG_FIELDS)
+    assert restored["responseTime"] == 120.5 and restored["statusCode"] == 502 and restored["userId"] == "u1"
@@ -0,0 +1,103 @@
+import asyncio
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+
+from logviz_common import connections
+
+ENV = ["MONGO_MAX_POOL_SIZE", "MONGO_WRITE_CONCERN", "MONGO_RETRY_WRITES", "MONGO_SOCKET_TIMEOUT_MS",
+       "REDIS_MAX_CONNECTIONS", "REDIS_SOCKET_TIMEOUT", "MONGO_URI", "REDIS_URL"]
+
+
+@pytest.fixture(autouse=True)
+def clean_env(monkeypatch):
+    for name in ENV:
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_mongo_options_fail_fast_by_default():
+    options = connections.mongo_options("svc")
+
+    assert options["appname"] == "svc" and options["maxPoolSize"] == 100
+    assert options["serverSelectionTimeoutMS"] == 5000 and options["waitQueueTimeoutMS"] == 10000
+    assert options["retryWrites"] is True and "w" not in options
+
+
+@pytest.mark.parametrize("value, expected", [("1", 1), ("majority", "majority")])
+def test_mongo_write_concern_is_a_number_or_a_mode(monkeypatch, value, expected):
+    monkeypatch.setenv("MONGO_WRITE_CONCERN", value)
+    monkeypatch.setenv("MONGO_RETRY_WRITES", "false")
+
+    options = connections.mongo_options("svc")
+
+    assert options["w"] == expected and options["retryWrites"] is False
+
+
+def test_mongo_client_applies_the_options_without_connecting(monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "7")
+    monkeypatch.setenv("MONGO_WRITE_CONCERN", "majority")
+    monkeypatch.setenv("MONGO_SOCKET_TIMEOUT_MS", "1500")
+
+    client = connections.mongo_client("svc", uri="mongodb://db.invalid:27017")
+    try:
+        assert client.options.pool_options.max_pool_size == 7
+        assert client.options.pool_options.socket_timeout == 1.5
+        assert client.write_concern.document == {"w": "majority"}
+        assert client.options.retry_writes and client.options.pool_options.metadata["application"]["name"] == "svc"
+    finally:
+        client.close()
+
+
+def test_async_mongo_client_shares_the_options(monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "9")
+
+    async def build():
+        client = connections.async_mongo_client("svc", uri="mongodb://db.invalid:27017")
+        try:
+            return client.options.pool_options.max_pool_size
+        finally:
+            await client.close()
+
+    assert asyncio.run(build()) == 9
+
+
+@pytest.mark.parametrize("factory", [connections.redis_client, connections.async_redis_client])
+def test_redis_clients_are_pooled_and_time_out(monkeypatch, factory):
+    monkeypatch.setenv("REDIS_MAX_CONNECTIONS", "12")
+    monkeypatch.setenv("REDIS_SOCKET_TIMEOUT", "0.5")
+
+    client = factory("redis://cache.invalid:6379/2")
+    pool = client.connection_pool
+
+    assert pool.max_connections == 12
+    assert pool.connection_kwargs["socket_timeout"] == 0.5
+    assert pool.connection_kwargs["socket_connect_timeout"] == 2.0
+    assert pool.connection_kwargs["decode_responses"] and pool.connection_kwargs["db"] == 2
+
+
+def test_probe_reports_latency_or_the_error():
+    def no_primary(name):
+        raise TimeoutError("no primary")
+
+    down = SimpleNamespace(admin=SimpleNamespace(command=no_primary))
+
+    result = connections.probe(down, fakeredis.FakeRedis())
+
+    assert result["mongo"] == {"ok": False, "error": "no primary"}
+    assert result["redis"]["ok"] and result["redis"]["latencyMs"] >= 0
+
+
+def test_async_probe_awaits_both_backends():
+    async def ping(name):
+        return {"ok": 1}
+
+    async def check():
+        server = fakeredis.FakeServer()
+        server.connected = False
+        mongo = SimpleNamespace(admin=SimpleNamespace(command=ping))
+        return await connections.async_probe(mongo, fakeredis.FakeAsyncRedis(server=server))
+
+    result = asyncio.run(check())
+
+    assert result["mongo"]["ok"] and not result["redis"]["ok"]
@@ -0,0 +1,104 @@
+import json
+import time
+
+import fakeredis
+import pytest
+
+from logviz_common.events import LOGS_STREAM_KEY, StreamConsumer
+
+GROUP = "analyzer"
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+
+
+def consumer(redis, name="worker-1", **kwargs):
+    stream = StreamConsumer(redis, GROUP, consumer=name, count=10, block_ms=None, **kwargs)
+    stream.ensure_group("0")
+    return stream
+
+
+def publish(redis, *messages):
+    return [redis.xadd(LOGS_STREAM_KEY, {"data": json.dumps({"message": message})}) for message in messages]
+
+
+def pending(redis, name=None):
+    summary = redis.xpending(LOGS_STREAM_KEY, GROUP)
+    if name is None:
+        return summary["pending"]
+    return {c["name"]: c["pending"] for c in summary["consumers"]}.get(name, 0)
+
+
+def test_read_then_ack_clears_the_pending_entries(redis):
+    stream = consumer(redis)
+    ids = publish(redis, "a", "b")
+
+    batch = stream.read()
+
+    assert batch == [(ids[0], {"message": "a"}), (ids[1], {"message": "b"})]
+    assert pending(redis) == 2
+    stream.ack([entry_id for entry_id, _ in batch])
+    assert pending(redis) == 0 and stream.read() == []
+    assert stream.stats["read"] == 2 and stream.stats["acked"] == 2
+
+
+def test_ensure_group_is_idempotent(redis):
+    consumer(redis).ensure_group("0")
+
+    assert [group["name"] for group in redis.xinfo_groups(LOGS_STREAM_KEY)] == [GROUP]
+
+
+def test_restart_replays_unacknowledged_entries_before_new_ones(redis):
+    publish(redis, "a", "b")
+    consumer(redis).read()
+    publish(redis, "c")
+
+    restarted = consumer(redis)
+
+    assert [log["message"] for _, log in restarted.read()] == ["a", "b"]
+    assert [log["message"] for _, log in restarted.read()] == ["c"]
+    assert restarted.stats["replayed"] == 2
+
+
+def test_replay_pending_redelivers_after_a_failed_batch(redis):
+    stream = consumer(redis)
+    publish(redis, "a")
+    first = stream.read()
+
+    stream.replay_pending()
+
+    assert stream.read() == first
+
+
+def test_entries_left_by_a_dead_consumer_are_claimed(redis):
+    publish(redis, "a", "b")
+    consumer(redis, "gone").read()
+    survivor = consumer(redis, "alive", claim_idle_ms=20)
+    assert survivor.read() == []
+
+    time.sleep(0.05)
+
+    assert [log["message"] for _, log in survivor.read()] == ["a", "b"]
+    assert pending(redis, "gone") == 0 and pending(redis, "alive") == 2
+    assert survivor.stats["claimed"] == 2
+
+
+def test_undecodable_entries_are_acknowledged_and_skipped(redis):
+    stream = consumer(redis)
+    redis.xadd(LOGS_STREAM_KEY, {"data": "not json"})
+    redis.xadd(LOGS_STREAM_KEY, {"other": "field"})
+    publish(redis, "ok")
+
+    assert [log["message"] for _, log in stream.read()] == ["ok"]
+    assert pending(redis) == 1
+
+
+def test_lag_counts_entries_not_yet_delivered(redis):
+    stream = consumer(redis)
+    publish(redis, "a", "b", "c")
+    stream.read()
+    publish(redis, "d")
+
+    assert stream.lag() == {"pending": 3, "lag": 1}
@@ -0,0 +1,12 @@
+from logviz_common.field_names import escape_key, unescape_key
+
+
+def test_escape_key_round_trips():
+    for key in ["a.b", "$where", "back\\slash", "\\u002e", "plain"]:
+        assert unescape_key(escape_key(key)) == key
+
+
+def test_escaped_keys_are_valid_field_names():
+    for key in ["a.b", "$where", "v1.2.$3"]:
+        escaped = escape_key(key)
+        assert "." not in escaped and "$" not in escaped
@@ -0,0 +1,84 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from logviz_common.sketches import HyperLogLog, LogSketches, SpaceSaving, TDigest
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(7)
+
+
+def test_hyperloglog_merge_matches_one_sketch_of_both_streams():
+    left, right, both = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    a = [f"user-{i}" for i in range(0, 60_000)]
+    b = [f"user-{i}" for i in range(40_000, 100_000)]
+    left.update(a)
+    right.update(b)
+    both.update(a + b)
+
+    left.merge(right)
+
+    assert np.array_equal(left.registers, both.registers)
+    assert abs(left.cardinality() / 100_000 - 1) < 3 * left.relative_error
+
+
+def test_hyperloglog_refuses_mixed_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(12).merge(HyperLogLog(10))
+
+
+def test_space_saving_merge_keeps_heavy_hitters_within_their_error(rng):
+    items = [f"service-{i}" for i in np.minimum(rng.zipf(1.3, 50_000), 2_000)]
+    truth = Counter(items)
+    parts = [SpaceSaving(50) for _ in range(4)]
+    for i, part in enumerate(parts):
+        part.update(items[i::4])
+
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+
+    assert merged.total == len(items)
+    top = merged.top(10)
+    assert [item for item, _, _ in top[:5]] == [item for item, _ in truth.most_common(5)]
+    for item, count, error in top:
+        assert count - error <= truth[item] <= count
+
+
+def test_tdigest_merge_quantiles_stay_close(rng):
+    values = rng.gamma(2.0, 80.0, 40_000)
+    parts = [TDigest() for _ in range(8)]
+    for i, part in enumerate(parts):
+        part.update(list(values[i::8]))
+
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+
+    assert merged.count == len(values)
+    for q in (0.5, 0.95, 0.99):
+        assert merged.quantile(q) == pytest.approx(np.quantile(values, q), rel=0.02)
+
+
+def test_log_sketches_merge_through_stored_documents(rng):
+    logs = [
+        {"service": f"service-{s}", "message": f"failed order {m}", "userId": f"user-{u}",
+         "metadata": {"responseTime": float(rt)}}
+        for s, m, u, rt in zip(rng.integers(0, 20, 8_000), rng.integers(0, 300, 8_000),
+                               rng.integers(0, 3_000, 8_000), rng.gamma(2.0, 80.0, 8_000))
+    ]
+    parts = [LogSketches() for _ in range(6)]
+    for i, part in enumerate(parts):
+        part.update(logs[i::6])
+
+    merged = LogSketches.merged(part.to_doc() for part in parts)
+
+    assert merged.total == len(logs)
+    assert merged.services.cardinality() == 20
+    users = len({log["userId"] for log in logs})
+    assert abs(merged.users.cardinality() / users - 1) < 3 * merged.users.relative_error
+    assert merged.response_time.count == len(logs)
+    assert LogSketches.merged([]) is None
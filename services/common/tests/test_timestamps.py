@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import pytest
+
+from logviz_common.timestamps import format_timestamp, parse_timestamp, range_filter, since_filter
+
+
+@pytest.mark.parametrize("value", [
+    "2025-01-01T10:00:00Z",
+    "2025-01-01T11:00:00+01:00",
+    1735725600,
+    1735725600000,
+    "Wed, 01 Jan 2025 10:00:00 GMT",
+])
+def test_parse_timestamp_normalizes_to_naive_utc(value):
+    assert parse_timestamp(value) == datetime(2025, 1, 1, 10)
+
+
+@pytest.mark.parametrize("value", [None, True, "", "yesterday", [2025]])
+def test_parse_timestamp_rejects_other_values(value):
+    with pytest.raises(ValueError):
+        parse_timestamp(value)
+
+
+def test_format_timestamp_is_iso_with_z():
+    assert format_timestamp(datetime(2025, 1, 1, 10, 0, 0, 123456)) == "2025-01-01T10:00:00.123Z"
+    assert format_timestamp("legacy") == "legacy"
+
+
+def test_filters_match_datetimes_and_legacy_strings():
+    start, end = datetime(2025, 1, 1), datetime(2025, 1, 2)
+    assert since_filter(start) == {"$or": [
+        {"timestamp": {"$gte": start}},
+        {"timestamp": {"$gte": "2025-01-01T00:00:00"}},
+    ]}
+    assert range_filter(start, end, field="at") == {"$or": [
+        {"at": {"$gte": start, "$lt": end}},
+        {"at": {"$gte": "2025-01-01T00:00:00", "$lt": "2025-01-02T00:00:00"}},
+    ]}
+    assert range_filter() == {}
@@ -1,10 +1,27 @@
 from fastapi import FastAPI, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pymongo import MongoClient
-import redis
+import asyncio
 import os
-from datetime import datetime, timedelta
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 from collections import Counter
+from cache import ResponseCache, VersionBumper
+from logviz_common.archive import ArchiveReader
+from logviz_common.events import StreamConsumer
+from logviz_common.field_names import unescape_key
+from logviz_common.sketches import LogSketches
+from logviz_common.timestamps import since_filter
+from templates import TemplateStore, TemplateMiner, top_pipeline, describe_top
+from history import HistoryEngine, HistoryQuery
+from logviz_common.connections import (
+    mongo_client as connect_mongo, redis_client as connect_redis,
+    async_mongo_client, async_redis_client, async_probe
+)
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="LogVizPro Analyzer")
 
@@ -15,75 +32,397 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# DB connections
-mongo_client = MongoClient(os.getenv('MONGO_URI'))
+# DB connections: async clients for the endpoints, so a slow aggregation never
+# holds the event loop or a threadpool slot; blocking ones for the stream consumer thread
+mongo_client = async_mongo_client('log-analyzer')
 db = mongo_client.logvizpro
 logs_collection = db.logs
+# Maintained by log-collector (see services/log-collector/rollups.py)
+rollups_collection = db.log_rollups
+USE_ROLLUPS = os.getenv('ANALYTICS_USE_ROLLUPS', 'true').lower() == 'true'
+# Per-hour, per-collector sketches (see services/log-collector/sketch_rollups.py)
+sketches_collection = db.log_sketches
+# Summary default: services, distinct users and percentiles from sketches instead of raw logs
+APPROXIMATE = os.getenv('ANALYTICS_APPROXIMATE', 'false').lower() == 'true'
+# Logs before the watermark in db.archive_state live in log-collector's Parquet archive
+archive_reader = ArchiveReader(os.getenv('ARCHIVE_PATH', 'archive'))
+history_engine = HistoryEngine(archive_reader)
+
+redis_client = async_redis_client()
+
+events_mongo_client = connect_mongo('log-analyzer-events')
+events_redis_client = connect_redis()
 
-redis_client = redis.from_url(os.getenv('REDIS_URL'), decode_responses=True)
+# Short-lived result cache, invalidated as new logs arrive on the event stream
+response_cache = ResponseCache(redis_client, ttl=int(os.getenv('ANALYTICS_CACHE_TTL', 10)))
+# New logs make cached results stale at most once per interval, not on every stream batch
+version_bumper = VersionBumper(events_redis_client, min_interval=float(os.getenv('ANALYTICS_CACHE_MIN_STALENESS', 5)))
+
+# This service's position in log-collector's `logs:stream`
+log_events = StreamConsumer(events_redis_client, "log-analyzer")
+
+# Message templates mined from the same stream; topErrors is grouped by template
+template_store = TemplateStore(
+    events_mongo_client.logvizpro.log_templates,
+    events_mongo_client.logvizpro.template_rollups,
+    TemplateMiner(
+        depth=int(os.getenv('TEMPLATE_TREE_DEPTH', 4)),
+        similarity=float(os.getenv('TEMPLATE_SIMILARITY', 0.5))
+    )
+)
 
 @app.get("/health")
-def health():
-    return {"status": "healthy", "service": "log-analyzer"}
+async def health():
+    return {
+        "status": "healthy",
+        "service": "log-analyzer",
+        "dependencies": await async_probe(mongo_client, redis_client),
+        "cache": {**response_cache.snapshot(), "version": version_bumper.stats},
+        "events": {**log_events.stats, **await run_in_threadpool(log_events.lag)},
+        "templates": template_store.miner.stats,
+        "history": history_engine.stats
+    }
+
+def consume_log_events():
+    """Mine templates from every batch of new logs and bump the data version so cached analytics go stale"""
+    try:
+        template_store.ensure_indexes()
+        logger.info(f"Loaded {template_store.load()} log templates")
+    except Exception as e:
+        logger.error(f"Failed to load log templates: {e}")
+    while True:
+        try:
+            entries = log_events.read()
+            if entries:
+                template_store.record([log for _, log in entries], batch_id=entries[0][0])
+                version_bumper.changed()
+                log_events.ack([entry_id for entry_id, _ in entries])
+            version_bumper.maybe_bump()
+        except Exception as e:
+            logger.error(f"Log event consumer error: {e}")
+            log_events.replay_pending()
+            time.sleep(1)
+
+@app.on_event("startup")
+def start_log_events():
+    threading.Thread(target=consume_log_events, name="log-events", daemon=True).start()
+
+async def archive_split(start_time):
+    """(start of the hot query, archived window or None) for logs since start_time"""
+    doc = await db.archive_state.find_one({"_id": "logs"}, {"watermark": 1})
+    watermark = doc.get("watermark") if doc else None
+    if watermark is None or start_time >= watermark:
+        return start_time, None
+    return watermark, (start_time, watermark)
+
+def archived_counts(start, end):
+    """Level, service and per-hour counts of archived logs in [start, end)"""
+    rows = history_engine.run(HistoryQuery(start, end, group_by=["bucket", "level", "service"], interval="1h"))
+    levels, services, hourly = Counter(), Counter(), {}
+    for row in rows:
+        levels[row["level"]] += row["count"]
+        services[row["service"]] += row["count"]
+        counts = hourly.setdefault(row["bucket"][:13], {"total": 0, "errors": 0})
+        counts["total"] += row["count"]
+        if row["level"] in ("error", "fatal"):
+            counts["errors"] += row["count"]
+    return levels, services, hourly
+
+def archived_errors(start, end, limit):
+    table = archive_reader.scan(start, end, levels=["error", "fatal"], columns=["timestamp", "message", "service"])
+    return table.sort_by([("timestamp", "descending")]).slice(0, limit).select(["message", "service"]).to_pylist()
+
+class RollupCoverage:
+    """Whether rollups count every log: enabled, and the collector has backfilled logs from before them"""
+
+    def __init__(self, rollups, enabled=True):
+        self.rollups = rollups
+        self.enabled = enabled
+        # Coverage never goes back to incomplete, so it is only read until it is complete
+        self.complete = False
+
+    async def ready(self):
+        if not self.enabled:
+            return False
+        if not self.complete:
+            doc = await self.rollups.find_one({"_id": "coverage"}, {"complete": 1})
+            self.complete = bool(doc and doc.get("complete"))
+        return self.complete
+
+rollup_coverage = RollupCoverage(rollups_collection, enabled=USE_ROLLUPS)
+
+async def load_hourly_rollups(start_time):
+    """Per-hour counts since start_time, built from the collector's rollups.
+
+    Whole hours come from hour rollups; the partial first hour is summed from
+    minute rollups so the window starts on the minute.
+    """
+    start_hour = start_time.isoformat()[:13]
+    start_minute = start_time.isoformat()[:16]
+    
+    hour_docs, minute_docs = await asyncio.gather(
+        rollups_collection.find({
+            "granularity": "hour",
+            "bucket": {"$gt": start_hour}
+        }).to_list(None),
+        rollups_collection.find({
+            "granularity": "minute",
+            "bucket": {"$gte": start_minute, "$lt": start_hour + ";"}
+        }).to_list(None)
+    )
+    
+    hourly = {}
+    for doc in hour_docs + minute_docs:
+        hour = doc["bucket"][:13]
+        counts = hourly.setdefault(hour, {"total": 0, "errors": 0, "levels": Counter(), "services": Counter()})
+        counts["total"] += doc.get("total", 0)
+        counts["errors"] += doc.get("errors", 0)
+        counts["levels"].update({unescape_key(k): v for k, v in doc.get("levels", {}).items()})
+        counts["services"].update({unescape_key(k): v for k, v in doc.get("services", {}).items()})
+    return hourly
+
+async def load_sketches(start_time):
+    """Every collector's sketches for the hours since start_time, merged (None if there are none).
+
+    Sketches are kept per hour, so the window starts at the top of start_time's hour.
+    """
+    docs = await sketches_collection.find({"bucket": {"$gte": start_time.isoformat()[:13]}}).to_list(None)
+    return await run_in_threadpool(LogSketches.merged, docs)
+
+def describe_sketches(sketches, limit=10):
+    """Summary fields estimated from merged sketches, with their error bounds"""
+    services = sketches.top_services.top(limit)
+    percentiles = {name: sketches.response_time.quantile(q) for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))}
+    return {
+        "byService": {service: count for service, count, _ in services},
+        "uniqueUsers": sketches.users.cardinality(),
+        "uniqueServices": sketches.services.cardinality(),
+        "responseTime": {name: round(value, 2) if value is not None else None for name, value in percentiles.items()},
+        "topMessages": [
+            {"message": message[:100], "count": count}
+            for message, count, _ in sketches.top_messages.top(limit)
+        ],
+        "errorBounds": {
+            # True counts lie in [count - error, count]
+            "byService": {service: error for service, _, error in services},
+            "topMessages": [error for _, _, error in sketches.top_messages.top(limit)],
+            # Relative standard error of the distinct counts
+            "uniqueUsers": round(sketches.users.relative_error, 4),
+            "uniqueServices": round(sketches.services.relative_error, 4)
+        }
+    }
+
+async def aggregate_summary(start_time):
+    """Level/service counts and top errors computed server-side in one pass, plus the archive"""
+    hot_start, archived = await archive_split(start_time)
+    cursor = await logs_collection.aggregate([
+        {"$match": since_filter(hot_start)},
+        {"$project": {"level": 1, "service": 1, "message": 1, "timestamp": 1}},
+        {"$facet": {
+            "byLevel": [
+                {"$group": {"_id": {"$ifNull": ["$level", "info"]}, "count": {"$sum": 1}}}
+            ],
+            "byService": [
+                {"$group": {"_id": {"$ifNull": ["$service", "unknown"]}, "count": {"$sum": 1}}}
+            ],
+            "topErrors": [
+                {"$match": {"level": {"$in": ["error", "fatal"]}}},
+                {"$sort": {"timestamp": -1, "_id": -1}},
+                {"$limit": 5},
+                {"$project": {"message": 1, "service": 1}}
+            ]
+        }}
+    ])
+    result = next(iter(await cursor.to_list(1)), {})
+    
+    levels = Counter({doc["_id"]: doc["count"] for doc in result.get("byLevel", [])})
+    services = Counter({doc["_id"]: doc["count"] for doc in result.get("byService", [])})
+    error_docs = result.get("topErrors", [])
+    if archived:
+        archived_levels, archived_services, _ = await run_in_threadpool(archived_counts, *archived)
+        levels.update(archived_levels)
+        services.update(archived_services)
+        if len(error_docs) < 5:
+            error_docs += await run_in_threadpool(archived_errors, *archived, 5 - len(error_docs))
+    top_errors = [
+        {"message": (doc.get("message") or "")[:100], "service": doc.get("service")}
+        for doc in error_docs
+    ]
+    return levels, services, top_errors
+
+async def aggregate_hourly(start_time):
+    """Per-hour totals and error counts grouped server-side on the timestamp prefix, plus the archive"""
+    hot_start, archived = await archive_split(start_time)
+    cursor = await logs_collection.aggregate([
+        {"$match": since_filter(hot_start)},
+        {"$group": {
+            "_id": {"$cond": [  # YYYY-MM-DDTHH
+                {"$eq": [{"$type": "$timestamp"}, "date"]},
+                {"$dateToString": {"format": "%Y-%m-%dT%H", "date": "$timestamp"}},
+                {"$substrBytes": ["$timestamp", 0, 13]}
+            ]},
+            "total": {"$sum": 1},
+            "errors": {"$sum": {"$cond": [{"$in": ["$level", ["error", "fatal"]]}, 1, 0]}}
+        }}
+    ])
+    hourly = {
+        doc["_id"]: {"total": doc["total"], "errors": doc["errors"]}
+        for doc in await cursor.to_list(None)
+    }
+    if archived:
+        _, _, archived_hourly = await run_in_threadpool(archived_counts, *archived)
+        for hour, counts in archived_hourly.items():
+            # The watermark is on a day boundary, so no hour is split between the tiers
+            hourly[hour] = counts
+    return hourly
+
+async def get_top_errors(start_time, limit=5):
+    """Most recent errors since start_time, newest first, then the archive's"""
+    hot_start, archived = await archive_split(start_time)
+    docs = await logs_collection.find(
+        {**since_filter(hot_start), "level": {"$in": ["error", "fatal"]}},
+        {"_id": 0, "message": 1, "service": 1}
+    ).sort([("timestamp", -1), ("_id", -1)]).limit(limit).to_list(None)
+    if archived and len(docs) < limit:
+        docs += await run_in_threadpool(archived_errors, *archived, limit - len(docs))
+    return [
+        {"message": (log.get('message') or '')[:100], "service": log.get('service')}
+        for log in docs
+    ]
+
+async def top_templates(start_time, levels=None, service=None, limit=10):
+    cursor = await db.template_rollups.aggregate(top_pipeline(start_time, levels, service, limit))
+    rows = await cursor.to_list(None)
+    docs = await db.log_templates.find({"_id": {"$in": [row["_id"] for row in rows]}}).to_list(None)
+    return describe_top(rows, docs)
+
+async def templates_covered_since():
+    """When template mining started, or None before it has"""
+    doc = await db.template_rollups.find_one({"_id": "coverage"}, {"since": 1})
+    return doc.get("since") if doc else None
+
+async def get_top_error_templates(start_time, limit=5):
+    """Most frequent error templates; empty until the template miner has seen errors"""
+    try:
+        return await top_templates(start_time, levels=["error", "fatal"], limit=limit)
+    except Exception as e:
+        logger.warning(f"Template counts unavailable: {e}")
+        return []
+
+async def get_top_error_messages(start_time, limit=5):
+    """Most frequent error messages in MongoDB since start_time, for windows mining doesn't cover"""
+    hot_start, _ = await archive_split(start_time)
+    cursor = await logs_collection.aggregate([
+        {"$match": {**since_filter(hot_start), "level": {"$in": ["error", "fatal"]}}},
+        {"$group": {"_id": "$message", "count": {"$sum": 1}, "service": {"$first": "$service"}}},
+        {"$sort": {"count": -1}},
+        {"$limit": limit}
+    ])
+    return [
+        {"message": (doc["_id"] or "")[:100], "service": doc.get("service"), "count": doc["count"]}
+        for doc in await cursor.to_list(None)
+    ]
+
+def is_success(result):
+    return result.get("success", False)
 
 @app.get("/api/analytics/summary")
-def get_summary(hours: int = Query(24, ge=1, le=168)):
+async def get_summary(hours: int = Query(24, ge=1, le=168), approximate: bool = None):
+    approximate = APPROXIMATE if approximate is None else approximate
+    return await response_cache.get_or_compute(
+        "summary", (hours, approximate), lambda: compute_summary(hours, approximate), is_success
+    )
+
+async def compute_summary(hours, approximate=False):
     try:
         # Calculate time range
         start_time = datetime.utcnow() - timedelta(hours=hours)
         
-        # Query logs
-        logs = list(logs_collection.find({
-            "timestamp": {"$gte": start_time.isoformat()}
-        }))
-        
-        total_logs = len(logs)
-        
-        # Count by level
-        levels = Counter([log.get('level', 'info') for log in logs])
-        
-        # Count by service
-        services = Counter([log.get('service', 'unknown') for log in logs])
+        estimates = None
+        if approximate:
+            # Level counts stay exact (rollups); nothing here scales with raw logs or users
+            use_rollups = await rollup_coverage.ready()
+            counted, sketches, top_errors = await asyncio.gather(
+                load_hourly_rollups(start_time) if use_rollups else aggregate_summary(start_time),
+                load_sketches(start_time), get_top_errors(start_time)
+            )
+            if use_rollups:
+                levels = Counter()
+                for counts in counted.values():
+                    levels.update(counts["levels"])
+            else:
+                levels = counted[0]
+            total_logs = sum(levels.values())
+            estimates = describe_sketches(sketches) if sketches else None
+            services = Counter(estimates["byService"]) if estimates else Counter()
+        elif await rollup_coverage.ready():
+            levels, services = Counter(), Counter()
+            for counts in (await load_hourly_rollups(start_time)).values():
+                levels.update(counts["levels"])
+                services.update(counts["services"])
+            total_logs = sum(levels.values())
+            top_errors = await get_top_errors(start_time)
+        else:
+            levels, services, top_errors = await aggregate_summary(start_time)
+            total_logs = sum(levels.values())
+        covered_since = await templates_covered_since()
+        if covered_since is not None and start_time >= covered_since:
+            top_errors = await get_top_error_templates(start_time) or top_errors
+        else:
+            top_errors = await get_top_error_messages(start_time) or top_errors
         
         # Calculate error rate
         error_count = levels.get('error', 0) + levels.get('fatal', 0)
         error_rate = (error_count / total_logs * 100) if total_logs > 0 else 0
         
-        return {
-            "success": True,
-            "data": {
-                "totalLogs": total_logs,
-                "errorRate": round(error_rate, 2),
-                "timeRange": f"{hours}h",
-                "byLevel": dict(levels),
-                "byService": dict(services.most_common(10)),
-                "topErrors": [
-                    {"message": log['message'][:100], "service": log.get('service')} 
-                    for log in logs if log.get('level') in ['error', 'fatal']
-                ][:5]
-            }
+        data = {
+            "totalLogs": total_logs,
+            "errorRate": round(error_rate, 2),
+            "timeRange": f"{hours}h",
+            "byLevel": dict(levels),
+            "byService": dict(services.most_common(10)),
+            "topErrors": top_errors
         }
+        if approximate:
+            data["approximate"] = True
+            if estimates:
+                data.update({k: v for k, v in estimates.items() if k != "byService"})
+        return {"success": True, "data": data}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@app.get("/api/analytics/templates")
+async def get_templates(
+    hours: int = Query(24, ge=1, le=168),
+    level: str = None,
+    service: str = None,
+    limit: int = Query(20, ge=1, le=200)
+):
+    return await response_cache.get_or_compute(
+        "templates", (hours, level, service, limit),
+        lambda: compute_templates(hours, level, service, limit), is_success
+    )
+
+async def compute_templates(hours, level, service, limit):
+    try:
+        start_time = datetime.utcnow() - timedelta(hours=hours)
+        levels = [level] if level else None
+        return {"success": True, "data": await top_templates(start_time, levels, service, limit)}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 @app.get("/api/analytics/trends")
-def get_trends(hours: int = Query(24)):
+async def get_trends(hours: int = Query(24)):
+    return await response_cache.get_or_compute("trends", (hours,), lambda: compute_trends(hours), is_success)
+
+async def compute_trends(hours):
     try:
         start_time = datetime.utcnow() - timedelta(hours=hours)
         
-        logs = list(logs_collection.find({
-            "timestamp": {"$gte": start_time.isoformat()}
-        }).sort("timestamp", 1))
-        
-        # Group by hour
-        hourly_data = {}
-        for log in logs:
-            hour = log['timestamp'][:13]  # YYYY-MM-DDTHH
-            if hour not in hourly_data:
-                hourly_data[hour] = {"total": 0, "errors": 0}
-            hourly_data[hour]["total"] += 1
-            if log.get('level') in ['error', 'fatal']:
-                hourly_data[hour]["errors"] += 1
+        if await rollup_coverage.ready():
+            hourly_data = await load_hourly_rollups(start_time)
+        else:
+            hourly_data = await aggregate_hourly(start_time)
         
         trends = [
             {"time": k, "total": v["total"], "errors": v["errors"]}
@@ -94,6 +433,71 @@ def get_trends(hours: int = Query(24)):
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+def parse_time(text):
+    """ISO-8601 query parameter as a naive UTC datetime; raises ValueError"""
+    parsed = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def split_list(text):
+    return [item.strip() for item in text.split(',') if item.strip()] if text else []
+
+@app.get("/api/analytics/history")
+async def get_history(
+    days: int = Query(30, ge=1, le=366),
+    to: str = None,
+    groupBy: str = "service",
+    metrics: str = "count,errorRate",
+    interval: str = "1h",
+    service: str = None,
+    level: str = None,
+    orderBy: str = None,
+    limit: int = Query(100, ge=1, le=10000)
+):
+    """Group-by/time-bucket/percentile/top-N over archived logs (before the archive watermark).
+
+    Only the Parquet archive is queried: logs from `range.archivedUntil` on
+    are still in MongoDB and not counted, and `range.complete` is false when
+    the requested range reaches past it.
+    """
+    params = (days, to, groupBy, metrics, interval, service, level, orderBy, limit)
+    return await response_cache.get_or_compute("history", params, lambda: compute_history(*params), is_success)
+
+async def compute_history(days, to, group_by, metrics, interval, service, level, order_by, limit):
+    try:
+        end = parse_time(to) if to else datetime.utcnow()
+        query = HistoryQuery(
+            end - timedelta(days=days), end,
+            group_by=split_list(group_by), metrics=split_list(metrics), interval=interval,
+            services=split_list(service), levels=split_list(level), order_by=order_by, limit=limit
+        )
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    
+    try:
+        doc = await db.archive_state.find_one({"_id": "logs"}, {"watermark": 1})
+        archived_until = doc.get("watermark") if doc else None
+        started = time.perf_counter()
+        rows = await run_in_threadpool(history_engine.run, query)
+        result = {
+            "success": True,
+            "data": rows,
+            "range": {
+                "from": query.start.isoformat(),
+                "to": query.end.isoformat(),
+                # Logs from here on are still in MongoDB, not in these results
+                "archivedUntil": archived_until.isoformat() if archived_until else None,
+                "complete": archived_until is not None and query.end <= archived_until
+            },
+            "tookMs": round((time.perf_counter() - started) * 1000, 1)
+        }
+        if not result["range"]["complete"]:
+            result["warning"] = "Only archived logs are included; logs after archivedUntil are not counted"
+        return result
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv('PORT', 8000))
@@ -0,0 +1,139 @@
+"""
+Redis-backed response cache for analytics endpoints.
+
+Cache keys embed a log data version that is bumped as new logs are read from
+the ingest stream, so new logs invalidate cached results without any key
+scans. The bump is rate-limited across all analyzers (`VersionBumper`):
+under steady ingest a cached result lives at least `min_interval` seconds
+instead of being invalidated by every batch. Concurrent misses for the same key are coalesced:
+one caller computes while the others wait for its result (single-flight,
+across requests and processes). Works on a redis.asyncio client, so a cache
+lookup or wait never blocks the event loop.
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Bumped by the log-analyzer stream consumer when new logs arrive
+LOGS_VERSION_KEY = "logs:version"
+# Held for min_interval after each bump; whoever sets it may bump
+VERSION_THROTTLE_KEY = "logs:version:throttle"
+
+
+class VersionBumper:
+    """Bumps the log data version for new logs, at most once per `min_interval` across the cluster.
+
+    Used from the (synchronous) stream consumer thread: call `changed()` for
+    each batch of new logs and `maybe_bump()` on every loop iteration, so a
+    bump held back by the rate limit still happens once it is allowed.
+    """
+
+    def __init__(self, redis_client, min_interval=5):
+        self.redis = redis_client
+        self.min_interval = min_interval
+        self._pending = False
+        self.stats = {"bumps": 0, "deferred": 0}
+
+    def changed(self):
+        self._pending = True
+
+    def maybe_bump(self):
+        """Bump if new logs arrived and no analyzer bumped within min_interval; returns whether it did"""
+        if not self._pending:
+            return False
+        if not self.redis.set(VERSION_THROTTLE_KEY, 1, nx=True, px=max(1, int(self.min_interval * 1000))):
+            self.stats["deferred"] += 1
+            return False
+        self.redis.incr(LOGS_VERSION_KEY)
+        self._pending = False
+        self.stats["bumps"] += 1
+        return True
+
+
+class ResponseCache:
+    """TTL cache with ingest-driven invalidation and request coalescing"""
+
+    def __init__(self, redis_client, ttl=10, lock_timeout=10, poll_interval=0.02, prefix="analytics"):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self.prefix = prefix
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    def _count(self, name):
+        self.stats[name] += 1
+
+    async def key_for(self, endpoint, *params):
+        version = await self.redis.get(LOGS_VERSION_KEY) or "0"
+        suffix = ":".join(str(p) for p in params)
+        return f"{self.prefix}:{endpoint}:{suffix}:v{version}"
+
+    async def get_or_compute(self, endpoint, params, compute, cacheable=lambda result: True):
+        """Return the cached result for (endpoint, params), awaiting `compute()` at most once"""
+        try:
+            key = await self.key_for(endpoint, *params)
+            cached = await self.redis.get(key)
+        except Exception as e:
+            # The cache must never take analytics down with it
+            self._count("errors")
+            logger.warning(f"Response cache unavailable: {e}")
+            return await compute()
+
+        if cached is not None:
+            self._count("hits")
+            return json.loads(cached)
+
+        lock_key = f"{key}:lock"
+        token = uuid.uuid4().hex
+        try:
+            leader = await self.redis.set(lock_key, token, nx=True, ex=self.lock_timeout)
+        except Exception:
+            leader = True
+
+        if not leader:
+            result = await self._wait_for(key)
+            if result is not None:
+                self._count("coalesced")
+                return result
+
+        self._count("misses")
+        try:
+            result = await compute()
+            if cacheable(result):
+                await self.redis.set(key, json.dumps(result, default=str), ex=self.ttl)
+            return result
+        finally:
+            if leader:
+                await self._release(lock_key, token)
+
+    async def _wait_for(self, key):
+        """Poll for the leader's result until the lock would have expired"""
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                cached = await self.redis.get(key)
+                if cached is not None:
+                    return json.loads(cached)
+                if not await self.redis.exists(f"{key}:lock"):
+                    # Leader gave up without caching (e.g. error result)
+                    return None
+            except Exception:
+                return None
+        return None
+
+    async def _release(self, lock_key, token):
+        try:
+            if await self.redis.get(lock_key) == token:
+                await self.redis.delete(lock_key)
+        except Exception:
+            pass
+
+    def snapshot(self):
+        return dict(self.stats, ttl=self.ttl)
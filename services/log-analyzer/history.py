@@ -0,0 +1,161 @@
+"""
+Vectorized queries over the Parquet log archive.
+
+A `HistoryQuery` names a time range, optional service/level filters, the
+keys to group by (service, level and/or a time bucket) and the metrics to
+compute per group. `HistoryEngine` answers it in pyarrow without touching
+individual rows in Python:
+
+    1. prune partitions: only day directories overlapping the range, and
+       only the requested services' directories, are opened
+    2. scan just the needed columns, with the time/service/level filter
+       pushed into the Parquet reader (row groups outside it are skipped)
+    3. derive the bucket and error flag as arrays, group and aggregate
+    4. order and cut to the top N groups
+
+Metrics: count, errors, errorRate (%), users (distinct userId),
+avgResponseTime and response-time percentiles p50/p90/p95/p99 (t-digest).
+"""
+
+import re
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+ERROR_LEVELS = ["error", "fatal"]
+KEYS = ("bucket", "service", "level")
+PERCENTILES = {"p50": 0.5, "p90": 0.9, "p95": 0.95, "p99": 0.99}
+METRICS = ("count", "errors", "errorRate", "users", "avgResponseTime") + tuple(PERCENTILES)
+UNITS = {"m": "minute", "h": "hour", "d": "day"}
+
+
+def parse_interval(text):
+    """'5m', '1h', '1d' -> (multiple, unit); raises ValueError"""
+    match = re.fullmatch(r"(\d+)([mhd])", text or "")
+    if not match or int(match.group(1)) < 1:
+        raise ValueError("interval must look like 5m, 1h or 1d")
+    return int(match.group(1)), UNITS[match.group(2)]
+
+
+class HistoryQuery:
+    """A validated group-by query over the archive; raises ValueError for bad input"""
+
+    def __init__(self, start, end, group_by=(), metrics=("count",), interval="1h",
+                 services=None, levels=None, order_by=None, limit=None):
+        if start is None or end is None or start >= end:
+            raise ValueError("a time range with from < to is required")
+        unknown = [key for key in group_by if key not in KEYS]
+        if unknown:
+            raise ValueError(f"groupBy must be among {', '.join(KEYS)}")
+        unknown = [metric for metric in metrics if metric not in METRICS]
+        if unknown or not metrics:
+            raise ValueError(f"metrics must be among {', '.join(METRICS)}")
+
+        self.start, self.end = start, end
+        self.group_by = list(dict.fromkeys(group_by))
+        self.metrics = list(dict.fromkeys(metrics))
+        self.interval = parse_interval(interval) if "bucket" in self.group_by else None
+        self.services = services or None
+        self.levels = levels or None
+        if order_by is None:
+            order_by = "bucket" if "bucket" in self.group_by else self.metrics[0]
+        if order_by not in self.group_by and order_by not in self.metrics:
+            raise ValueError("orderBy must be a groupBy key or one of the metrics")
+        self.order_by = order_by
+        self.limit = limit
+
+    def columns(self):
+        """Archive columns the query reads"""
+        # `level` is always read: it is cheap (dictionary-encoded) and rows are counted on it
+        needed = {"level"}
+        needed.update("timestamp" if key == "bucket" else key for key in self.group_by)
+        if "users" in self.metrics:
+            needed.add("user_id")
+        if {"avgResponseTime", *PERCENTILES} & set(self.metrics):
+            needed.add("response_time")
+        return sorted(needed)
+
+
+class HistoryEngine:
+    """Runs HistoryQuery objects against an ArchiveReader"""
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.stats = {"queries": 0, "partitions": 0, "rows": 0}
+
+    def run(self, query):
+        """List of result rows, one per group"""
+        partitions = self.reader.partitions(query.start, query.end, query.services)
+        table = self.reader.scan(query.start, query.end, query.services, query.levels, query.columns())
+        self.stats["queries"] += 1
+        self.stats["partitions"] += len(partitions)
+        self.stats["rows"] += table.num_rows
+        if table.num_rows == 0:
+            return []
+
+        keys = []
+        for key in query.group_by:
+            if key == "bucket":
+                multiple, unit = query.interval
+                table = table.append_column("bucket", pc.floor_temporal(table["timestamp"], multiple=multiple, unit=unit))
+            elif key == "service":
+                table = table.set_column(table.schema.get_field_index("service"), "service",
+                                         pc.fill_null(table["service"], "unknown"))
+            else:
+                table = table.set_column(table.schema.get_field_index("level"), "level",
+                                         pc.fill_null(table["level"], "info"))
+            keys.append(key)
+        # Filling nulls gives each chunk its own dictionary again
+        table = table.unify_dictionaries()
+        if not keys:
+            # One group over everything (scalar t-digest results come back unlisted otherwise)
+            table = table.append_column("_all", pa.repeat(True, table.num_rows))
+            keys = ["_all"]
+
+        aggregations = [("level", "count", pc.CountOptions(mode="all"))]
+        if {"errors", "errorRate"} & set(query.metrics):
+            errors = pc.cast(pc.is_in(table["level"], value_set=pa.array(ERROR_LEVELS)), pa.int64())
+            table = table.append_column("is_error", errors)
+            aggregations.append(("is_error", "sum"))
+        if "users" in query.metrics:
+            aggregations.append(("user_id", "count_distinct"))
+        if "avgResponseTime" in query.metrics:
+            aggregations.append(("response_time", "mean"))
+        quantiles = [PERCENTILES[m] for m in query.metrics if m in PERCENTILES]
+        if quantiles:
+            aggregations.append(("response_time", "tdigest", pc.TDigestOptions(q=quantiles)))
+
+        grouped = table.group_by(keys).aggregate(aggregations)
+        return self._finish(grouped, query, quantiles)
+
+    def _finish(self, grouped, query, quantiles):
+        """Name the metric columns, order, cut to the limit and convert to rows"""
+        result = {key: grouped[key] for key in query.group_by}
+        count = grouped["level_count"]
+        for metric in query.metrics:
+            if metric == "count":
+                result[metric] = count
+            elif metric == "errors":
+                result[metric] = grouped["is_error_sum"]
+            elif metric == "errorRate":
+                rate = pc.divide(pc.multiply(pc.cast(grouped["is_error_sum"], pa.float64()), 100.0), count)
+                result[metric] = pc.round(rate, 2)
+            elif metric == "users":
+                result[metric] = grouped["user_id_count_distinct"]
+            elif metric == "avgResponseTime":
+                result[metric] = pc.round(grouped["response_time_mean"], 2)
+            else:
+                digest = grouped["response_time_tdigest"]
+                result[metric] = pc.round(pc.list_element(digest, quantiles.index(PERCENTILES[metric])), 2)
+        table = pa.table(result)
+
+        # Time series read oldest first; everything else biggest first
+        order = "ascending" if query.order_by == "bucket" else "descending"
+        table = table.sort_by([(query.order_by, order)])
+        if query.limit:
+            table = table.slice(0, query.limit)
+        rows = table.to_pylist()
+        if "bucket" in query.group_by:
+            for row in rows:
+                row["bucket"] = row["bucket"].isoformat()
+        return rows
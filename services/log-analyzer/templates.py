@@ -0,0 +1,301 @@
+"""
+Online log template mining (Drain-style) for grouping messages.
+
+Messages that differ only in their variable parts ("Request #41 took 12ms",
+"Request #42 took 9ms") are grouped under one template ("Request #<NUM>
+took <NUM>ms"). Obvious variables (numbers, hex, UUIDs, IPs) are masked
+first. The masked tokens then go down a fixed-depth tree: message length
+first, then the first `depth - 2` tokens. The leaf holds a small list of
+templates, and the most similar one absorbs the message, turning any tokens
+that differ into <*>. Exact repeats of a masked message skip the tree via a
+bounded cache, which keeps mining well above tens of thousands of logs per
+second on one core.
+
+`TemplateStore` runs the miner over the log-analyzer's event stream and
+keeps two collections that topErrors and /api/analytics/templates read:
+
+    log_templates     {_id: templateId, template, sample, count, firstSeen, lastSeen, batches}
+    template_rollups  {_id: "hour:templateId:level:service", bucket: "YYYY-MM-DDTHH",
+                       templateId, level, service, count, expireAt, batches}
+                      {_id: "coverage", since}   # when mining started
+
+Counts only cover logs mined since `coverage.since`, so readers fall back to
+raw logs for windows that start earlier. Each document remembers the last
+few batches added to it, so a batch replayed after a partly failed write
+(the stream redelivers it) is not counted twice.
+"""
+
+import hashlib
+import logging
+import re
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+WILDCARD = '<*>'
+MASKS = [
+    (re.compile(r'\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b'), '<UUID>'),
+    (re.compile(r'\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b'), '<IP>'),
+    (re.compile(r'\b0[xX][0-9a-fA-F]+\b|\b[0-9a-fA-F]{16,}\b'), '<HEX>'),
+    (re.compile(r'(?<![\w.])\d+(?:\.\d+)?'), '<NUM>'),
+]
+HAS_DIGIT = re.compile(r'\d')
+ROLLUP_TTL = timedelta(days=30)
+COVERAGE_ID = "coverage"
+# Batch ids kept per document; a replay arrives long before this many later batches touch it
+RECENT_BATCHES = 20
+DUPLICATE_KEY_ERROR = 11000
+
+
+def mask(message):
+    for pattern, placeholder in MASKS:
+        message = pattern.sub(placeholder, message)
+    return message
+
+
+class Cluster:
+    """A template and how many messages it has absorbed"""
+
+    __slots__ = ('id', 'tokens', 'size')
+
+    def __init__(self, tokens, cluster_id=None):
+        self.tokens = list(tokens)
+        self.id = cluster_id or hashlib.sha1(' '.join(tokens).encode()).hexdigest()[:12]
+        self.size = 0
+
+    @property
+    def template(self):
+        return ' '.join(self.tokens)
+
+    def similarity(self, tokens):
+        """(fraction of positions with the same token, number of wildcards)"""
+        same = wildcards = 0
+        for mine, theirs in zip(self.tokens, tokens):
+            if mine == WILDCARD:
+                wildcards += 1
+            elif mine == theirs:
+                same += 1
+        return same / len(tokens), wildcards
+
+    def absorb(self, tokens):
+        """Generalize to cover `tokens`; returns whether the template changed"""
+        changed = False
+        for i, (mine, theirs) in enumerate(zip(self.tokens, tokens)):
+            if mine != theirs and mine != WILDCARD:
+                self.tokens[i] = WILDCARD
+                changed = True
+        return changed
+
+
+class TemplateMiner:
+    """Drain parse tree: length -> leading tokens -> candidate clusters"""
+
+    def __init__(self, depth=4, similarity=0.5, max_children=100, cache_size=100000):
+        self.prefix_depth = max(1, depth - 2)
+        self.similarity = similarity
+        self.max_children = max_children
+        self.cache_size = cache_size
+        self.clusters = {}
+        self._root = {}
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.stats = {"messages": 0, "cacheHits": 0, "clusters": 0}
+
+    def add(self, message):
+        """Assign `message` to a cluster (creating one if needed) and return it"""
+        masked = mask(message or '')
+        with self._lock:
+            self.stats["messages"] += 1
+            cluster = self._cache.get(masked)
+            if cluster is not None:
+                self.stats["cacheHits"] += 1
+                cluster.size += 1
+                return cluster
+
+            tokens = masked.split() or ['']
+            leaf = self._leaf(tokens)
+            cluster = self._best_match(leaf, tokens)
+            if cluster is None:
+                cluster = Cluster(tokens)
+                leaf.append(cluster)
+                self.clusters[cluster.id] = cluster
+                self.stats["clusters"] = len(self.clusters)
+            else:
+                # Messages cached for this cluster still match the generalized template
+                cluster.absorb(tokens)
+            cluster.size += 1
+
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[masked] = cluster
+            return cluster
+
+    def restore(self, cluster_id, template, size=0):
+        """Re-insert a persisted template under its existing id"""
+        tokens = template.split() or ['']
+        with self._lock:
+            if cluster_id in self.clusters:
+                return self.clusters[cluster_id]
+            cluster = Cluster(tokens, cluster_id)
+            cluster.size = size
+            self._leaf(tokens).append(cluster)
+            self.clusters[cluster.id] = cluster
+            self.stats["clusters"] = len(self.clusters)
+            return cluster
+
+    def _leaf(self, tokens):
+        node = self._root.setdefault(len(tokens), {})
+        for token in tokens[:self.prefix_depth]:
+            # Tokens with digits are too likely to be variables to branch on
+            key = WILDCARD if HAS_DIGIT.search(token) else token
+            if key not in node:
+                if len(node) >= self.max_children:
+                    key = WILDCARD
+                node = node.setdefault(key, {})
+            else:
+                node = node[key]
+        return node.setdefault(None, [])
+
+    def _best_match(self, leaf, tokens):
+        best, best_key = None, None
+        for cluster in leaf:
+            score, wildcards = cluster.similarity(tokens)
+            if score >= self.similarity and (best_key is None or (score, wildcards) > best_key):
+                best, best_key = cluster, (score, wildcards)
+        return best
+
+
+class TemplateStore:
+    """Mines templates from incoming logs and keeps per-hour template counts in MongoDB"""
+
+    def __init__(self, templates_collection, rollups_collection, miner=None):
+        self.templates = templates_collection
+        self.rollups = rollups_collection
+        self.miner = miner or TemplateMiner()
+        self._coverage_marked = False
+
+    def ensure_indexes(self):
+        self.rollups.create_index([("bucket", 1), ("level", 1)])
+        self.rollups.create_index("expireAt", expireAfterSeconds=0)
+        self.templates.create_index([("lastSeen", -1)])
+
+    def load(self):
+        """Rebuild the miner from persisted templates so ids survive restarts"""
+        count = 0
+        for doc in self.templates.find({}, {"template": 1, "count": 1}):
+            self.miner.restore(doc["_id"], doc.get("template", ""), doc.get("count", 0))
+            count += 1
+        return count
+
+    def covered_since(self):
+        doc = self.rollups.find_one({"_id": COVERAGE_ID})
+        return doc.get("since") if doc else None
+
+    def record(self, logs, batch_id=None):
+        """Mine a batch of stream logs and persist template and rollup counts.
+
+        With a `batch_id` (e.g. the batch's first stream entry id), recording
+        the same batch again leaves the counts unchanged.
+        """
+        now = datetime.utcnow()
+        if not self._coverage_marked:
+            self.rollups.update_one({"_id": COVERAGE_ID}, {"$setOnInsert": {"since": now}}, upsert=True)
+            self._coverage_marked = True
+        touched = {}
+        samples = {}
+        totals = Counter()
+        counts = Counter()
+        for log in logs:
+            cluster = self.miner.add(log.get('message'))
+            touched[cluster.id] = cluster
+            samples.setdefault(cluster.id, (log.get('message') or '')[:500])
+            totals[cluster.id] += 1
+            timestamp = log.get('timestamp')
+            if isinstance(timestamp, datetime):
+                timestamp = timestamp.isoformat()
+            bucket = (timestamp or now.isoformat())[:13]
+            counts[(bucket, cluster.id, log.get('level') or 'info', log.get('service') or 'unknown')] += 1
+        if not counts:
+            return
+        expire_at = now + ROLLUP_TTL
+        # Documents that already have this batch don't match; their upsert then fails as a duplicate
+        guard = {"batches": {"$ne": batch_id}} if batch_id else {}
+        remember = {"$push": {"batches": {"$each": [batch_id], "$slice": -RECENT_BATCHES}}} if batch_id else {}
+
+        template_ops = [
+            UpdateOne(
+                {"_id": cluster_id, **guard},
+                {
+                    "$set": {"template": cluster.template, "lastSeen": now},
+                    "$inc": {"count": totals[cluster_id]},
+                    "$setOnInsert": {"sample": samples[cluster_id], "firstSeen": now},
+                    **remember,
+                },
+                upsert=True
+            )
+            for cluster_id, cluster in touched.items()
+        ]
+        rollup_ops = [
+            UpdateOne(
+                {"_id": f"{bucket}:{cluster_id}:{level}:{service}", **guard},
+                {
+                    "$inc": {"count": n},
+                    "$setOnInsert": {"bucket": bucket, "templateId": cluster_id,
+                                     "level": level, "service": service, "expireAt": expire_at},
+                    **remember,
+                },
+                upsert=True
+            )
+            for (bucket, cluster_id, level, service), n in counts.items()
+        ]
+        self._write(self.templates, template_ops)
+        self._write(self.rollups, rollup_ops)
+
+    @staticmethod
+    def _write(collection, operations):
+        try:
+            collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+
+
+def top_pipeline(start_time, levels=None, service=None, limit=10):
+    """template_rollups pipeline: templates with the most logs since start_time (hour granularity)"""
+    match = {"bucket": {"$gte": start_time.isoformat()[:13]}}
+    if levels:
+        match["level"] = {"$in": list(levels)}
+    if service:
+        match["service"] = service
+    return [
+        {"$match": match},
+        {"$group": {"_id": {"t": "$templateId", "s": "$service"}, "count": {"$sum": "$count"}}},
+        {"$sort": {"count": -1}},
+        {"$group": {"_id": "$_id.t", "count": {"$sum": "$count"},
+                    "services": {"$push": "$_id.s"}}},
+        {"$sort": {"count": -1}},
+        {"$limit": limit},
+    ]
+
+
+def describe_top(rows, template_docs):
+    """Join top_pipeline rows with their log_templates documents"""
+    templates = {doc["_id"]: doc for doc in template_docs}
+    result = []
+    for row in rows:
+        doc = templates.get(row["_id"], {})
+        result.append({
+            "templateId": row["_id"],
+            "template": doc.get("template"),
+            "message": (doc.get("sample") or doc.get("template") or "")[:100],
+            "service": row["services"][0] if row["services"] else None,
+            "services": row["services"],
+            "count": row["count"],
+        })
+    return result
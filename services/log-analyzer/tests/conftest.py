@@ -0,0 +1,30 @@
+import os
+import sys
+
+import mongomock
+import pytest
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+# Modules are imported the way the service runs them: from the service directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _bulk_write(collection, operations, ordered=True, **kwargs):
+    """Unordered upserts one at a time (mongomock's bulk_write predates pymongo's `sort` option)"""
+    errors = []
+    for index, op in enumerate(operations):
+        if not isinstance(op, UpdateOne):
+            raise TypeError(f"unsupported bulk operation {op!r}")
+        try:
+            collection.update_one(op._filter, op._doc, upsert=op._upsert)
+        except DuplicateKeyError as e:
+            errors.append({"index": index, "code": e.code, "errmsg": str(e)})
+    if errors:
+        raise BulkWriteError({"writeErrors": errors})
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(mongomock.Collection, "bulk_write", _bulk_write)
+    return mongomock.MongoClient().logvizpro
@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+import fakeredis
+import fakeredis.aioredis
+
+from cache import LOGS_VERSION_KEY, ResponseCache, VersionBumper
+
+
+def test_bumps_at_most_once_per_interval_across_analyzers():
+    server = fakeredis.FakeServer()
+    first = VersionBumper(fakeredis.FakeRedis(server=server), min_interval=0.2)
+    second = VersionBumper(fakeredis.FakeRedis(server=server), min_interval=0.2)
+    redis = fakeredis.FakeRedis(server=server)
+
+    for _ in range(50):
+        first.changed()
+        first.maybe_bump()
+        second.changed()
+        second.maybe_bump()
+    assert int(redis.get(LOGS_VERSION_KEY)) == 1
+    assert second.stats["deferred"] == 50
+
+
+def test_deferred_bump_happens_once_allowed():
+    bumper = VersionBumper(fakeredis.FakeRedis(), min_interval=0.05)
+    bumper.changed()
+    assert bumper.maybe_bump()
+    bumper.changed()
+    assert not bumper.maybe_bump()
+    time.sleep(0.06)
+    # No new logs since, but the earlier ones still have to invalidate the cache
+    assert bumper.maybe_bump()
+    assert not bumper.maybe_bump()
+    assert int(bumper.redis.get(LOGS_VERSION_KEY)) == 2
+
+
+def test_no_bump_without_new_logs():
+    bumper = VersionBumper(fakeredis.FakeRedis(), min_interval=0)
+    assert not bumper.maybe_bump()
+    assert bumper.redis.get(LOGS_VERSION_KEY) is None
+
+
+def test_cached_until_the_version_changes():
+    redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    cache = ResponseCache(redis, ttl=60)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"success": True, "n": len(calls)}
+
+    async def scenario():
+        first = await cache.get_or_compute("summary", (24,), compute)
+        again = await cache.get_or_compute("summary", (24,), compute)
+        await redis.incr(LOGS_VERSION_KEY)
+        fresh = await cache.get_or_compute("summary", (24,), compute)
+        return first, again, fresh
+
+    first, again, fresh = asyncio.run(scenario())
+    assert first == again == {"success": True, "n": 1}
+    assert fresh["n"] == 2
+    assert cache.stats["hits"] == 1
+
+
+def test_uncacheable_results_are_recomputed():
+    redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    cache = ResponseCache(redis, ttl=60)
+
+    async def failing():
+        return {"success": False, "error": "boom"}
+
+    async def scenario():
+        for _ in range(2):
+            await cache.get_or_compute("trends", (1,), failing, lambda result: result["success"])
+
+    asyncio.run(scenario())
+    assert cache.stats["misses"] == 2
@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from history import HistoryEngine, HistoryQuery, parse_interval
+from logviz_common.archive import ArchiveReader, PartitionWriter, day_floor, to_row
+
+START = datetime(2025, 1, 1)
+END = datetime(2025, 1, 2)
+
+
+@pytest.mark.parametrize("text,expected", [("5m", (5, "minute")), ("1h", (1, "hour")), ("7d", (7, "day"))])
+def test_parse_interval(text, expected):
+    assert parse_interval(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", None, "0h", "1.5h", "5x", "h", "1 h", "-1d"])
+def test_parse_interval_rejects_other_text(text):
+    with pytest.raises(ValueError, match="interval"):
+        parse_interval(text)
+
+
+@pytest.mark.parametrize("kwargs,message", [
+    ({"start": None}, "time range"),
+    ({"end": None}, "time range"),
+    ({"start": END, "end": START}, "time range"),
+    ({"start": START, "end": START}, "time range"),
+    ({"group_by": ["host"]}, "groupBy"),
+    ({"metrics": ["count", "p42"]}, "metrics"),
+    ({"metrics": []}, "metrics"),
+    ({"group_by": ["bucket"], "interval": "soon"}, "interval"),
+    ({"group_by": ["service"], "order_by": "level"}, "orderBy"),
+    ({"metrics": ["count"], "order_by": "errors"}, "orderBy"),
+])
+def test_invalid_queries_raise_value_error(kwargs, message):
+    with pytest.raises(ValueError, match=message):
+        HistoryQuery(**{"start": START, "end": END, **kwargs})
+
+
+def test_query_defaults_and_deduplication():
+    series = HistoryQuery(START, END, group_by=["bucket", "service", "bucket"], metrics=["errors", "count", "errors"])
+    top = HistoryQuery(START, END, group_by=["service"], metrics=["errorRate", "count"], interval="not used")
+
+    assert series.group_by == ["bucket", "service"] and series.metrics == ["errors", "count"]
+    assert series.order_by == "bucket" and series.interval == (1, "hour")
+    assert top.order_by == "errorRate" and top.interval is None
+
+
+def test_query_reads_only_the_columns_it_needs():
+    assert HistoryQuery(START, END).columns() == ["level"]
+    assert HistoryQuery(START, END, group_by=["bucket", "service"], metrics=["users", "p99"]).columns() == [
+        "level", "response_time", "service", "timestamp", "user_id"
+    ]
+
+
+@pytest.fixture
+def archive(tmp_path):
+    writer = PartitionWriter(str(tmp_path), "test")
+    for i in range(48):
+        at = START + timedelta(minutes=30 * i)
+        log = {"_id": f"id{i}", "timestamp": at, "service": "api" if i % 3 else "auth",
+               "level": "error" if i % 4 == 0 else "info", "message": "m", "responseTime": float(i)}
+        writer.add(to_row(log, at), day_floor(at))
+    writer.commit()
+    return HistoryEngine(ArchiveReader(str(tmp_path)))
+
+
+def test_engine_groups_orders_and_limits(archive):
+    rows = archive.run(HistoryQuery(START, END, group_by=["service"], metrics=["count", "errors", "errorRate"]))
+
+    assert rows == [
+        {"service": "api", "count": 32, "errors": 8, "errorRate": 25.0},
+        {"service": "auth", "count": 16, "errors": 4, "errorRate": 25.0},
+    ]
+    limited = archive.run(HistoryQuery(START, END, group_by=["bucket"], interval="6h", limit=2))
+    assert limited == [{"bucket": "2025-01-01T00:00:00", "count": 12}, {"bucket": "2025-01-01T06:00:00", "count": 12}]
+
+
+def test_engine_filters_by_range_and_service(archive):
+    rows = archive.run(HistoryQuery(START + timedelta(hours=12), END, services=["auth"], metrics=["count", "avgResponseTime"]))
+
+    assert rows == [{"count": 8, "avgResponseTime": 34.5}]
+
+
+class ArchiveState:
+    def __init__(self, watermark):
+        self.watermark = watermark
+
+    async def find_one(self, *args):
+        return {"_id": "logs", "watermark": self.watermark} if self.watermark else None
+
+
+@pytest.mark.parametrize("watermark,complete", [(END, True), (START + timedelta(hours=12), False), (None, False)])
+def test_history_response_says_whether_the_archive_covers_the_range(archive, monkeypatch, watermark, complete):
+    import analyzer
+    monkeypatch.setattr(analyzer, "db", SimpleNamespace(archive_state=ArchiveState(watermark)))
+    monkeypatch.setattr(analyzer, "history_engine", archive)
+
+    result = asyncio.run(analyzer.compute_history(1, END.isoformat(), "", "count", "1h", None, None, None, 10))
+
+    assert result["success"] and result["data"] == [{"count": 48}]
+    assert result["range"]["complete"] is complete
+    assert result["range"]["archivedUntil"] == (watermark.isoformat() if watermark else None)
+    assert ("warning" in result) is not complete
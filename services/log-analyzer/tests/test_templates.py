@@ -0,0 +1,98 @@
+from datetime import datetime
+
+import pytest
+
+from templates import COVERAGE_ID, WILDCARD, TemplateMiner, TemplateStore, describe_top, mask, top_pipeline
+
+AT = datetime(2025, 1, 1, 10, 30)
+
+
+@pytest.mark.parametrize("message,masked", [
+    ("Request 41 took 12.5ms", "Request <NUM> took <NUM>ms"),
+    ("from 10.0.0.12:8080 failed", "from <IP> failed"),
+    ("user 3fa85f64-5717-4562-b3fc-2c963f66afa6 missing", "user <UUID> missing"),
+    ("crc 0x1F mismatch at deadbeefdeadbeef", "crc <HEX> mismatch at <HEX>"),
+    ("retry v2.1 in region eu1", "retry v2.1 in region eu1"),
+])
+def test_mask_replaces_obvious_variables(message, masked):
+    assert mask(message) == masked
+
+
+def test_messages_differing_in_variables_share_a_template():
+    miner = TemplateMiner()
+
+    first = miner.add("Payment failed for order ABC")
+    second = miner.add("Payment failed for order XYZ")
+    other = miner.add("Connection reset by peer now")
+
+    assert first is second and first.size == 2
+    assert first.template == f"Payment failed for order {WILDCARD}"
+    assert other is not first and miner.stats["clusters"] == 2
+
+
+def test_messages_of_different_lengths_never_merge():
+    miner = TemplateMiner()
+
+    assert miner.add("disk full") is not miner.add("disk full again")
+
+
+def test_repeats_hit_the_cache():
+    miner = TemplateMiner()
+    for i in range(5):
+        miner.add(f"Request {i} took {i}ms")
+
+    assert miner.stats["cacheHits"] == 4 and len(miner.clusters) == 1
+
+
+def test_restored_templates_keep_their_ids():
+    miner = TemplateMiner()
+    original = miner.add("Timeout talking to db-1")
+
+    restored = TemplateMiner()
+    restored.restore(original.id, original.template, size=7)
+
+    assert restored.add("Timeout talking to db-2").id == original.id
+
+
+def logs(*messages, level="error", service="api"):
+    return [{"message": m, "level": level, "service": service, "timestamp": AT} for m in messages]
+
+
+def test_record_merges_counts_across_batches(db):
+    store = TemplateStore(db.log_templates, db.template_rollups)
+
+    store.record(logs("Request 1 failed", "Request 2 failed"), batch_id="1-0")
+    store.record(logs("Request 3 failed") + logs("Request 4 failed", service="auth"), batch_id="2-0")
+
+    template = db.log_templates.find_one()
+    assert template["count"] == 4 and template["template"] == "Request <NUM> failed"
+    rows = list(db.template_rollups.aggregate(top_pipeline(datetime(2025, 1, 1))))
+    assert describe_top(rows, [template])[0] | {"templateId": None} == {
+        "templateId": None, "template": "Request <NUM> failed", "message": "Request 1 failed",
+        "service": "api", "services": ["api", "auth"], "count": 4,
+    }
+
+
+def test_replayed_batch_is_not_counted_twice(db):
+    store = TemplateStore(db.log_templates, db.template_rollups)
+    batch = logs("Request 1 failed", "Disk full on sda")
+    store.record(batch, batch_id="1-0")
+    # The rollup write failed last time: only the templates got the batch
+    db.template_rollups.delete_many({"_id": {"$ne": COVERAGE_ID}})
+
+    store.record(batch, batch_id="1-0")
+    store.record(logs("Request 2 failed"), batch_id="2-0")
+
+    assert sorted(doc["count"] for doc in db.log_templates.find()) == [1, 2]
+    assert sum(doc.get("count", 0) for doc in db.template_rollups.find()) == 3
+
+
+def test_coverage_starts_with_the_first_batch(db):
+    store = TemplateStore(db.log_templates, db.template_rollups)
+    assert store.covered_since() is None
+
+    store.record(logs("first"))
+    since = store.covered_since()
+    store.record(logs("second"))
+
+    assert since is not None and store.covered_since() == since
@@ -0,0 +1,311 @@
+"""
+Server-side evaluation of the alert rules users store in `alerts`.
+
+All rules are compiled into an index keyed by (service, level), with `*` for
+rules that don't scope on one, so each incoming log touches only the four
+index slots that can match it: O(matching rules) per log rather than
+O(all rules). Every rule keeps a sliding-window counter updated in place, and
+its state is re-checked only when one of its counters changes. A periodic
+tick covers what logs alone cannot: error rates and volumes that decay as the
+window slides, and services that have gone quiet.
+
+Conditions (threshold meaning):
+    error_rate        percent of logs at error/fatal level in the window
+    log_volume        logs per minute, averaged over the window
+    service_inactive  minutes without a log from the service
+    keyword_match     text that must appear in a log message
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+CONDITIONS = ('error_rate', 'log_volume', 'service_inactive', 'keyword_match')
+SEVERITIES = ('info', 'warning', 'critical')
+ERROR_LEVELS = ('error', 'fatal')
+ANY = '*'
+
+# Window (minutes) for rules that don't set `window`
+DEFAULT_WINDOWS = {'error_rate': 5, 'log_volume': 1, 'keyword_match': 5}
+
+
+class SlidingWindow:
+    """Totals over the last `seconds`, kept in fixed slots so updates are O(1)"""
+
+    def __init__(self, seconds, slots=60):
+        self.seconds = seconds
+        self.slot_seconds = max(1.0, seconds / slots)
+        self._slots = deque()
+        self.total = 0
+        self.hits = 0
+
+    def add(self, now, total, hits):
+        slot = int(now // self.slot_seconds)
+        if self._slots and self._slots[-1][0] == slot:
+            self._slots[-1][1] += total
+            self._slots[-1][2] += hits
+        else:
+            self._slots.append([slot, total, hits])
+        self.total += total
+        self.hits += hits
+        self.expire(now)
+
+    def expire(self, now):
+        oldest = int((now - self.seconds) // self.slot_seconds)
+        while self._slots and self._slots[0][0] <= oldest:
+            _, total, hits = self._slots.popleft()
+            self.total -= total
+            self.hits -= hits
+
+
+class Rule:
+    """One compiled alert with its window and current state"""
+
+    def __init__(self, alert):
+        self.id = str(alert['_id'])
+        self.name = alert.get('name')
+        self.user_email = alert.get('userEmail')
+        self.condition = alert.get('condition')
+        self.severity = alert.get('severity', 'warning')
+        self.service = alert.get('service') or ANY
+        self.level = alert.get('level') or ANY
+        self.threshold = alert.get('threshold')
+
+        if self.condition not in CONDITIONS:
+            raise ValueError(f"condition must be one of {', '.join(CONDITIONS)}")
+        if self.severity not in SEVERITIES:
+            raise ValueError(f"severity must be one of {', '.join(SEVERITIES)}")
+
+        if self.condition == 'keyword_match':
+            self.keyword = str(self.threshold or '').strip().lower()
+            if not self.keyword:
+                raise ValueError("threshold must be the keyword to match")
+            self.limit = None
+        else:
+            try:
+                self.limit = float(str(self.threshold).strip().rstrip('%'))
+            except (TypeError, ValueError):
+                raise ValueError("threshold must be a number")
+            if not 0 < self.limit < math.inf:  # also rejects nan
+                raise ValueError("threshold must be a positive number")
+
+        if self.condition == 'service_inactive':
+            window_minutes = self.limit
+        else:
+            try:
+                window_minutes = float(alert.get('window') or DEFAULT_WINDOWS[self.condition])
+            except (TypeError, ValueError):
+                raise ValueError("window must be a number of minutes")
+            if not 0 < window_minutes < math.inf:
+                raise ValueError("window must be a positive number of minutes")
+        self.window = SlidingWindow(window_minutes * 60)
+
+        self.firing = False
+        self.value = 0.0
+        self.changed_at = None
+
+    def observe(self, now, logs):
+        """Count the matching logs into the window"""
+        if self.condition == 'error_rate':
+            hits = sum(1 for log in logs if log.get('level') in ERROR_LEVELS)
+        elif self.condition == 'keyword_match':
+            hits = sum(1 for log in logs if self.keyword in (log.get('message') or '').lower())
+        else:
+            hits = 0
+        self.window.add(now, len(logs), hits)
+
+    def evaluate(self, now, min_samples, last_seen=None):
+        """Current value and whether the rule should be firing"""
+        self.window.expire(now)
+        if self.condition == 'error_rate':
+            total = self.window.total
+            self.value = self.window.hits / total * 100 if total else 0.0
+            return total >= min_samples and self.value >= self.limit
+        if self.condition == 'log_volume':
+            self.value = self.window.total / (self.window.seconds / 60)
+            return self.value >= self.limit
+        if self.condition == 'keyword_match':
+            self.value = float(self.window.hits)
+            return self.window.hits > 0
+        # service_inactive
+        self.value = (now - last_seen) / 60
+        return self.value >= self.limit
+
+    def event(self):
+        return {
+            "alertId": self.id,
+            "name": self.name,
+            "condition": self.condition,
+            "severity": self.severity,
+            "service": None if self.service == ANY else self.service,
+            "level": None if self.level == ANY else self.level,
+            "threshold": self.threshold,
+            "value": round(self.value, 2),
+            "status": "firing" if self.firing else "resolved",
+            "at": self.changed_at,
+        }
+
+
+class AlertEngine:
+    """Incrementally evaluates compiled alert rules against incoming logs.
+
+    State changes are recorded on the alert and passed to
+    `on_event(owner_email, event)`; events don't carry the owner themselves.
+    """
+
+    def __init__(self, alerts_collection, on_event=None, min_samples=20):
+        self.alerts_collection = alerts_collection
+        self.on_event = on_event
+        self.min_samples = min_samples
+
+        self._rules = {}
+        # (service, level) -> rules counting those logs; service_inactive rules live apart
+        self._index = {}
+        self._inactive = {}
+        self._last_seen = {}
+        self._started = time.time()
+        self._lock = threading.Lock()
+
+        self.stats = {"rules": 0, "firing": 0, "evaluated": 0, "fired": 0, "resolved": 0,
+                      "invalidRules": 0}
+
+    # ---------- rule management ----------
+
+    def load(self):
+        """(Re)compile every stored alert, keeping the state of unchanged rules"""
+        rules, invalid = {}, 0
+        for alert in self.alerts_collection.find():
+            try:
+                rule = Rule(alert)
+            except ValueError as e:
+                invalid += 1
+                logger.debug(f"Skipping alert {alert.get('_id')}: {e}")
+                continue
+            rules[rule.id] = rule
+        with self._lock:
+            for rule_id, rule in rules.items():
+                current = self._rules.get(rule_id)
+                if current is not None and self._same_definition(current, rule):
+                    rules[rule_id] = current
+            self._rules = rules
+            self._reindex()
+            self.stats["invalidRules"] = invalid
+
+    def add(self, alert):
+        """Compile and index one alert; raises ValueError if it is invalid"""
+        rule = Rule(alert)
+        with self._lock:
+            self._rules[rule.id] = rule
+            self._reindex()
+        return rule
+
+    def remove(self, alert_id):
+        with self._lock:
+            if self._rules.pop(str(alert_id), None) is not None:
+                self._reindex()
+
+    def state_of(self, alert_id):
+        rule = self._rules.get(str(alert_id))
+        if rule is None:
+            return None
+        return {"firing": rule.firing, "value": round(rule.value, 2), "since": rule.changed_at}
+
+    def _reindex(self):
+        """Rebuild the lookup tables (caller holds the lock)"""
+        index, inactive = {}, {}
+        for rule in self._rules.values():
+            if rule.condition == 'service_inactive':
+                inactive.setdefault(rule.service, []).append(rule)
+            else:
+                index.setdefault((rule.service, rule.level), []).append(rule)
+        self._index = index
+        self._inactive = inactive
+        self.stats["rules"] = len(self._rules)
+        self.stats["firing"] = sum(1 for rule in self._rules.values() if rule.firing)
+
+    @staticmethod
+    def _same_definition(a, b):
+        return (a.condition, a.threshold, a.service, a.level, a.window.seconds, a.severity) == \
+               (b.condition, b.threshold, b.service, b.level, b.window.seconds, b.severity)
+
+    # ---------- evaluation ----------
+
+    def observe(self, logs):
+        """Fold a batch of accepted logs into the matching rules' windows"""
+        now = time.time()
+        groups = {}
+        for log in logs:
+            key = (log.get('service') or 'unknown', log.get('level') or 'info')
+            groups.setdefault(key, []).append(log)
+
+        events = []
+        with self._lock:
+            touched = {}
+            for (service, level), group in groups.items():
+                for key in ((service, level), (service, ANY), (ANY, level), (ANY, ANY)):
+                    for rule in self._index.get(key, ()):
+                        rule.observe(now, group)
+                        touched[rule.id] = rule
+            # A log from a service resolves its inactivity alerts
+            for service in {service for service, _ in groups} | ({ANY} if groups else set()):
+                self._last_seen[service] = now
+                for rule in self._inactive.get(service, ()):
+                    touched[rule.id] = rule
+            for rule in touched.values():
+                self._transition(rule, now, events)
+        self._emit(events)
+        return [event for _, event in events]
+
+    def tick(self):
+        """Re-check rules that can change without new logs arriving"""
+        now = time.time()
+        events = []
+        with self._lock:
+            for rule in self._rules.values():
+                if rule.firing or rule.condition == 'service_inactive':
+                    self._transition(rule, now, events)
+        self._emit(events)
+        return [event for _, event in events]
+
+    def _transition(self, rule, now, events):
+        last_seen = None
+        if rule.condition == 'service_inactive':
+            last_seen = self._last_seen.get(rule.service, self._started)
+        self.stats["evaluated"] += 1
+        firing = rule.evaluate(now, self.min_samples, last_seen)
+        if firing == rule.firing:
+            return
+        rule.firing = firing
+        rule.changed_at = datetime.utcnow().isoformat()
+        self.stats["fired" if firing else "resolved"] += 1
+        self.stats["firing"] += 1 if firing else -1
+        events.append((rule.user_email, rule.event()))
+
+    def _emit(self, events):
+        for owner, event in events:
+            logger.info(f"Alert {event['name']} ({event['severity']}) {event['status']}: "
+                        f"{event['condition']}={event['value']}")
+            try:
+                self.alerts_collection.update_one(
+                    {'_id': ObjectId(event['alertId'])},
+                    {'$set': {'state': event['status'], 'stateChangedAt': event['at'],
+                              'lastValue': event['value']}}
+                )
+            except Exception as e:
+                logger.error(f"Failed to record alert state: {e}")
+            if self.on_event:
+                try:
+                    self.on_event(owner, event)
+                except Exception as e:
+                    logger.error(f"Alert event hook failed: {e}")
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
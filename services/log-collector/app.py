@@ -1,31 +1,376 @@
-from asyncio.log import logger
-from flask import Flask, request, jsonify
-from flask_socketio import SocketIO, emit # type: ignore
+import os
+import sys
+if (__name__ == '__main__' and os.getenv('FLASK_ENV') != 'development'
+        and int(os.getenv('COLLECTOR_WORKERS', 1)) > 1 and os.getenv('COLLECTOR_WORKER') is None):
+    # Supervisor: decided before eventlet, Mongo, Redis and the write buffer are set up,
+    # so the parent holds no clients, pools or threads of its own; each worker re-runs
+    # this script and builds its own. The workers share the port (SO_REUSEPORT) and
+    # coordinate through Redis.
+    import logging
+    from cluster import run_workers
+    if not os.getenv('SOCKETIO_MESSAGE_QUEUE'):
+        logging.getLogger(__name__).warning("COLLECTOR_WORKERS > 1 without SOCKETIO_MESSAGE_QUEUE: "
+                                            "clients only see logs accepted by their own worker")
+    run_workers(int(os.getenv('COLLECTOR_WORKERS')))
+    sys.exit(0)
+
+if os.getenv('EVENTLET_MONKEY_PATCH', 'true').lower() == 'true':
+    # Green sockets for pymongo/redis/requests: a slow query then only parks its
+    # own greenlet instead of freezing every request and websocket on the hub
+    import eventlet
+    eventlet.monkey_patch()
+
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask_socketio import SocketIO, emit, join_room # type: ignore
 from flask_cors import CORS
-from pymongo import MongoClient
+from werkzeug.middleware.proxy_fix import ProxyFix
 import redis # type: ignore
-import os
-import jwt
-import bcrypt
+import itertools
+import json
+import logging
+import time
 from datetime import datetime, timedelta
 from functools import wraps
-import requests
-from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure
+from ingest_buffer import WriteBehindBuffer
+from notifier import NotificationDispatcher
+from rollups import RollupWriter
+from sketch_rollups import SketchWriter
+from alerting import AlertEngine, Rule
+from broadcast import LogBroadcaster
+from cluster import LogRelay, LeaderLease
+from auth import Authenticator
+from passwords import PasswordHasher, PasswordQueueFull, LoginThrottle
+from compactor import Compactor
+from logviz_common import archive
+from logviz_common.connections import mongo_client as connect_mongo, redis_client as connect_redis, probe
+from logviz_common.timestamps import parse_timestamp, format_timestamp, range_filter
+import export
+from pagination import SORT as PAGE_SORT, encode_cursor, after_cursor, projection
+from search import SearchQuery
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+# Behind a load balancer, take the client address from X-Forwarded-For, trusting only this many proxies
+TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', 0))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=TRUSTED_PROXY_HOPS)
 app.config['SECRET_KEY'] = os.getenv('JWT_SECRET', 'your-secret-key-change-in-production-2024')
 SLACK_WEBHOOK_URL = os.getenv('SLACK_WEBHOOK_URL', '')
+MAX_BULK_SIZE = int(os.getenv('MAX_BULK_SIZE', 10000))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 1000))
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 2000))
+EXPORT_COLUMN_SAMPLE = int(os.getenv('EXPORT_COLUMN_SAMPLE', export.COLUMN_SAMPLE))
+SEARCH_DEFAULT_HOURS = float(os.getenv('SEARCH_DEFAULT_HOURS', 24))
+SEARCH_TIMEOUT_MS = int(os.getenv('SEARCH_TIMEOUT_MS', 5000))
+# Logs older than this many days move to the Parquet archive (0 keeps everything in MongoDB)
+LOG_HOT_RETENTION_DAYS = float(os.getenv('LOG_HOT_RETENTION_DAYS', 7))
+ARCHIVE_PATH = os.getenv('ARCHIVE_PATH', 'archive')
+ARCHIVE_INTERVAL = float(os.getenv('ARCHIVE_INTERVAL', 3600))
 CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*")
+# With several workers/replicas, emits go through Redis so they reach clients on any of them
+SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE') or None
+socketio = SocketIO(app, cors_allowed_origins="*", message_queue=SOCKETIO_MESSAGE_QUEUE)
 
 # DB connections
-mongo_client = MongoClient(os.getenv('MONGO_URI'))
+mongo_client = connect_mongo('log-collector')
 db = mongo_client.logvizpro
 logs_collection = db.logs
 users_collection = db.users
 alerts_collection = db.alerts
+rollups_collection = db.log_rollups
+sketches_collection = db.log_sketches
+archive_state_collection = db.archive_state
+
+redis_client = connect_redis()
+
+def ensure_indexes():
+    """Create the indexes the collector, analyzer and detector queries rely on"""
+    # Keyed on (timestamp, _id) so cursor pages are a single index range scan
+    logs_collection.create_index([("timestamp", DESCENDING), ("_id", DESCENDING)])
+    logs_collection.create_index([("service", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)])
+    logs_collection.create_index([("level", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)])
+    # Word index for /api/logs/search; no language so log tokens aren't stemmed or dropped
+    logs_collection.create_index([("message", TEXT)], name="message_text", default_language="none")
+    users_collection.create_index("email")
+    alerts_collection.create_index("userEmail")
+    rollup_writer.ensure_indexes()
+    sketch_writer.ensure_indexes()
+
+# Per-minute/per-hour counts, updated from each flushed batch
+rollup_writer = RollupWriter(rollups_collection)
+# Per-hour distinct-user/top-k/percentile sketches, written by each worker to its own documents
+sketch_writer = SketchWriter(sketches_collection, top_k=int(os.getenv('SKETCH_TOP_K', 100)))
+SKETCH_FLUSH_INTERVAL = float(os.getenv('SKETCH_FLUSH_INTERVAL', 10))
+
+def run_sketch_flush():
+    """Background task: persist this worker's hour sketches"""
+    while True:
+        socketio.sleep(SKETCH_FLUSH_INTERVAL)
+        try:
+            sketch_writer.flush()
+        except Exception as e:
+            logger.error(f"Failed to write log sketches: {e}")
+
+# Event bus: every persisted log is published here as JSON. Consumers read it
+# through their own consumer group (XREADGROUP/XACK), so each one keeps its
+# own position and gets unacknowledged entries back after a restart. The
+# stream is trimmed behind the slowest group (see trim_logs_stream), with
+# MAXLEN only as a hard cap for a group nobody consumes any more.
+LOGS_STREAM_KEY = "logs:stream"
+LOGS_STREAM_MAXLEN = int(os.getenv('LOGS_STREAM_MAXLEN', 1000000))
+LOGS_STREAM_TRIM_INTERVAL = float(os.getenv('LOGS_STREAM_TRIM_INTERVAL', 30))
+# /api/logs/recent reads the newest entries, so these stay even once every group has them
+RECENT_LOGS_MAX = 1000
+# Groups created up front so nothing published before a consumer first starts is missed
+LOGS_STREAM_GROUPS = [g for g in os.getenv('LOGS_STREAM_GROUPS', 'log-analyzer,ml-analyzer').split(',') if g]
+
+def ensure_stream_groups():
+    """Create the stream and the known consumer groups if they don't exist"""
+    for group in LOGS_STREAM_GROUPS:
+        try:
+            redis_client.xgroup_create(LOGS_STREAM_KEY, group, id='$', mkstream=True)
+        except redis.exceptions.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+def stream_id(entry_id):
+    return tuple(int(part) for part in entry_id.split('-'))
+
+def logs_stream_floor():
+    """Oldest entry id still needed: a group's oldest pending entry or its position, and the recent logs"""
+    recent = redis_client.xrevrange(LOGS_STREAM_KEY, count=RECENT_LOGS_MAX)
+    if len(recent) < RECENT_LOGS_MAX:
+        return None
+    floors = [recent[-1][0]]
+    for group in redis_client.xinfo_groups(LOGS_STREAM_KEY):
+        if group['pending']:
+            floors.append(redis_client.xpending(LOGS_STREAM_KEY, group['name'])['min'])
+        else:
+            floors.append(group['last-delivered-id'])
+    return min(floors, key=stream_id)
+
+def trim_logs_stream():
+    """Drop entries every consumer group has acknowledged; returns how many went"""
+    floor = logs_stream_floor()
+    trimmed = redis_client.xtrim(LOGS_STREAM_KEY, minid=floor, approximate=True) if floor else 0
+    capped = redis_client.xtrim(LOGS_STREAM_KEY, maxlen=LOGS_STREAM_MAXLEN, approximate=True)
+    if capped:
+        logger.warning(f"Log stream over {LOGS_STREAM_MAXLEN} entries; dropped {capped} a consumer group hadn't processed")
+    return trimmed + capped
+
+def run_stream_trim():
+    """Background task: trim the event stream behind its slowest consumer group"""
+    while True:
+        socketio.sleep(LOGS_STREAM_TRIM_INTERVAL)
+        if not is_leader():
+            continue
+        try:
+            trim_logs_stream()
+        except Exception as e:
+            logger.error(f"Failed to trim the log stream: {e}")
+
+def on_logs_flushed(logs):
+    """Runs on the write-behind worker after each batch reaches MongoDB"""
+    rollup_writer.apply(logs)
+    try:
+        sketch_writer.apply(logs)
+    except Exception as e:
+        logger.error(f"Failed to sketch flushed logs: {e}")
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for log in logs:
+            pipe.xadd(
+                LOGS_STREAM_KEY,
+                {"data": json.dumps(serialize_log(log), default=str)}
+            )
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Failed to publish flushed logs: {e}")
+
+# Write-behind buffer: logs are acknowledged once queued and flushed in batches
+write_buffer = WriteBehindBuffer(
+    logs_collection,
+    max_size=int(os.getenv('WRITE_BUFFER_SIZE', 50000)),
+    batch_size=int(os.getenv('WRITE_BUFFER_BATCH', 500)),
+    flush_interval=float(os.getenv('WRITE_BUFFER_FLUSH_INTERVAL', 0.5)),
+    spill_path=os.getenv('WRITE_BUFFER_SPILL_PATH', 'ingest-spill.jsonl'),
+    segment_bytes=int(os.getenv('WRITE_BUFFER_SEGMENT_BYTES', 4 * 1024 * 1024)),
+    on_flush=on_logs_flushed
+)
+
+# Slack notifications are digested and sent off the request path
+notifier = NotificationDispatcher(
+    SLACK_WEBHOOK_URL,
+    window=float(os.getenv('SLACK_DIGEST_WINDOW', 10)),
+    rate=float(os.getenv('SLACK_RATE_PER_SEC', 1)),
+    burst=int(os.getenv('SLACK_RATE_BURST', 5))
+)
+
+def alert_room(email):
+    """Socket.IO room of one user's authenticated connections"""
+    return f"user:{email}"
+
+# Stored alert rules, evaluated as logs are accepted; state changes go only to the owner's sockets
+alert_engine = AlertEngine(
+    alerts_collection,
+    on_event=lambda owner, event: socketio.emit('alert', event, to=alert_room(owner)),
+    min_samples=int(os.getenv('ALERT_MIN_SAMPLES', 20))
+)
+ALERT_TICK_INTERVAL = float(os.getenv('ALERT_TICK_INTERVAL', 5))
+ALERT_RELOAD_INTERVAL = float(os.getenv('ALERT_RELOAD_INTERVAL', 60))
+# Bumped on every rule change so the evaluating worker reloads promptly
+ALERTS_VERSION_KEY = "alerts:version"
+
+# Clustered mode: every worker sees every accepted log, one leader evaluates alerts
+CLUSTERED = SOCKETIO_MESSAGE_QUEUE is not None
+leader_lease = LeaderLease(redis_client, "collector:leader", ttl=int(ALERT_TICK_INTERVAL * 3))
+
+def is_leader():
+    return not CLUSTERED or leader_lease.held
+
+def run_alert_engine():
+    """Background task: re-check time-based alert conditions and pick up rule changes"""
+    last_reload, loaded_version = 0, None
+    while True:
+        try:
+            if CLUSTERED:
+                leader_lease.renew()
+            if is_leader():
+                version = redis_client.get(ALERTS_VERSION_KEY)
+                if version != loaded_version or time.monotonic() - last_reload >= ALERT_RELOAD_INTERVAL:
+                    alert_engine.load()
+                    last_reload, loaded_version = time.monotonic(), version
+                alert_engine.tick()
+        except Exception as e:
+            logger.error(f"Alert evaluation failed: {e}")
+        socketio.sleep(ALERT_TICK_INTERVAL)
+
+def rules_changed():
+    try:
+        redis_client.incr(ALERTS_VERSION_KEY)
+    except Exception as e:
+        logger.error(f"Failed to signal alert rule change: {e}")
+
+# Logs accepted before rollups were maintained are counted once, by one worker
+rollup_backfill_lease = LeaderLease(redis_client, "rollups:backfill", ttl=120)
+
+def run_rollup_backfill():
+    """Background task: count pre-existing logs into the rollups, then stop"""
+    def pause():
+        socketio.sleep(0)
+        if not rollup_backfill_lease.keep():
+            raise RuntimeError("rollup backfill lease lost")
+
+    # Replayed spill entries are the backfill's to count, so let them reach MongoDB first
+    while not write_buffer.replay_flushed():
+        socketio.sleep(1)
+    while not rollup_writer.coverage().get("complete"):
+        try:
+            if rollup_backfill_lease.renew():
+                count = rollup_writer.backfill_before_live(logs_collection, pause=pause)
+                if count is not None:
+                    logger.info(f"Backfilled rollups from {count} existing logs")
+        except Exception as e:
+            logger.error(f"Rollup backfill failed: {e}")
+        socketio.sleep(60)
+
+# Tiered retention: logs past LOG_HOT_RETENTION_DAYS move to Parquet files under
+# ARCHIVE_PATH, one run at a time across the cluster (see compactor.py)
+compactor_lease = LeaderLease(redis_client, "archive:compactor", ttl=120)
+
+def compaction_pause():
+    """Between compaction batches: let requests run, and stop if the lease was lost"""
+    socketio.sleep(0)
+    if not compactor_lease.keep():
+        raise RuntimeError("compaction lease lost")
+
+compactor = Compactor(
+    logs_collection, archive_state_collection, ARCHIVE_PATH,
+    retention=timedelta(days=LOG_HOT_RETENTION_DAYS),
+    batch_size=EXPORT_BATCH_SIZE,
+    pause=compaction_pause
+) if LOG_HOT_RETENTION_DAYS > 0 else None
+archive_reader = archive.ArchiveReader(ARCHIVE_PATH)
+
+def run_compactor():
+    """Background task: move logs past the hot retention into the archive"""
+    socketio.sleep(60)
+    while True:
+        try:
+            if compactor_lease.renew():
+                compactor.run()
+        except Exception as e:
+            compactor.stats["errors"] += 1
+            logger.error(f"Log compaction failed: {e}")
+        socketio.sleep(ARCHIVE_INTERVAL)
+
+# New logs reach dashboards as periodic 'log_frame' events, filtered per client
+broadcaster = LogBroadcaster(
+    socketio,
+    interval=float(os.getenv('BROADCAST_INTERVAL', 0.25)),
+    max_logs=int(os.getenv('BROADCAST_MAX_LOGS', 100)),
+    max_queue=int(os.getenv('BROADCAST_CLIENT_QUEUE', 20))
+)
+
+def on_live_logs(logs):
+    """Accepted logs (JSON-safe) from this worker, or from every worker when clustered"""
+    broadcaster.publish(logs)
+    if is_leader():
+        alert_engine.observe(logs)
+        for log in logs:
+            send_slack_notification(log)
+
+live_relay = LogRelay(redis_client, on_live_logs) if CLUSTERED else None
+
+def fan_out(logs):
+    """Hand accepted logs to the live dashboards, alerting and Slack"""
+    if live_relay is None:
+        on_live_logs(logs)
+        return
+    try:
+        live_relay.publish(logs)
+    except Exception as e:
+        logger.error(f"Failed to relay logs, handling locally: {e}")
+        on_live_logs(logs)
+
+# Verified-token cache; profile and role changes drop a user's tokens on every worker
+auth_relay = LogRelay(
+    redis_client, lambda emails: authenticator.drop_users(emails), channel="auth:invalidate"
+) if CLUSTERED else None
+authenticator = Authenticator(
+    users_collection,
+    app.config['SECRET_KEY'],
+    ttl=int(os.getenv('AUTH_CACHE_TTL', 300)),
+    max_tokens=int(os.getenv('AUTH_CACHE_SIZE', 10000)),
+    on_invalidate=auth_relay.publish if auth_relay else None
+)
+
+# bcrypt runs on a bounded native thread pool so logins don't stall the hub
+password_hasher = PasswordHasher(
+    workers=int(os.getenv('BCRYPT_WORKERS', 0)) or None,
+    max_queue=int(os.getenv('BCRYPT_MAX_QUEUE', 32)),
+    rounds=int(os.getenv('BCRYPT_ROUNDS', 12))
+)
+login_throttle = LoginThrottle(
+    redis_client,
+    max_attempts=int(os.getenv('LOGIN_MAX_ATTEMPTS', 10)),
+    window=int(os.getenv('LOGIN_WINDOW_SECONDS', 60))
+)
 
-redis_client = redis.from_url(os.getenv('REDIS_URL'), decode_responses=True)
+def throttled_response(retry_after):
+    """429 with Retry-After for a client over its login attempt limit"""
+    response = jsonify({'success': False, 'message': 'Too many attempts, retry later'})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+def hasher_busy_response():
+    """503 when the password hashing queue is full"""
+    response = jsonify({'success': False, 'message': 'Server busy, retry shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
 
 # JWT decorator
 def token_required(f):
@@ -37,59 +382,29 @@ def token_required(f):
         try:
             if token.startswith('Bearer '):
                 token = token[7:]
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            current_user = users_collection.find_one({'email': data['email']})
+            current_user = authenticator.verify(token)
         except:
             return jsonify({'success': False, 'message': 'Token is invalid'}), 401
         return f(current_user, *args, **kwargs)
     return decorated
 
 def send_slack_notification(log_entry):
-    """Send critical logs to Slack"""
-    if not SLACK_WEBHOOK_URL or log_entry['level'] not in ['error', 'fatal']:
-        return
-    
-    color = '#ff4444' if log_entry['level'] == 'error' else '#ff0000'
-    
-    message = {
-        "text": f"🚨 *{log_entry['level'].upper()}* Alert from *{log_entry['service']}*",
-        "attachments": [{
-            "color": color,
-            "fields": [
-                {
-                    "title": "Message",
-                    "value": log_entry['message'][:200],
-                    "short": False
-                },
-                {
-                    "title": "Service",
-                    "value": log_entry['service'],
-                    "short": True
-                },
-                {
-                    "title": "Time",
-                    "value": log_entry['timestamp'],
-                    "short": True
-                }
-            ],
-            "footer": "LogVizPro",
-            "ts": int(datetime.utcnow().timestamp())
-        }]
-    }
-    
-    try:
-        requests.post(SLACK_WEBHOOK_URL, json=message, timeout=3)
-    except Exception as e:
-        logger.error(f"Failed to send Slack notification: {e}")
-
-
-
+    """Queue critical logs for the background Slack dispatcher"""
+    notifier.submit(log_entry)
 
 # Health check
 @app.route('/health', methods=['GET'])
 def health():
     return jsonify({"status": "healthy", "service": "log-collector"}), 200
 
+@app.route('/health/ready', methods=['GET'])
+def readiness():
+    """Whether MongoDB and Redis answer; ingest keeps buffering while they don't"""
+    checks = probe(mongo_client, redis_client)
+    ready = all(check["ok"] for check in checks.values())
+    return jsonify({"status": "ready" if ready else "degraded", "service": "log-collector",
+                    "dependencies": checks}), 200 if ready else 503
+
 # ============ AUTH ENDPOINTS ============
 
 @app.route('/api/auth/register', methods=['POST'])
@@ -104,7 +419,7 @@ def register():
             return jsonify({'success': False, 'message': 'Email already registered'}), 400
         
         # Hash password
-        hashed_password = bcrypt.hashpw(data['password'].encode('utf-8'), bcrypt.gensalt())
+        hashed_password = password_hasher.hash(data['password'])
         
         # Create user
         user = {
@@ -122,31 +437,37 @@ def register():
             'message': 'User registered successfully'
         }), 201
         
+    except PasswordQueueFull:
+        return hasher_busy_response()
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @app.route('/api/auth/login', methods=['POST'])
 def login():
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'message': 'Invalid request data'}), 400
+    client = (request.remote_addr, data.get('email'))
+    retry_after = login_throttle.retry_after(*client)
+    if retry_after:
+        return throttled_response(retry_after)
     try:
-        data = request.json
-        if data is None:
-            return jsonify({'success': False, 'message': 'Invalid request data'}), 400
         
         # Find user
         user = users_collection.find_one({'email': data['email']})
         
         if not user:
+            login_throttle.failed(*client)
             return jsonify({'success': False, 'message': 'Invalid credentials'}), 401
         
         # Check password
-        if not bcrypt.checkpw(data['password'].encode('utf-8'), user['password']):
+        if not password_hasher.check(data['password'], user['password']):
+            login_throttle.failed(*client)
             return jsonify({'success': False, 'message': 'Invalid credentials'}), 401
+        login_throttle.succeeded(*client)
         
         # Generate JWT token
-        token = jwt.encode({
-            'email': user['email'],
-            'exp': datetime.utcnow() + timedelta(days=7)
-        }, app.config['SECRET_KEY'], algorithm="HS256")
+        token = authenticator.issue(user)
         
         return jsonify({
             'success': True,
@@ -158,6 +479,8 @@ def login():
             }
         }), 200
         
+    except PasswordQueueFull:
+        return hasher_busy_response()
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -176,52 +499,321 @@ def get_profile(current_user):
         }
     }), 200
 
+@app.route('/api/auth/profile', methods=['PUT'])
+@token_required
+def update_profile(current_user):
+    """Change the caller's name; earlier tokens are revoked and a new one is returned"""
+    try:
+        if current_user is None:
+            return jsonify({'success': False, 'message': 'User not found'}), 404
+        data = request.json or {}
+        name = str(data.get('name') or '').strip()
+        if not name:
+            return jsonify({'success': False, 'message': 'name is required'}), 400
+        
+        users_collection.update_one({'email': current_user['email']}, {'$set': {'name': name}})
+        user = authenticator.revoke(current_user['email'])
+        
+        return jsonify({
+            'success': True,
+            'token': authenticator.issue(user),
+            'user': {'name': user['name'], 'email': user['email'], 'role': user['role']}
+        }), 200
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/auth/users/<email>/role', methods=['PUT'])
+@token_required
+def update_role(current_user, email):
+    """Admin only: change a user's role, revoking that user's tokens"""
+    try:
+        if current_user is None or current_user['role'] != 'admin':
+            return jsonify({'success': False, 'message': 'Admin role required'}), 403
+        role = (request.json or {}).get('role')
+        if role not in ('user', 'admin'):
+            return jsonify({'success': False, 'message': 'role must be user or admin'}), 400
+        
+        if users_collection.update_one({'email': email}, {'$set': {'role': role}}).matched_count == 0:
+            return jsonify({'success': False, 'message': 'User not found'}), 404
+        authenticator.revoke(email)
+        
+        return jsonify({'success': True, 'email': email, 'role': role}), 200
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 # ============ LOG ENDPOINTS ============
 
+def build_log_entry(data, default_timestamp=None):
+    """Build a log document from a request payload"""
+    return {
+        "level": data.get("level", "info"),
+        "message": data.get("message"),
+        "service": data.get("service"),
+        "timestamp": (
+            parse_timestamp(data["timestamp"]) if data.get("timestamp") is not None
+            else default_timestamp or datetime.utcnow()
+        ),
+        "metadata": data.get("metadata", {})
+    }
+
+def validate_log_payload(data):
+    """Return an error string for an invalid log payload, or None"""
+    if not isinstance(data, dict):
+        return "entry must be a JSON object"
+    if not isinstance(data.get("message"), str) or not data["message"]:
+        return "message is required"
+    if data.get("service") is not None and not isinstance(data["service"], str):
+        return "service must be a string"
+    if not isinstance(data.get("level", "info"), str):
+        return "level must be a string"
+    if not isinstance(data.get("metadata", {}), dict):
+        return "metadata must be an object"
+    return None
+
+def build_log_query(args):
+    """Mongo filter for the level/service/from/to query parameters; raises ValueError"""
+    clauses = []
+    if args.get('level'):
+        clauses.append({'level': args['level']})
+    if args.get('service'):
+        clauses.append({'service': args['service']})
+    start, end = args.get('from'), args.get('to')
+    if start or end:
+        clauses.append(range_filter(
+            parse_timestamp(start) if start else None,
+            parse_timestamp(end) if end else None
+        ))
+    if len(clauses) > 1:
+        return {"$and": clauses}
+    return clauses[0] if clauses else {}
+
+def split_tiers(args):
+    """Split a from/to window at the archive watermark.
+
+    Returns (args for the hot query or None, archived (start, end) or None).
+    """
+    start = parse_timestamp(args['from']) if args.get('from') else None
+    end = parse_timestamp(args['to']) if args.get('to') else None
+    watermark = compactor.watermark() if compactor else None
+    if watermark is None or (start is not None and start >= watermark):
+        return args, None
+    archived = (start, min(end, watermark) if end else watermark)
+    if end is not None and end <= watermark:
+        return None, archived
+    return dict(args, **{'from': watermark.isoformat()}), archived
+
+def read_archive(archived, args, fields):
+    """Archived logs in the (start, end) range matching level/service, newest first"""
+    start, end = archived
+    days = archive_reader.iter_days(
+        start, end,
+        services=[args['service']] if args.get('service') else None,
+        levels=[args['level']] if args.get('level') else None,
+        columns=archive.columns_for(fields)
+    )
+    for _, table in days:
+        for batch in table.to_batches(EXPORT_BATCH_SIZE):
+            for row in batch.to_pylist():
+                yield archive.project(archive.from_row(row), fields)
+            socketio.sleep(0)
+
+def serialize_log(log):
+    """JSON-safe copy of a stored log (string _id, ISO timestamp)"""
+    return dict(log, _id=str(log['_id']), timestamp=format_timestamp(log.get('timestamp')))
+
+def parse_bulk_body(raw, content_type):
+    """Parse a JSON array or NDJSON request body into a list of payloads.
+
+    NDJSON lines that fail to parse are returned as ValueError instances so
+    the caller can report them per item instead of rejecting the whole batch.
+    """
+    text = raw.decode('utf-8')
+    if 'ndjson' not in content_type and text.lstrip().startswith('['):
+        items = json.loads(text)
+        if not isinstance(items, list):
+            raise ValueError("body must be a JSON array")
+        return items
+    
+    items = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError as e:
+            items.append(ValueError(f"invalid JSON: {e}"))
+    return items
+
+def buffer_full_response():
+    """429 with Retry-After when the write-behind buffer is full"""
+    response = jsonify({"success": False, "error": "Ingest buffer is full, retry later"})
+    response.headers['Retry-After'] = str(write_buffer.retry_after())
+    return response, 429
+
 @app.route('/api/logs', methods=['POST'])
 def create_log():
     try:
-        data = request.json
-        log_entry = {
-            "level": data.get("level", "info"), # type: ignore
-            "message": data.get("message"), # type: ignore
-            "service": data.get("service"), # pyright: ignore[reportOptionalMemberAccess]
-            "timestamp": data.get("timestamp", datetime.utcnow().isoformat()), # type: ignore
-            "metadata": data.get("metadata", {}) # type: ignore
-        }
+        data = request.get_json(silent=True)
+        error = validate_log_payload(data)
+        if error:
+            return jsonify({"success": False, "error": error}), 400
+        try:
+            log_entry = build_log_entry(data)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        
+        if not write_buffer.offer([log_entry]):
+            return buffer_full_response()
+        # The queued document keeps its ObjectId and datetime; clients get a JSON-safe copy
+        log_entry = serialize_log(log_entry)
+        
+        fan_out([log_entry])
+        
+        return jsonify({"success": True, "data": log_entry}), 202
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/logs/bulk', methods=['POST'])
+def create_logs_bulk():
+    """Ingest a JSON array or NDJSON body of logs with one batched write"""
+    try:
+        try:
+            items = parse_bulk_body(request.get_data(), request.content_type or '')
+        except ValueError as e:
+            return jsonify({"success": False, "error": f"Invalid request body: {e}"}), 400
         
-        result = logs_collection.insert_one(log_entry)
-        log_entry['_id'] = str(result.inserted_id)
+        if not items:
+            return jsonify({"success": False, "error": "No log entries provided"}), 400
+        if len(items) > MAX_BULK_SIZE:
+            return jsonify({
+                "success": False,
+                "error": f"Too many entries ({len(items)}), max is {MAX_BULK_SIZE}"
+            }), 413
         
-        redis_client.lpush("recent_logs", str(log_entry))
-        redis_client.ltrim("recent_logs", 0, 99)
+        # Validate everything up front
+        now = datetime.utcnow()
+        entries, errors = [], []
+        for index, item in enumerate(items):
+            error = str(item) if isinstance(item, ValueError) else validate_log_payload(item)
+            if error:
+                errors.append({"index": index, "error": error})
+                continue
+            try:
+                entries.append(build_log_entry(item, now))
+            except ValueError as e:
+                errors.append({"index": index, "error": str(e)})
         
-        socketio.emit('new_log', log_entry)
+        if entries and not write_buffer.offer(entries):
+            return buffer_full_response()
         
-        # Send to Slack if critical
-        send_slack_notification(log_entry)
+        inserted = [serialize_log(entry) for entry in entries]
+        if inserted:
+            fan_out(inserted)
         
-        return jsonify({"success": True, "data": log_entry}), 201
+        return jsonify({
+            "success": bool(inserted),
+            "received": len(items),
+            "accepted": len(inserted),
+            "rejected": len(errors),
+            "errors": errors
+        }), 202 if inserted else 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
+
 @app.route('/api/logs', methods=['GET'])
 def get_logs():
+    """One page of logs, newest first; pass back `nextCursor` as `cursor` for the next page"""
     try:
-        level = request.args.get('level')
-        service = request.args.get('service')
-        limit = int(request.args.get('limit', 100))
-        
-        query = {}
-        if level:
-            query['level'] = level
-        if service:
-            query['service'] = service
-        
-        logs = list(logs_collection.find(query).sort("timestamp", -1).limit(limit))
-        
-        for log in logs:
-            log['_id'] = str(log['_id'])
+        limit = min(max(int(request.args.get('limit', 100)), 1), MAX_PAGE_SIZE)
+        query = build_log_query(request.args)
+        cursor = request.args.get('cursor')
+        if cursor:
+            query = {"$and": [query, after_cursor(cursor)]} if query else after_cursor(cursor)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    try:
+        docs = list(
+            logs_collection.find(query, projection(request.args.get('fields')))
+            .sort(PAGE_SORT)
+            .limit(limit + 1)
+        )
+        next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+        logs = [serialize_log(log) for log in docs[:limit]]
         
+        return jsonify({"success": True, "data": logs, "nextCursor": next_cursor}), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/logs/search', methods=['GET'])
+def search_logs():
+    """Logs whose message matches `q` (words, "phrases", wild*cards) and/or `regex`.
+
+    Narrowed by level/service/from/to; without from/to only the last
+    SEARCH_DEFAULT_HOURS are searched. Newest first with cursor paging, or
+    sort=relevance for text-score order (single page).
+    """
+    try:
+        search = SearchQuery(request.args.get('q'), request.args.get('regex'))
+        limit = min(max(int(request.args.get('limit', 50)), 1), MAX_PAGE_SIZE)
+        by_relevance = request.args.get('sort') == 'relevance'
+        if by_relevance and not search.uses_text_index:
+            raise ValueError("sort=relevance needs words or phrases in q")
+
+        args = request.args.to_dict()
+        if not args.get('from') and not args.get('to'):
+            args['from'] = (datetime.utcnow() - timedelta(hours=SEARCH_DEFAULT_HOURS)).isoformat()
+        clauses = [search.filter()]
+        filters = build_log_query(args)
+        if filters:
+            clauses.append(filters)
+        cursor = request.args.get('cursor')
+        if cursor and not by_relevance:
+            clauses.append(after_cursor(cursor))
+        query = clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+        fields = projection(request.args.get('fields'))
+        if fields:
+            fields['message'] = 1
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    try:
+        # $text candidates can't be read in index order, so they go through a
+        # blocking sort; let a broad one spill to disk instead of failing
+        if by_relevance:
+            score = {"score": {"$meta": "textScore"}}
+            found = logs_collection.find(query, {**(fields or {}), **score}, allow_disk_use=True)
+            found = found.sort(list(score.items()))
+        else:
+            found = logs_collection.find(query, fields, allow_disk_use=True).sort(PAGE_SORT)
+        docs = list(found.limit(limit + 1).max_time_ms(SEARCH_TIMEOUT_MS))
+
+        next_cursor = None
+        if len(docs) > limit and not by_relevance:
+            next_cursor = encode_cursor(docs[limit - 1])
+        results = []
+        for log in docs[:limit]:
+            result = serialize_log(log)
+            result['snippet'], result['highlights'] = search.highlight(log.get('message'))
+            results.append(result)
+
+        return jsonify({"success": True, "data": results, "nextCursor": next_cursor}), 200
+    except OperationFailure as e:
+        # Bad regex for the server, or the query ran past SEARCH_TIMEOUT_MS
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/logs/recent', methods=['GET'])
+def get_recent_logs():
+    """Most recently persisted logs, newest first, straight from the event stream"""
+    try:
+        count = min(int(request.args.get('count', 100)), 1000)
+        logs = [
+            json.loads(fields['data'])
+            for _, fields in redis_client.xrevrange(LOGS_STREAM_KEY, count=count)
+        ]
         return jsonify({"success": True, "data": logs}), 200
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -229,37 +821,65 @@ def get_logs():
 @app.route('/api/logs/export', methods=['GET'])
 @token_required
 def export_logs(current_user):
+    """Stream every log matching the filters (level/service/from/to) as a download.
+
+    Reads MongoDB, then the archive for any part of the window before the watermark.
+    CSV columns are the `fields` asked for, or those of a bounded sample of the
+    matching logs (see export.py).
+    """
     try:
         format_type = request.args.get('format', 'json')
-        logs = list(logs_collection.find().limit(1000))
-        
-        for log in logs:
-            log['_id'] = str(log['_id'])
-        
+        compression = request.args.get('compress') or None
+        export.check_options(format_type, compression)
+        hot_args, archived = split_tiers(request.args.to_dict())
+        query = build_log_query(hot_args) if hot_args is not None else None
+        limit = int(request.args.get('limit', 0))
+        fields = projection(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    try:
+        columns = None
         if format_type == 'csv':
-            # Simple CSV conversion
-            import csv
-            from io import StringIO
-            
-            output = StringIO()
-            if logs:
-                writer = csv.DictWriter(output, fieldnames=logs[0].keys())
-                writer.writeheader()
-                writer.writerows(logs)
-            
-            return output.getvalue(), 200, {
-                'Content-Type': 'text/csv',
-                'Content-Disposition': 'attachment; filename=logs.csv'
-            }
-        else:
-            return jsonify(logs), 200, {
-                'Content-Type': 'application/json',
-                'Content-Disposition': 'attachment; filename=logs.json'
-            }
-            
+            if fields:
+                columns = export.csv_columns(fields)
+            else:
+                names = set()
+                if query is not None:
+                    names = export.sample_fields(logs_collection, query, PAGE_SORT, EXPORT_COLUMN_SAMPLE)
+                if archived:
+                    names |= set(archive.LOG_FIELDS)
+                columns = export.csv_columns(names)
+        cursor = None
+        if query is not None:
+            cursor = logs_collection.find(query, fields).sort(PAGE_SORT).batch_size(EXPORT_BATCH_SIZE)
+            if limit > 0:
+                cursor = cursor.limit(limit)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+    def generate():
+        try:
+            logs = (serialize_log(log) for log in cursor) if cursor is not None else iter(())
+            if archived:
+                logs = itertools.chain(logs, (serialize_log(log) for log in read_archive(archived, request.args, fields)))
+            if limit > 0:
+                logs = itertools.islice(logs, limit)
+            for chunk in export.compress(export.encode(logs, format_type, columns), compression):
+                yield chunk
+                # Let websocket and ingest handlers run between chunks
+                socketio.sleep(0)
+        except Exception as e:
+            logger.error(f"Export aborted: {e}")
+        finally:
+            if cursor is not None:
+                cursor.close()
+
+    return Response(stream_with_context(generate()), 200, {
+        'Content-Type': export.content_type(format_type, compression),
+        'Content-Disposition': f'attachment; filename={export.filename(format_type, compression)}'
+    })
+
 # ============ ALERT ENDPOINTS ============
 
 @app.route('/api/alerts', methods=['GET'])
@@ -273,6 +893,8 @@ def get_alerts(current_user):
         for alert in alerts:
             alert['_id'] = str(alert['_id'])
             alert['id'] = alert['_id']
+            # Other workers only have the persisted `state`
+            alert['live'] = alert_engine.state_of(alert['_id']) if is_leader() else None
         return jsonify({"success": True, "data": alerts}), 200
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -294,11 +916,21 @@ def create_alert(current_user):
             'condition': data['condition'],
             'threshold': data['threshold'],
             'severity': data['severity'],
+            # Optional scope and window; unset means every service/level and the condition's default
+            'service': data.get('service') or None,
+            'level': data.get('level') or None,
+            'window': data.get('window') or None,
             'userEmail': current_user['email'],
             'createdAt': datetime.utcnow().isoformat()
         }
+        try:
+            Rule({**alert, '_id': None})
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
         
         result = alerts_collection.insert_one(alert)
+        alert_engine.add(alert)
+        rules_changed()
         alert['_id'] = str(result.inserted_id)
         alert['id'] = alert['_id']
         
@@ -320,17 +952,125 @@ def delete_alert(current_user, alert_id):
         })
         
         if result.deleted_count:
+            alert_engine.remove(alert_id)
+            rules_changed()
             return jsonify({"success": True, "message": "Alert deleted"}), 200
         else:
             return jsonify({"success": False, "message": "Alert not found"}), 404
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/api/alerts/<alert_id>', methods=['PUT'])
+@token_required
+def update_alert(current_user, alert_id):
+    try:
+        if current_user is None:
+            return jsonify({"success": False, "error": "User not found"}), 404
+        
+        data = request.json
+        if data is None:
+            return jsonify({"success": False, "error": "Invalid request data"}), 400
+        
+        from bson import ObjectId
+        query = {'_id': ObjectId(alert_id), 'userEmail': current_user['email']}
+        current = alerts_collection.find_one(query)
+        if current is None:
+            return jsonify({"success": False, "message": "Alert not found"}), 404
+        
+        changes = {field: data[field] for field in ('name', 'description', 'condition', 'threshold', 'severity')
+                   if field in data}
+        # Optional scope and window; empty resets to every service/level and the condition's default
+        changes.update({field: data[field] or None for field in ('service', 'level', 'window') if field in data})
+        alert = {**current, **changes}
+        try:
+            Rule(alert)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        
+        alerts_collection.update_one(query, {'$set': changes})
+        alert_engine.add(alert)
+        rules_changed()
+        alert['_id'] = str(alert['_id'])
+        alert['id'] = alert['_id']
+        
+        return jsonify({"success": True, "data": alert}), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/ingest/stats', methods=['GET'])
+def ingest_stats():
+    return jsonify({
+        "success": True,
+        "data": write_buffer.snapshot(),
+        "notifications": notifier.snapshot(),
+        "alerts": alert_engine.snapshot(),
+        "broadcast": broadcaster.snapshot(),
+        "auth": {**authenticator.snapshot(), "passwords": password_hasher.snapshot(),
+                 "loginsThrottled": login_throttle.stats["throttled"]},
+        "archive": compactor.snapshot() if compactor else None,
+        "sketches": sketch_writer.snapshot(),
+        "worker": {
+            "pid": os.getpid(),
+            "clustered": CLUSTERED,
+            "leader": is_leader(),
+            "spillPath": write_buffer.spill_path,
+            "relay": live_relay.stats if live_relay else None
+        }
+    }), 200
+
 # WebSocket
 @socketio.on('connect')
-def handle_connect():
+def handle_connect(auth=None):
+    broadcaster.connect(request.sid) # type: ignore
+    # Log frames are public; alert events only reach sockets that present a valid token
+    token = auth.get('token') if isinstance(auth, dict) else None
+    if token:
+        try:
+            user = authenticator.verify(token)
+        except Exception:
+            user = None
+        if user is not None:
+            join_room(alert_room(user['email']))
     emit('connected', {'message': 'Connected to LogVizPro'})
 
+@socketio.on('disconnect')
+def handle_disconnect(*args):
+    broadcaster.disconnect(request.sid) # type: ignore
+
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    """Limit this client's log frames to some services and/or levels (empty means all)"""
+    data = data if isinstance(data, dict) else {}
+    broadcaster.subscribe(request.sid, data.get('services'), data.get('levels')) # type: ignore
+    emit('subscribed', {'services': data.get('services') or [], 'levels': data.get('levels') or []})
+
+def start_background_workers():
+    """Start the collector's background workers (once per worker process)"""
+    ensure_indexes()
+    rollup_writer.mark_live()
+    ensure_stream_groups()
+    write_buffer.claim_spill_slot()
+    write_buffer.start()
+    notifier.start()
+    if live_relay is not None:
+        live_relay.start()
+    if auth_relay is not None:
+        auth_relay.start()
+    socketio.start_background_task(run_alert_engine)
+    socketio.start_background_task(broadcaster.run)
+    socketio.start_background_task(run_sketch_flush)
+    socketio.start_background_task(run_rollup_backfill)
+    socketio.start_background_task(run_stream_trim)
+    if compactor is not None:
+        socketio.start_background_task(run_compactor)
+
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 3001))
-    socketio.run(app, host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
+    if os.getenv('FLASK_ENV') == 'development':
+        # The debug reloader imports the app twice; only the serving child runs workers
+        if os.getenv('WERKZEUG_RUN_MAIN') == 'true':
+            start_background_workers()
+        socketio.run(app, host='0.0.0.0', port=port, debug=True)
+    else:
+        start_background_workers()
+        socketio.run(app, host='0.0.0.0', port=port, debug=False, use_reloader=False, log_output=False)
\ No newline at end of file
@@ -0,0 +1,145 @@
+"""
+JWT issue and verification with an in-process cache.
+
+Tokens carry the claims request handlers need (email, name, role) plus the
+user's `tokenVersion` at the time of issue, so a verified token describes
+its user without reading `users`. Verified tokens are kept in an LRU for
+`ttl` seconds (never past their expiry); a repeat request costs a dict
+lookup instead of a signature check and a Mongo round trip.
+
+Revocation is by version: changing a user's profile or role increments
+`tokenVersion` and drops that user's cached tokens (on every worker, via
+`on_invalidate`). The next request with an older token re-checks the
+version, read at most once per user per `ttl`, and is rejected.
+
+Tokens issued before claims were embedded still work; they fall back to a
+user lookup on a cache miss.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import jwt
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+USER_FIELDS = {'_id': 0, 'email': 1, 'name': 1, 'role': 1, 'tokenVersion': 1}
+
+
+class Authenticator:
+    """Issues tokens and verifies them against an LRU+TTL cache"""
+
+    def __init__(self, users_collection, secret, ttl=300, max_tokens=10000,
+                 token_lifetime=timedelta(days=7), on_invalidate=None):
+        self.users = users_collection
+        self.secret = secret
+        self.ttl = ttl
+        self.max_tokens = max_tokens
+        self.token_lifetime = token_lifetime
+        self.on_invalidate = on_invalidate
+
+        self._tokens = OrderedDict()    # token -> (expires, email, user)
+        self._versions = OrderedDict()  # email -> (expires, tokenVersion)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "userLookups": 0, "rejected": 0, "invalidations": 0}
+
+    def issue(self, user):
+        """Signed token with the user's claims embedded"""
+        return jwt.encode({
+            'email': user['email'],
+            'name': user.get('name'),
+            'role': user.get('role', 'user'),
+            'ver': user.get('tokenVersion', 0),
+            'exp': datetime.utcnow() + self.token_lifetime
+        }, self.secret, algorithm="HS256")
+
+    def verify(self, token):
+        """The user a token belongs to, or None if that user no longer exists.
+
+        Raises jwt.InvalidTokenError for bad, expired or revoked tokens.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._tokens.get(token)
+            if entry is not None and entry[0] > now:
+                self._tokens.move_to_end(token)
+                self.stats["hits"] += 1
+                return entry[2]
+            self.stats["misses"] += 1
+
+        claims = jwt.decode(token, self.secret, algorithms=["HS256"])
+        email = claims['email']
+        if 'ver' in claims:
+            version = self._user_version(email, now)
+            if version is None:
+                return None
+            if version != claims['ver']:
+                self.stats["rejected"] += 1
+                raise jwt.InvalidTokenError("token has been revoked")
+            user = {'email': email, 'name': claims.get('name'), 'role': claims.get('role', 'user')}
+        else:
+            doc = self._lookup(email)
+            if doc is None:
+                return None
+            user = {'email': email, 'name': doc.get('name'), 'role': doc.get('role', 'user')}
+
+        lifetime = min(self.ttl, claims.get('exp', float('inf')) - time.time())
+        with self._lock:
+            self._tokens[token] = (now + lifetime, email, user)
+            if len(self._tokens) > self.max_tokens:
+                self._tokens.popitem(last=False)
+        return user
+
+    def revoke(self, email):
+        """Invalidate every token issued to `email` so far; returns the user's new document"""
+        doc = self.users.find_one_and_update(
+            {'email': email}, {'$inc': {'tokenVersion': 1}},
+            projection=USER_FIELDS, return_document=ReturnDocument.AFTER
+        )
+        self.invalidate([email])
+        return doc
+
+    def invalidate(self, emails):
+        """Drop cached tokens for these users here and, through on_invalidate, on other workers"""
+        self.drop_users(emails)
+        if self.on_invalidate:
+            try:
+                self.on_invalidate(list(emails))
+            except Exception as e:
+                logger.error(f"Failed to broadcast token invalidation: {e}")
+
+    def drop_users(self, emails):
+        emails = set(emails)
+        with self._lock:
+            for token in [t for t, entry in self._tokens.items() if entry[1] in emails]:
+                del self._tokens[token]
+            for email in emails:
+                self._versions.pop(email, None)
+            self.stats["invalidations"] += len(emails)
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, "tokens": len(self._tokens), "ttl": self.ttl}
+
+    def _lookup(self, email):
+        self.stats["userLookups"] += 1
+        return self.users.find_one({'email': email}, USER_FIELDS)
+
+    def _user_version(self, email, now):
+        with self._lock:
+            entry = self._versions.get(email)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+        doc = self._lookup(email)
+        if doc is None:
+            return None
+        version = doc.get('tokenVersion', 0)
+        with self._lock:
+            self._versions[email] = (now + self.ttl, version)
+            if len(self._versions) > self.max_tokens:
+                self._versions.popitem(last=False)
+        return version
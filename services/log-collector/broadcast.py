@@ -0,0 +1,233 @@
+"""
+Batched Socket.IO fan-out of newly ingested logs.
+
+Instead of one `new_log` event per log per client, accepted logs are queued
+and sent as a `log_frame` every `interval` seconds. Each client subscribes
+to the services/levels it wants; frames are built once per distinct
+subscription and carry at most `max_logs` of the newest matching logs, with
+a count of what was left out when ingest outpaces the UI. Every frame also
+carries counters for all logs accepted since the previous frame, so the
+dashboard can keep its totals current without re-querying analytics.
+
+Clients acknowledge frames. A client with an unacknowledged frame is sent
+nothing more; its frames wait in a bounded queue, and when that overflows
+the oldest are folded into a summary instead of piling up in memory.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter, deque
+
+logger = logging.getLogger(__name__)
+
+ERROR_LEVELS = ('error', 'fatal')
+
+
+class Subscription:
+    """A client's filter, queue of unsent frames and in-flight state"""
+
+    def __init__(self, max_queue):
+        self.services = None
+        self.levels = None
+        self.queue = deque()
+        self.max_queue = max_queue
+        self.in_flight_since = None
+        self.in_flight_seq = None
+        self.skipped = 0
+
+    def set_filter(self, services=None, levels=None):
+        self.services = frozenset(services) if services else None
+        self.levels = frozenset(levels) if levels else None
+
+    @property
+    def key(self):
+        return (self.services, self.levels)
+
+    def matches(self, log):
+        return ((self.services is None or log.get('service') in self.services) and
+                (self.levels is None or log.get('level') in self.levels))
+
+    def push(self, frame):
+        """Queue a frame, merging the two oldest when the queue is full"""
+        self.queue.append(frame)
+        if len(self.queue) > self.max_queue:
+            oldest = self.queue.popleft()
+            merged = self.queue[0]
+            merged['matched'] += oldest['matched']
+            merged['skipped'] += len(oldest['logs']) + oldest['skipped']
+            merged['counts'] = merge_counts(oldest['counts'], merged['counts'])
+            self.skipped += len(oldest['logs'])
+
+
+def merge_counts(a, b):
+    return {
+        'total': a['total'] + b['total'],
+        'errors': a['errors'] + b['errors'],
+        'byLevel': dict(Counter(a['byLevel']) + Counter(b['byLevel'])),
+        'byService': dict(Counter(a['byService']) + Counter(b['byService'])),
+    }
+
+
+class LogBroadcaster:
+    """Coalesces accepted logs into periodic, per-subscription frames"""
+
+    def __init__(self, socketio, interval=0.25, max_logs=100, max_pending=10000,
+                 max_queue=20, ack_timeout=5.0):
+        self.socketio = socketio
+        self.interval = interval
+        self.max_logs = max_logs
+        self.max_queue = max_queue
+        self.ack_timeout = ack_timeout
+
+        self._pending = deque(maxlen=max_pending)
+        self._levels = Counter()
+        self._services = Counter()
+        self._total = 0
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._seq = 0
+
+        # Only changed while holding _lock
+        self.stats = {"published": 0, "dropped": 0, "frames": 0, "emitted": 0, "sampledOut": 0,
+                      "skippedForSlowClients": 0, "clients": 0}
+
+    # ---------- producers ----------
+
+    def publish(self, logs):
+        """Queue serialized logs for the next frame; O(1) per log"""
+        with self._lock:
+            # A full queue loses its oldest logs; they still count towards the frame totals
+            self.stats["dropped"] += max(0, len(self._pending) + len(logs) - self._pending.maxlen)
+            self._pending.extend(logs)
+            self._total += len(logs)
+            self._levels.update(log.get('level') for log in logs)
+            self._services.update(log.get('service') for log in logs)
+            self.stats["published"] += len(logs)
+
+    # ---------- clients ----------
+
+    def connect(self, sid):
+        with self._lock:
+            self._clients[sid] = Subscription(self.max_queue)
+            self.stats["clients"] = len(self._clients)
+
+    def disconnect(self, sid):
+        with self._lock:
+            self._clients.pop(sid, None)
+            self.stats["clients"] = len(self._clients)
+
+    def subscribe(self, sid, services=None, levels=None):
+        with self._lock:
+            subscription = self._clients.setdefault(sid, Subscription(self.max_queue))
+            subscription.set_filter(services, levels)
+            self.stats["clients"] = len(self._clients)
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, "pending": len(self._pending), "interval": self.interval}
+
+    # ---------- frames ----------
+
+    def run(self):
+        """Background task: build and send a frame every interval"""
+        while True:
+            started = time.monotonic()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Log broadcast failed: {e}")
+            self.socketio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def flush(self):
+        with self._lock:
+            sends = self._prepare_sends()
+        # Emit without the lock: acks for earlier frames may arrive meanwhile
+        for sid, frame in sends:
+            self.socketio.emit('log_frame', frame, to=sid,
+                               callback=lambda *args, sid=sid, seq=frame['seq']: self._acknowledged(sid, seq))
+
+    def _prepare_sends(self):
+        """Queue this interval's frames and pick each ready client's next one (caller holds the lock)"""
+        if not self._total and not any(c.queue for c in self._clients.values()):
+            return []
+        logs = list(self._pending)
+        self._pending.clear()
+        counts = {
+            'total': self._total,
+            'errors': sum(self._levels[level] for level in ERROR_LEVELS),
+            'byLevel': dict(self._levels),
+            'byService': dict(self._services),
+        }
+        self._total = 0
+        self._levels = Counter()
+        self._services = Counter()
+
+        frames = {}
+        now = time.monotonic()
+        if counts['total']:
+            self._seq += 1
+            self.stats["frames"] += 1
+            for subscription in self._clients.values():
+                key = subscription.key
+                if key not in frames:
+                    frames[key] = self._build_frame(subscription, logs, counts)
+                subscription.push(dict(frames[key]))
+
+        sends = []
+        for sid, subscription in self._clients.items():
+            if subscription.in_flight_since is not None:
+                if now - subscription.in_flight_since < self.ack_timeout:
+                    continue
+                # Never acknowledged: treat as lost and move on
+                subscription.in_flight_since = None
+            frame = self._next_frame(subscription, now)
+            if frame is not None:
+                sends.append((sid, frame))
+        return sends
+
+    def _build_frame(self, subscription, logs, counts):
+        matched = logs if subscription.key == (None, None) else [
+            log for log in logs if subscription.matches(log)
+        ]
+        # Newest first, like the dashboard's list
+        sent = matched[-self.max_logs:][::-1]
+        sampled_out = len(matched) - len(sent)
+        self.stats["sampledOut"] += sampled_out
+        return {
+            'seq': self._seq,
+            'logs': sent,
+            'matched': len(matched),
+            'skipped': sampled_out,
+            'counts': counts,
+        }
+
+    def _next_frame(self, subscription, now):
+        if not subscription.queue:
+            return None
+        frame = subscription.queue.popleft()
+        while subscription.queue:
+            # Coalesce whatever queued up while the client was busy into one frame
+            newer = subscription.queue.popleft()
+            frame = {
+                'seq': newer['seq'],
+                'logs': (newer['logs'] + frame['logs'])[:self.max_logs],
+                'matched': frame['matched'] + newer['matched'],
+                'skipped': frame['skipped'] + newer['skipped'] +
+                           max(0, len(frame['logs']) + len(newer['logs']) - self.max_logs),
+                'counts': merge_counts(frame['counts'], newer['counts']),
+            }
+        if subscription.skipped:
+            self.stats["skippedForSlowClients"] += subscription.skipped
+            subscription.skipped = 0
+        subscription.in_flight_since = now
+        subscription.in_flight_seq = frame['seq']
+        self.stats["emitted"] += 1
+        return frame
+
+    def _acknowledged(self, sid, seq):
+        with self._lock:
+            subscription = self._clients.get(sid)
+            # A late ack for a frame given up on must not release the one now in flight
+            if subscription is not None and subscription.in_flight_seq == seq:
+                subscription.in_flight_since = None
@@ -0,0 +1,154 @@
+"""
+Coordination between log-collector workers and replicas.
+
+With several processes behind a load balancer, each one only accepts a share
+of the logs and holds a share of the websocket clients. `LogRelay` publishes
+every accepted batch on a Redis pub/sub channel that all workers subscribe
+to, so each worker's broadcaster sees every log. Work that must happen once
+per cluster (alert evaluation, Slack digests) runs only on the worker that
+holds the `LeaderLease`; its Socket.IO emits reach clients on other workers
+through Flask-SocketIO's Redis message queue.
+
+`run_workers` starts several collector processes on one port. eventlet
+listens with SO_REUSEPORT, so the kernel spreads connections across them.
+The supervisor only uses the standard library; app.py calls it before it
+creates any client, so no connection or pool is shared with the workers.
+"""
+
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+LIVE_CHANNEL = "logs:live"
+
+
+class LogRelay:
+    """Fans accepted logs out to every collector worker over Redis pub/sub"""
+
+    def __init__(self, redis_client, on_logs, channel=LIVE_CHANNEL):
+        self.redis = redis_client
+        self.on_logs = on_logs
+        self.channel = channel
+        self._thread = None
+        self._stop = threading.Event()
+        self.stats = {"published": 0, "received": 0, "errors": 0}
+
+    def publish(self, logs):
+        self.redis.publish(self.channel, json.dumps(logs, default=str))
+        self.stats["published"] += len(logs)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="log-relay", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            pubsub = None
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                while not self._stop.is_set():
+                    # Short waits rather than listen(), which would trip the client's socket timeout
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    logs = json.loads(message["data"])
+                    self.stats["received"] += len(logs)
+                    self.on_logs(logs)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"Log relay error, resubscribing: {e}")
+                self._stop.wait(1)
+            finally:
+                if pubsub is not None:
+                    pubsub.close()
+
+
+class LeaderLease:
+    """A Redis key held by at most one worker at a time, renewed while it is alive"""
+
+    def __init__(self, redis_client, key, ttl=15):
+        self.redis = redis_client
+        self.key = key
+        self.ttl = ttl
+        self.token = uuid.uuid4().hex
+        self.held = False
+        self.renewed = 0.0  # time.monotonic() of the last successful renew
+
+    def renew(self):
+        """Acquire or extend the lease; returns whether this worker is the leader"""
+        try:
+            if self.redis.set(self.key, self.token, nx=True, ex=self.ttl):
+                if not self.held:
+                    logger.info(f"Acquired {self.key}")
+                self.held = True
+            elif self.redis.get(self.key) == self.token:
+                self.redis.expire(self.key, self.ttl)
+                self.held = True
+            else:
+                self.held = False
+        except Exception as e:
+            logger.error(f"Leader lease {self.key} unavailable: {e}")
+            self.held = False
+        if self.held:
+            self.renewed = time.monotonic()
+        return self.held
+
+    def keep(self):
+        """For long jobs: renew once a third of the TTL has passed; returns whether the lease is still held"""
+        if time.monotonic() - self.renewed < self.ttl / 3:
+            return self.held
+        return self.renew()
+
+
+def run_workers(count, worker_env="COLLECTOR_WORKER"):
+    """Run `count` copies of the current script and restart any that exit.
+
+    Each child gets `worker_env` set to its index; returns on SIGTERM/SIGINT
+    after the children have shut down.
+    """
+    stopping = False
+
+    def spawn(index):
+        env = dict(os.environ, **{worker_env: str(index)})
+        return subprocess.Popen([sys.executable] + sys.argv, env=env)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    children = {index: spawn(index) for index in range(count)}
+    logger.info(f"Started {count} collector workers")
+    while not stopping:
+        time.sleep(1)
+        for index, child in list(children.items()):
+            if child.poll() is not None and not stopping:
+                logger.error(f"Worker {index} exited with {child.returncode}, restarting")
+                children[index] = spawn(index)
+
+    for child in children.values():
+        child.terminate()
+    for child in children.values():
+        try:
+            child.wait(15)
+        except subprocess.TimeoutExpired:
+            child.kill()
@@ -0,0 +1,175 @@
+"""
+Moves logs older than the hot retention from MongoDB into the archive.
+
+The tiers are split by a watermark kept in `db.archive_state`: logs before
+it are read from the archive, logs at or after it from `db.logs`. The
+compactor moves one UTC day at a time:
+
+    1. record the run as pending
+    2. stream the day's logs into new Parquet files (see archive.py)
+    3. advance the watermark past the day; the run becomes `deleting`
+    4. delete exactly the archived documents (by _id, read back from the files)
+
+Readers switch to the archive for that day at step 3. A crash before it
+leaves only unfinished files, removed on the next run; a crash during step
+4 resumes the deletion. Logs that arrive with a timestamp before the
+watermark are swept into the archive by the next run.
+
+This is age-based rather than a TTL index: a TTL index would delete logs
+whether or not they had reached the archive.
+
+Run `python compactor.py` to compact once outside the collector.
+"""
+
+import argparse
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pyarrow.parquet as pq
+from bson import ObjectId
+from pymongo import ASCENDING
+
+from logviz_common.archive import PartitionWriter, ArchiveReader, day_floor, to_row
+from logviz_common.timestamps import parse_timestamp, range_filter
+
+logger = logging.getLogger(__name__)
+
+STATE_ID = "logs"
+DELETE_BATCH = 5000
+
+
+class Compactor:
+    """Age-based retention for `db.logs` backed by the Parquet archive"""
+
+    def __init__(self, logs_collection, state_collection, root, retention=timedelta(days=7),
+                 batch_size=5000, pause=None):
+        self.logs = logs_collection
+        self.state = state_collection
+        self.root = root
+        self.reader = ArchiveReader(root)
+        self.retention = retention
+        self.batch_size = batch_size
+        # Called between batches: yield to other work, or raise to abandon the run
+        self.pause = pause or (lambda: None)
+        self.stats = {"runs": 0, "archived": 0, "deleted": 0, "files": 0, "lastRun": None, "errors": 0}
+
+    def watermark(self):
+        """Logs before this are archived (None until the first day is compacted)"""
+        doc = self.state.find_one({"_id": STATE_ID}, {"watermark": 1})
+        return doc.get("watermark") if doc else None
+
+    def run(self, now=None):
+        """Recover an interrupted run, sweep late arrivals, then archive every day past retention"""
+        now = now or datetime.utcnow()
+        cutoff = day_floor(now - self.retention)
+        self.recover()
+        moved = 0
+
+        watermark = self.watermark()
+        if watermark is not None and self.logs.find_one(range_filter(end=watermark), {"_id": 1}):
+            moved += self._move(None, watermark)
+
+        day = watermark or self._oldest_day()
+        while day is not None and day < cutoff:
+            moved += self._move(day, day + timedelta(days=1))
+            day += timedelta(days=1)
+
+        self.stats["runs"] += 1
+        self.stats["lastRun"] = now.isoformat()
+        return moved
+
+    def recover(self):
+        doc = self.state.find_one({"_id": STATE_ID}) or {}
+        pending = doc.get("pending")
+        if pending:
+            logger.warning(f"Discarding unfinished compaction run {pending['run']}")
+            for path in self.reader.files(pending["run"]):
+                os.remove(path)
+            self.state.update_one({"_id": STATE_ID}, {"$unset": {"pending": ""}})
+        if doc.get("deleting"):
+            self._delete(doc["deleting"])
+
+    def _oldest_day(self):
+        """Day of the oldest hot log (timestamps may be datetimes or legacy strings)"""
+        oldest = []
+        for kind in ("date", "string"):
+            doc = self.logs.find_one({"timestamp": {"$type": kind}}, {"timestamp": 1},
+                                     sort=[("timestamp", ASCENDING)])
+            if doc:
+                try:
+                    oldest.append(parse_timestamp(doc["timestamp"]))
+                except ValueError:
+                    pass
+        return day_floor(min(oldest)) if oldest else None
+
+    def _move(self, start, end):
+        """Archive the hot logs in [start, end) and delete them from MongoDB"""
+        run = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+        self.state.update_one(
+            {"_id": STATE_ID},
+            {"$set": {"pending": {"run": run, "start": start, "end": end}}},
+            upsert=True
+        )
+        writer = PartitionWriter(self.root, run)
+        cursor = self.logs.find(range_filter(start, end)).batch_size(self.batch_size)
+        try:
+            for log in cursor:
+                try:
+                    timestamp = parse_timestamp(log.get("timestamp"))
+                except ValueError:
+                    timestamp = None
+                day = day_floor(timestamp or end - timedelta(milliseconds=1))
+                writer.add(to_row(log, timestamp), day)
+                if writer.rows % self.batch_size == 0:
+                    self.pause()
+            paths = writer.commit()
+        except Exception:
+            writer.abort()
+            raise
+        finally:
+            cursor.close()
+
+        watermark = self.watermark()
+        self.state.update_one({"_id": STATE_ID}, {
+            "$set": {"watermark": max(end, watermark) if watermark else end,
+                     "deleting": run, "updatedAt": datetime.utcnow()},
+            "$unset": {"pending": ""}
+        })
+        self.stats["archived"] += writer.rows
+        self.stats["files"] += len(paths)
+        if writer.rows:
+            logger.info(f"Archived {writer.rows} logs from {start or 'before'} to {end} in {len(paths)} files")
+        self._delete(run)
+        return writer.rows
+
+    def _delete(self, run):
+        """Remove the documents a run archived from the hot collection"""
+        for path in self.reader.files(run):
+            if not path.endswith(".parquet"):
+                continue
+            ids = pq.read_table(path, columns=["_id"]).column("_id").to_pylist()
+            for i in range(0, len(ids), DELETE_BATCH):
+                chunk = [ObjectId(v) if ObjectId.is_valid(v) else v for v in ids[i:i + DELETE_BATCH]]
+                self.stats["deleted"] += self.logs.delete_many({"_id": {"$in": chunk}}).deleted_count
+                self.pause()
+        self.state.update_one({"_id": STATE_ID}, {"$unset": {"deleting": ""}})
+
+    def snapshot(self):
+        return {**self.stats, "retentionDays": self.retention.total_seconds() / 86400, "path": self.root}
+
+
+if __name__ == '__main__':
+    from pymongo import MongoClient
+
+    parser = argparse.ArgumentParser(description="Move logs past the hot retention into the archive")
+    parser.add_argument('--retention-days', type=float, default=float(os.getenv('LOG_HOT_RETENTION_DAYS', 7)))
+    parser.add_argument('--path', default=os.getenv('ARCHIVE_PATH', 'archive'))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017')).logvizpro
+    compactor = Compactor(db.logs, db.archive_state, args.path, retention=timedelta(days=args.retention_days))
+    print(f"Archived {compactor.run()} logs; watermark is now {compactor.watermark()}")
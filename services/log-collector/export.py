@@ -0,0 +1,139 @@
+"""
+Streaming log export.
+
+Logs are read from a Mongo cursor in batches and encoded row by row into
+chunks of about `CHUNK_SIZE` bytes, optionally compressed on the fly, so an
+export of any size runs in constant memory and starts downloading at once.
+
+Formats: `ndjson` (one JSON object per line), `json` (a single array) and
+`csv`. CSV columns come from the `fields` the client asked for or, without
+them, from the fields of the first `COLUMN_SAMPLE` matching documents, so
+the header is ready without scanning the whole result first; fields that
+only appear later in the export are left out. Nested values (metadata) are
+written as JSON.
+"""
+
+import csv
+import io
+import json
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional: zstd exports are refused without it
+    zstandard = None
+
+CHUNK_SIZE = 64 * 1024
+FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'json': ('application/json', 'json'),
+    'csv': ('text/csv', 'csv'),
+}
+COMPRESSIONS = {
+    'gzip': ('application/gzip', 'gz'),
+    'zstd': ('application/zstd', 'zst'),
+}
+# Leading CSV columns; any other fields follow alphabetically
+CSV_COLUMNS = ['_id', 'timestamp', 'level', 'service', 'message']
+# Documents sampled for CSV columns when the export names no fields
+COLUMN_SAMPLE = 1000
+
+
+def check_options(format_type, compression):
+    """Raises ValueError for formats or compressions this build can't produce"""
+    if format_type not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    if compression and compression not in COMPRESSIONS:
+        raise ValueError(f"compress must be one of {', '.join(COMPRESSIONS)}")
+    if compression == 'zstd' and zstandard is None:
+        raise ValueError("zstd compression is not available (zstandard not installed)")
+
+
+def content_type(format_type, compression=None):
+    if compression:
+        return COMPRESSIONS[compression][0]
+    return FORMATS[format_type][0]
+
+
+def filename(format_type, compression=None):
+    name = f"logs.{FORMATS[format_type][1]}"
+    return f"{name}.{COMPRESSIONS[compression][1]}" if compression else name
+
+
+def sample_fields(collection, query, sort, sample=COLUMN_SAMPLE):
+    """Top-level field names of the first `sample` documents matching `query`, CSV-ordered"""
+    pipeline = [
+        {"$match": query},
+        {"$sort": dict(sort)},
+        {"$limit": sample},
+        {"$project": {"keys": {"$map": {"input": {"$objectToArray": "$$ROOT"}, "in": "$$this.k"}}}},
+        {"$unwind": "$keys"},
+        {"$group": {"_id": "$keys"}},
+    ]
+    return {row["_id"] for row in collection.aggregate(pipeline)}
+
+
+def csv_columns(names):
+    lead = [name for name in CSV_COLUMNS if name in names]
+    return lead + sorted(set(names) - set(lead))
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def encode(logs, format_type, columns=None):
+    """Yield text chunks for serialized `logs` (an iterable) in the given format"""
+    buffer = io.StringIO()
+    writer = None
+    first = True
+
+    if format_type == 'csv':
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+    elif format_type == 'json':
+        buffer.write('[')
+
+    for log in logs:
+        if format_type == 'csv':
+            writer.writerow({key: _csv_value(value) for key, value in log.items()})
+        elif format_type == 'json':
+            buffer.write('\n' if first else ',\n')
+            buffer.write(json.dumps(log, default=str))
+        else:
+            buffer.write(json.dumps(log, default=str))
+            buffer.write('\n')
+        first = False
+
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if format_type == 'json':
+        buffer.write('\n]\n' if not first else ']\n')
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def compress(chunks, compression=None):
+    """Encode text chunks as UTF-8 and compress them as they go"""
+    if not compression:
+        for chunk in chunks:
+            yield chunk.encode('utf-8')
+        return
+
+    if compression == 'gzip':
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    else:
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    tail = compressor.flush()
+    if tail:
+        yield tail
@@ -0,0 +1,347 @@
+"""
+Write-behind ingestion buffer for the log collector.
+
+Accepted logs are journaled to a local append-only spill file and queued in
+memory, then flushed to MongoDB in batches by a background worker. Entries
+get their ObjectId up front, so replaying the spill file after a restart is
+idempotent (already-written entries fail with a duplicate key and are skipped).
+
+The journal is a series of segment files, `<spill_path>.<first seq>`, each
+closed once it reaches `segment_bytes`. A segment is deleted as soon as
+every entry in it has been flushed, so the journal holds roughly the
+unflushed entries plus one segment however long ingest runs without a
+pause.
+"""
+
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, PyMongoError
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return str(value)
+
+
+def _decode(obj):
+    if len(obj) == 1 and "$date" in obj:
+        return datetime.fromisoformat(obj["$date"])
+    return obj
+
+
+class WriteBehindBuffer:
+    """Bounded in-memory queue flushed to a collection by a worker thread"""
+
+    def __init__(self, collection, max_size=50000, batch_size=500,
+                 flush_interval=0.5, spill_path=None, on_flush=None,
+                 segment_bytes=4 * 1024 * 1024):
+        self.collection = collection
+        self.on_flush = on_flush
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.checkpoint_path = f"{spill_path}.checkpoint" if spill_path else None
+        self.segment_bytes = segment_bytes
+
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._seq = 0
+        self._flushed_seq = 0
+        self._recovered_seq = 0  # last entry replayed from the spill
+        self._spill_file = None
+        self._spill_bytes = 0   # size of the open segment
+        self._segments = []     # closed segments: [(path, last seq)], oldest first
+        self._slot_lock = None
+        self._thread = None
+        self._stopping = False
+
+        self.stats = {
+            "accepted": 0,
+            "flushed": 0,
+            "dropped": 0,
+            "duplicates": 0,
+            "failedFlushes": 0,
+            "replayed": 0,
+            "lastFlushSize": 0,
+            "lastFlushLatencyMs": 0.0,
+            "maxFlushLatencyMs": 0.0,
+            "lastFlushAt": None,
+        }
+
+    # ---------- producer side ----------
+
+    def offer(self, entries):
+        """Queue entries for writing; returns False if the buffer is full"""
+        with self._lock:
+            if len(self._queue) + len(entries) > self.max_size:
+                self.stats["dropped"] += len(entries)
+                return False
+
+            for entry in entries:
+                entry.setdefault('_id', ObjectId())
+            # Journal first: if the write fails nothing is queued and the caller gets the error.
+            # The numbers are used up either way, so a torn record is never replayed.
+            first_seq = self._seq + 1
+            self._seq += len(entries)
+            self._journal(first_seq, entries)
+            self._queue.extend(enumerate(entries, first_seq))
+            self.stats["accepted"] += len(entries)
+
+            if len(self._queue) >= self.batch_size:
+                self._wakeup.notify()
+        return True
+
+    def depth(self):
+        with self._lock:
+            return len(self._queue)
+
+    def replay_flushed(self):
+        """Whether every entry replayed from the spill has reached the collection"""
+        with self._lock:
+            return self._flushed_seq >= self._recovered_seq
+
+    def retry_after(self):
+        """Seconds a rejected client should wait before retrying"""
+        batches = max(1, self.depth() // self.batch_size)
+        return max(1, int(batches * self.flush_interval + 0.999))
+
+    def snapshot(self):
+        """Current depth, capacity and counters"""
+        with self._lock:
+            return {
+                "depth": len(self._queue),
+                "capacity": self.max_size,
+                "batchSize": self.batch_size,
+                "flushInterval": self.flush_interval,
+                **self.stats,
+            }
+
+    # ---------- lifecycle ----------
+
+    def claim_spill_slot(self, max_slots=64):
+        """Give this process its own spill file when several workers share a directory.
+
+        Slot 0 keeps the configured path. A slot is held by an exclusive lock for
+        the life of the process, so a restarted worker takes over a free slot and
+        replays whatever its predecessor left unflushed.
+        """
+        if not self.spill_path or fcntl is None:
+            return self.spill_path
+        base, ext = os.path.splitext(self.spill_path)
+        for slot in range(max_slots):
+            path = self.spill_path if slot == 0 else f"{base}-{slot}{ext}"
+            lock_file = open(f"{path}.lock", 'w')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                continue
+            self._slot_lock = lock_file
+            self.spill_path = path
+            self.checkpoint_path = f"{path}.checkpoint"
+            return path
+        raise RuntimeError(f"No free spill slot for {self.spill_path}")
+
+    def start(self):
+        """Replay the spill file and start the flush worker"""
+        if self._thread is not None:
+            return
+        self._recover()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        """Flush what is left and stop the worker"""
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # ---------- worker side ----------
+
+    def _run(self):
+        backoff = self.flush_interval
+        while True:
+            with self._lock:
+                if not self._queue and not self._stopping:
+                    self._wakeup.wait(self.flush_interval)
+                elif len(self._queue) < self.batch_size and not self._stopping:
+                    # Let a partial batch fill up until the flush interval elapses
+                    self._wakeup.wait(self.flush_interval)
+                if self._stopping and not self._queue:
+                    return
+                batch = [self._queue.popleft()
+                         for _ in range(min(self.batch_size, len(self._queue)))]
+
+            if not batch:
+                continue
+
+            if self._flush(batch):
+                backoff = self.flush_interval
+            else:
+                with self._lock:
+                    self._queue.extendleft(reversed(batch))
+                    if self._stopping:
+                        return
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def _flush(self, batch):
+        docs = [entry for _, entry in batch]
+        started = time.perf_counter()
+        duplicates = 0
+        written = docs
+        try:
+            self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as bwe:
+            errors = bwe.details.get('writeErrors', [])
+            others = [e for e in errors if e.get('code') != DUPLICATE_KEY_ERROR]
+            for error in others:
+                logger.error(f"Dropping log that failed to write: {error.get('errmsg')}")
+            duplicates = len(errors) - len(others)
+            failed = {e['index'] for e in errors}
+            written = [doc for i, doc in enumerate(docs) if i not in failed]
+        except PyMongoError as e:
+            self.stats["failedFlushes"] += 1
+            logger.error(f"Write-behind flush failed, will retry: {e}")
+            return False
+
+        latency_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.stats["flushed"] += len(written)
+            self.stats["duplicates"] += duplicates
+            self.stats["lastFlushSize"] = len(docs)
+            self.stats["lastFlushLatencyMs"] = round(latency_ms, 2)
+            self.stats["maxFlushLatencyMs"] = round(max(self.stats["maxFlushLatencyMs"], latency_ms), 2)
+            self.stats["lastFlushAt"] = time.time()
+            self._flushed_seq = batch[-1][0]
+            self._checkpoint()
+
+        if self.on_flush and written:
+            try:
+                self.on_flush(written)
+            except Exception as e:
+                logger.error(f"Write-behind on_flush hook failed: {e}")
+        return True
+
+    # ---------- spill file ----------
+
+    def _journal(self, first_seq, entries):
+        """Append entries to the open spill segment (caller holds the lock)"""
+        if not self.spill_path:
+            return
+        if self._spill_file is None:
+            self._spill_file = open(self._segment_path(first_seq), 'a', encoding='utf-8')
+            self._spill_bytes = 0
+        lines = []
+        for offset, entry in enumerate(entries):
+            record = dict(entry, _id=str(entry['_id']))
+            lines.append(json.dumps({"seq": first_seq + offset, "entry": record}, default=_encode))
+        data = "\n".join(lines) + "\n"
+        self._spill_file.write(data)
+        self._spill_file.flush()
+        self._spill_bytes += len(data)
+        if self._spill_bytes >= self.segment_bytes:
+            self._close_segment()
+
+    def _segment_path(self, first_seq):
+        return f"{self.spill_path}.{first_seq:012d}"
+
+    def _segment_paths(self):
+        """Segment files on disk, oldest first (the bare spill path is a pre-segment journal)"""
+        paths = [p for p in glob.glob(f"{glob.escape(self.spill_path)}.*") if p.rsplit('.', 1)[1].isdigit()]
+        paths.sort(key=lambda p: int(p.rsplit('.', 1)[1]))
+        return ([self.spill_path] if os.path.exists(self.spill_path) else []) + paths
+
+    def _close_segment(self):
+        """Close the open segment; it is deleted once its last entry is flushed (caller holds the lock)"""
+        if self._spill_file is None:
+            return
+        self._spill_file.close()
+        self._segments.append((self._spill_file.name, self._seq))
+        self._spill_file = None
+
+    def _checkpoint(self):
+        """Record flush progress and delete fully flushed segments (caller holds the lock)"""
+        if not self.spill_path:
+            return
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(str(self._flushed_seq))
+        os.replace(tmp_path, self.checkpoint_path)
+
+        if not self._queue:
+            # Everything journaled so far is in MongoDB: the next entry starts a fresh segment
+            self._close_segment()
+        while self._segments and self._segments[0][1] <= self._flushed_seq:
+            path, _ = self._segments.pop(0)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _recover(self):
+        """Re-queue journaled entries that were not flushed before the last shutdown"""
+        if not self.spill_path:
+            return
+        flushed_seq = 0
+        if os.path.exists(self.checkpoint_path):
+            try:
+                with open(self.checkpoint_path) as f:
+                    flushed_seq = int(f.read().strip() or 0)
+            except (OSError, ValueError):
+                flushed_seq = 0
+
+        pending = []
+        segments = []
+        last_seq = flushed_seq
+        for path in self._segment_paths():
+            segment_last = 0
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line, object_hook=_decode)
+                    except ValueError:
+                        # A torn write at the tail of the journal
+                        continue
+                    segment_last = max(segment_last, record['seq'])
+                    if record['seq'] > flushed_seq:
+                        entry = record['entry']
+                        entry['_id'] = ObjectId(entry['_id'])
+                        pending.append((record['seq'], entry))
+            last_seq = max(last_seq, segment_last)
+            segments.append((path, segment_last))
+
+        with self._lock:
+            self._seq = last_seq
+            self._flushed_seq = flushed_seq
+            self._queue.extend(pending)
+            self._recovered_seq = pending[-1][0] if pending else 0
+            # Recovered segments go once their entries are flushed again; new entries start a new one
+            self._segments = segments + self._segments
+            self.stats["replayed"] = len(pending)
+            self._checkpoint()
+        if pending:
+            logger.info(f"Replaying {len(pending)} unflushed logs from {self.spill_path}")
@@ -0,0 +1,239 @@
+"""
+Background Slack notification dispatcher for the log collector.
+
+Ingest only records critical logs into a per-service digest; a worker thread
+sends one message per service per window, deduping repeated messages and
+rate-limiting webhook calls with a token bucket over one pooled HTTP session.
+Digests the webhook rejects with a 429, a 5xx or a network error are retried
+a few times before they are given up.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+CRITICAL_LEVELS = ('error', 'fatal')
+MAX_DISTINCT_MESSAGES = 5
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_consume(self):
+        """Take a token if one is available; otherwise return seconds until one is"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def penalize(self, seconds):
+        """Drain the bucket for `seconds` (e.g. after a 429 from the webhook)"""
+        self._refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class NotificationDispatcher:
+    """Collects critical logs per service and sends rate-limited digests"""
+
+    def __init__(self, webhook_url, window=10.0, rate=1.0, burst=5,
+                 max_services=500, timeout=3, max_attempts=3):
+        self.webhook_url = webhook_url
+        self.window = window
+        self.max_services = max_services
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.bucket = TokenBucket(rate, burst)
+
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.stats = {
+            "submitted": 0,
+            "deduplicated": 0,
+            "dropped": 0,
+            "sent": 0,
+            "failed": 0,
+            "retried": 0,
+            "rateLimited": 0,
+        }
+
+    @property
+    def enabled(self):
+        return bool(self.webhook_url)
+
+    def submit(self, log_entry):
+        """Record a log for the next digest; never blocks on the network"""
+        if not self.enabled or log_entry.get('level') not in CRITICAL_LEVELS:
+            return
+        service = log_entry.get('service') or 'unknown'
+        message = (log_entry.get('message') or '')[:200]
+
+        with self._lock:
+            self.stats["submitted"] += 1
+            digest = self._pending.get(service)
+            if digest is None:
+                if len(self._pending) >= self.max_services:
+                    self.stats["dropped"] += 1
+                    return
+                digest = self._pending[service] = {
+                    "count": 0,
+                    "levels": Counter(),
+                    "messages": Counter(),
+                    "first": log_entry.get('timestamp'),
+                    "last": log_entry.get('timestamp'),
+                }
+            digest["count"] += 1
+            digest["levels"][log_entry['level']] += 1
+            digest["last"] = log_entry.get('timestamp')
+            if message in digest["messages"]:
+                self.stats["deduplicated"] += 1
+                digest["messages"][message] += 1
+            elif len(digest["messages"]) < MAX_DISTINCT_MESSAGES:
+                digest["messages"][message] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {"pendingServices": len(self._pending), **self.stats}
+
+    # ---------- lifecycle ----------
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="slack-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # ---------- worker side ----------
+
+    def _run(self):
+        while not self._stop.wait(self.window):
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        """Send one message per service collected since the last flush"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        for service, digest in pending.items():
+            payload = build_message(service, digest)
+            for attempt in range(1, self.max_attempts + 1):
+                if not self._wait_for_token():
+                    # Shutting down: don't hold the process up on the rate limit
+                    self.stats["dropped"] += 1
+                    break
+                outcome = self._post(payload)
+                if outcome != 'retry':
+                    break
+                if attempt == self.max_attempts:
+                    self.stats["failed"] += 1
+                else:
+                    self.stats["retried"] += 1
+
+    def _wait_for_token(self):
+        """Block until the bucket has a token; False if stopping meanwhile"""
+        wait = self.bucket.try_consume()
+        while wait > 0:
+            if self._stop.is_set():
+                return False
+            time.sleep(min(wait, 1.0))
+            wait = self.bucket.try_consume()
+        return True
+
+    def _post(self, payload):
+        """Send one payload; returns 'sent', 'failed' or 'retry'"""
+        try:
+            response = self.session.post(self.webhook_url, json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.error(f"Failed to send Slack notification: {e}")
+            return 'retry'
+
+        if response.ok:
+            self.stats["sent"] += 1
+            return 'sent'
+        logger.error(f"Slack webhook returned {response.status_code}")
+        if response.status_code == 429:
+            self.stats["rateLimited"] += 1
+            # The next attempt waits on the bucket, which now honours Retry-After
+            self.bucket.penalize(float(response.headers.get('Retry-After', 1)))
+            return 'retry'
+        if response.status_code >= 500:
+            return 'retry'
+        # Other 4xx (bad URL, revoked hook) won't succeed on a retry
+        self.stats["failed"] += 1
+        return 'failed'
+
+
+def build_message(service, digest):
+    """Slack payload for a single log or a digest of a burst"""
+    level = 'fatal' if digest["levels"].get('fatal') else 'error'
+    color = '#ff4444' if level == 'error' else '#ff0000'
+
+    if digest["count"] == 1:
+        text = f"🚨 *{level.upper()}* Alert from *{service}*"
+        message = next(iter(digest["messages"]), '')
+        time_value = digest["last"]
+    else:
+        levels = ", ".join(f"{count} {name}" for name, count in digest["levels"].most_common())
+        text = f"🚨 *{digest['count']} critical logs* from *{service}* ({levels})"
+        message = "\n".join(
+            f"{count}× {msg}" for msg, count in digest["messages"].most_common()
+        )
+        time_value = f"{digest['first']} → {digest['last']}"
+
+    return {
+        "text": text,
+        "attachments": [{
+            "color": color,
+            "fields": [
+                {
+                    "title": "Message" if digest["count"] == 1 else "Top messages",
+                    "value": message,
+                    "short": False
+                },
+                {
+                    "title": "Service",
+                    "value": service,
+                    "short": True
+                },
+                {
+                    "title": "Time",
+                    "value": time_value,
+                    "short": True
+                }
+            ],
+            "footer": "LogVizPro",
+            "ts": int(datetime.utcnow().timestamp())
+        }]
+    }
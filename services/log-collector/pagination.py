@@ -0,0 +1,68 @@
+"""
+Keyset pagination over logs, newest first.
+
+Pages are ordered by (timestamp, _id) descending and the cursor is the sort
+key of the last log returned, so the next page is an index range scan that
+starts where the previous one stopped: page 1000 costs the same as page 1.
+Cursors are opaque to clients (URL-safe base64 of a small JSON object).
+
+Legacy documents with string timestamps sort after every BSON datetime in a
+descending scan, so a cursor inside the datetime range also admits them.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+SORT = [("timestamp", -1), ("_id", -1)]
+
+
+def encode_cursor(log):
+    """Opaque cursor pointing just past `log` (a stored document)"""
+    timestamp = log.get('timestamp')
+    if isinstance(timestamp, datetime):
+        key = {"d": timestamp.isoformat()}
+    else:
+        key = {"s": timestamp}
+    key["id"] = str(log['_id'])
+    raw = json.dumps(key, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(timestamp, ObjectId) from a cursor; raises ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key = json.loads(raw)
+        timestamp = datetime.fromisoformat(key["d"]) if "d" in key else key["s"]
+        return timestamp, ObjectId(key["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise ValueError("invalid cursor")
+
+
+def after_cursor(cursor):
+    """Filter for logs that sort after the cursor position"""
+    timestamp, last_id = decode_cursor(cursor)
+    clauses = [
+        {"timestamp": {"$lt": timestamp}},
+        {"timestamp": timestamp, "_id": {"$lt": last_id}},
+    ]
+    if isinstance(timestamp, datetime):
+        clauses.append({"timestamp": {"$type": "string"}})
+    return {"$or": clauses}
+
+
+def projection(fields):
+    """Mongo projection for a comma-separated `fields` parameter (None = whole document).
+
+    The sort key is always returned so the last log of a page can become the cursor.
+    """
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    spec = {name: 1 for name in names if not name.startswith('$')}
+    spec.update({"timestamp": 1, "_id": 1})
+    return spec
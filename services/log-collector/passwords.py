@@ -0,0 +1,124 @@
+"""
+Password hashing off the eventlet hub, and login throttling.
+
+bcrypt is slow on purpose (hundreds of ms per call at 12 rounds). Run inline, it
+holds the hub, and every websocket and ingest request on the worker waits
+for the login to finish. `PasswordHasher` runs hashpw/checkpw on eventlet's
+native thread pool instead. bcrypt releases the GIL, so the hub keeps
+serving while they run. At most `workers` run at once and at most
+`max_queue` more wait; beyond that callers get PasswordQueueFull, so a
+login burst can't pile up unbounded work.
+
+`LoginThrottle` caps failed logins per client IP and account with a Redis
+counter per window, shared by every worker and replica; a successful login
+clears it.
+"""
+
+import logging
+import os
+import threading
+
+import bcrypt
+
+try:
+    from eventlet import tpool
+except ImportError:  # plain threads: hashing just blocks the calling thread
+    tpool = None
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordQueueFull(Exception):
+    """Too many password operations already running or waiting"""
+
+
+class PasswordHasher:
+    """bcrypt on a bounded pool of native threads"""
+
+    def __init__(self, workers=None, max_queue=32, rounds=12):
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.max_queue = max_queue
+        self.rounds = rounds
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.stats = {"hashed": 0, "checked": 0, "rejected": 0, "pending": 0, "maxPending": 0}
+
+    def hash(self, password):
+        hashed = self._run(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(self.rounds))
+        self.stats["hashed"] += 1
+        return hashed
+
+    def check(self, password, hashed):
+        matched = self._run(bcrypt.checkpw, password.encode('utf-8'), hashed)
+        self.stats["checked"] += 1
+        return matched
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.stats["rejected"] += 1
+                raise PasswordQueueFull()
+            self._pending += 1
+            self.stats["maxPending"] = max(self.stats["maxPending"], self._pending)
+        try:
+            with self._slots:
+                return tpool.execute(fn, *args) if tpool else fn(*args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, "pending": self._pending, "workers": self.workers,
+                    "maxQueue": self.max_queue}
+
+
+class LoginThrottle:
+    """At most `max_attempts` failed logins per client IP and account per `window` seconds"""
+
+    def __init__(self, redis_client, max_attempts=10, window=60, prefix="login:attempts"):
+        self.redis = redis_client
+        self.max_attempts = max_attempts
+        self.window = window
+        self.prefix = prefix
+        self.stats = {"throttled": 0, "failed": 0}
+
+    def _key(self, ip, email):
+        return f"{self.prefix}:{ip}:{str(email or '').strip().lower()}"
+
+    def retry_after(self, ip, email):
+        """0 if this client may try to log in, else seconds until its window resets"""
+        key = self._key(ip, email)
+        try:
+            attempts = int(self.redis.get(key) or 0)
+            if attempts < self.max_attempts:
+                return 0
+            ttl = self.redis.ttl(key)
+            if ttl < 0:
+                # The first failure's EXPIRE never landed; don't block this client forever
+                self.redis.expire(key, self.window)
+                ttl = self.window
+        except Exception as e:
+            # Throttling must not lock everyone out when Redis is down
+            logger.warning(f"Login throttle unavailable: {e}")
+            return 0
+        self.stats["throttled"] += 1
+        return ttl
+
+    def failed(self, ip, email):
+        """Count a failed password check"""
+        key = self._key(ip, email)
+        self.stats["failed"] += 1
+        try:
+            if self.redis.incr(key) == 1:
+                self.redis.expire(key, self.window)
+        except Exception as e:
+            logger.warning(f"Login throttle unavailable: {e}")
+
+    def succeeded(self, ip, email):
+        """A correct password clears the client's failures"""
+        try:
+            self.redis.delete(self._key(ip, email))
+        except Exception as e:
+            logger.warning(f"Login throttle unavailable: {e}")
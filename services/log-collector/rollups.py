@@ -0,0 +1,238 @@
+"""
+Pre-aggregated per-minute and per-hour log counts.
+
+The write-behind worker folds every flushed batch into a handful of `$inc`
+upserts on `db.log_rollups`, so analytics can answer summary and trend
+queries from at most a few hundred small documents instead of raw logs.
+
+Rollup document layout:
+    {
+        "_id": "hour:2025-01-01T10",
+        "granularity": "hour",          # or "minute"
+        "bucket": "2025-01-01T10",      # timestamp prefix, YYYY-MM-DDTHH[:MM]
+        "total": 120,
+        "errors": 4,                    # error + fatal
+        "levels": {"info": 100, ...},
+        "services": {"auth-service": 80, ...}
+    }
+
+Coverage: rollups only count logs flushed by a collector that maintains them.
+The `coverage` document records when that started:
+
+    {"_id": "coverage", "liveSince": <datetime>, "complete": false}
+
+Logs accepted before `liveSince` (their ObjectIds are older) are counted once
+by `backfill_before_live`, which then sets `complete`; until then readers
+should fall back to raw logs. Splitting on ingestion order rather than log
+timestamps means no log is counted both live and by the backfill: while the
+backfill is pending, the live writer skips older ObjectIds, such as entries a
+restarted collector replays from its spill journal.
+
+Run `python rollups.py --backfill-hours 168` to rebuild the complete hours of
+the last week from raw logs.
+"""
+
+import argparse
+import logging
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from logviz_common.field_names import escape_key
+from logviz_common.timestamps import range_filter
+
+logger = logging.getLogger(__name__)
+
+ERROR_LEVELS = ('error', 'fatal')
+GRANULARITIES = {"minute": 16, "hour": 13}
+MINUTE_ROLLUP_TTL = timedelta(days=8)
+COVERAGE_ID = "coverage"
+
+
+def bucket_key(timestamp, granularity):
+    """Timestamp prefix used as the bucket for a granularity"""
+    if isinstance(timestamp, datetime):
+        timestamp = timestamp.isoformat()
+    if not isinstance(timestamp, str) or len(timestamp) < GRANULARITIES[granularity]:
+        return None
+    return timestamp[:GRANULARITIES[granularity]]
+
+
+def fold(logs):
+    """Count a batch of logs into {(granularity, bucket): counters}"""
+    buckets = defaultdict(lambda: {"total": 0, "errors": 0, "levels": Counter(), "services": Counter()})
+    for log in logs:
+        level = log.get('level') or 'info'
+        service = log.get('service') or 'unknown'
+        for granularity in GRANULARITIES:
+            key = bucket_key(log.get('timestamp'), granularity)
+            if key is None:
+                continue
+            counts = buckets[(granularity, key)]
+            counts["total"] += 1
+            counts["levels"][level] += 1
+            counts["services"][service] += 1
+            if level in ERROR_LEVELS:
+                counts["errors"] += 1
+    return buckets
+
+
+class RollupWriter:
+    """Applies folded batch counts to the rollup collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        # Logs with older ObjectIds are left to backfill_before_live (None: count everything)
+        self.counted_from = None
+
+    def ensure_indexes(self):
+        self.collection.create_index([("granularity", 1), ("bucket", 1)])
+        # Minute rollups are only needed for the partial first hour of a window
+        self.collection.create_index("expireAt", expireAfterSeconds=0)
+
+    def apply(self, logs):
+        """Increment rollups for logs that were just written"""
+        if self.counted_from is not None:
+            logs = [log for log in logs
+                    if not isinstance(log.get('_id'), ObjectId) or log['_id'] >= self.counted_from]
+        try:
+            self._write(fold(logs))
+        except Exception as e:
+            logger.error(f"Failed to update rollups: {e}")
+
+    def _write(self, buckets):
+        if not buckets:
+            return
+        expire_at = datetime.utcnow() + MINUTE_ROLLUP_TTL
+
+        operations = []
+        for (granularity, key), counts in buckets.items():
+            inc = {"total": counts["total"], "errors": counts["errors"]}
+            for level, n in counts["levels"].items():
+                inc[f"levels.{escape_key(level)}"] = n
+            for service, n in counts["services"].items():
+                inc[f"services.{escape_key(service)}"] = n
+
+            update = {
+                "$inc": inc,
+                "$setOnInsert": {"granularity": granularity, "bucket": key},
+            }
+            if granularity == "minute":
+                update["$setOnInsert"]["expireAt"] = expire_at
+            operations.append(UpdateOne({"_id": f"{granularity}:{key}"}, update, upsert=True))
+
+        self.collection.bulk_write(operations, ordered=False)
+
+    def mark_live(self):
+        """Record when live rollups started, the first time any collector maintains them.
+
+        Call before accepting logs. `liveSince` is a whole second (ObjectIds
+        only carry seconds), and this waits until it has passed, so every log
+        this process accepts has a newer ObjectId than the backfill reads,
+        and older ones replayed from the spill are left to the backfill.
+        A deployment that already had rollups (and no coverage record) is
+        taken as complete; `python rollups.py` can rebuild it.
+        """
+        coverage = self.coverage()
+        if not coverage:
+            complete = self.collection.find_one({"granularity": {"$exists": True}}) is not None
+            live_since = datetime.utcnow().replace(microsecond=0) + timedelta(seconds=1)
+            self.collection.update_one(
+                {"_id": COVERAGE_ID},
+                {"$setOnInsert": {"liveSince": live_since, "complete": complete}},
+                upsert=True
+            )
+            coverage = self.coverage()
+        if not coverage.get("complete"):
+            self.counted_from = ObjectId.from_datetime(coverage["liveSince"])
+        wait = (coverage["liveSince"] - datetime.utcnow()).total_seconds()
+        if wait > 0:
+            time.sleep(wait)
+
+    def coverage(self):
+        return self.collection.find_one({"_id": COVERAGE_ID}) or {}
+
+    def backfill_before_live(self, logs_collection, batch_size=5000, pause=None):
+        """Count every log accepted before live rollups started; returns how many (None if already done).
+
+        Counts are folded in memory (bounded by the number of buckets) and
+        written in one bulk write at the end, so a backfill interrupted while
+        reading leaves nothing behind and simply runs again.
+        """
+        coverage = self.coverage()
+        if not coverage or coverage.get("complete"):
+            return None
+        cursor = logs_collection.find(
+            {"_id": {"$lt": ObjectId.from_datetime(coverage["liveSince"])}},
+            {"_id": 0, "timestamp": 1, "level": 1, "service": 1}
+        ).batch_size(batch_size)
+        totals, batch, count = {}, [], 0
+        for log in cursor:
+            batch.append(log)
+            if len(batch) >= batch_size:
+                count += self._merge(totals, batch)
+                batch = []
+                if pause:
+                    pause()
+        count += self._merge(totals, batch)
+
+        self._write(totals)
+        self.collection.update_one({"_id": COVERAGE_ID}, {"$set": {"complete": True, "backfilled": count}})
+        return count
+
+    @staticmethod
+    def _merge(totals, logs):
+        for key, counts in fold(logs).items():
+            into = totals.setdefault(key, {"total": 0, "errors": 0, "levels": Counter(), "services": Counter()})
+            into["total"] += counts["total"]
+            into["errors"] += counts["errors"]
+            into["levels"].update(counts["levels"])
+            into["services"].update(counts["services"])
+        return len(logs)
+
+    def backfill(self, logs_collection, hours):
+        """Rebuild rollups for the complete hours of the last `hours` from raw logs.
+
+        Only logs timestamped before the current hour are recounted, and the
+        cursor stops there, so the live writer's counts for the current hour
+        are neither deleted nor counted again. (A late log for a past hour
+        that is flushed during the rebuild can still be counted twice.)
+        """
+        end = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        start = end - timedelta(hours=hours)
+        self.collection.delete_many({"bucket": {"$gte": bucket_key(start, "hour"), "$lt": bucket_key(end, "hour")}})
+
+        cursor = logs_collection.find(
+            range_filter(start, end),
+            {"_id": 0, "timestamp": 1, "level": 1, "service": 1}
+        ).batch_size(5000)
+
+        batch, total = [], 0
+        for log in cursor:
+            batch.append(log)
+            if len(batch) >= 5000:
+                self.apply(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            self.apply(batch)
+            total += len(batch)
+        return total
+
+
+if __name__ == '__main__':
+    import os
+    from pymongo import MongoClient
+
+    parser = argparse.ArgumentParser(description="Rebuild log rollups from raw logs")
+    parser.add_argument('--backfill-hours', type=int, default=168)
+    args = parser.parse_args()
+
+    db = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017')).logvizpro
+    writer = RollupWriter(db.log_rollups)
+    writer.ensure_indexes()
+    count = writer.backfill(db.logs, args.backfill_hours)
+    print(f"Rebuilt rollups from {count} logs over the last {args.backfill_hours}h")
@@ -0,0 +1,116 @@
+"""
+Message search over stored logs.
+
+Queries are parsed into whole words, quoted phrases and wildcard terms
+(`time*`, `pay?ent`). Words and phrases are looked up in the `message` text
+index, all of them required, so MongoDB only reads the documents that
+contain them. Wildcard terms and the optional raw regex become `$regex`
+conditions, checked against those candidates or against the requested time
+range on the timestamp index. Each hit gets a short snippet around the first
+match, with the offsets of every match in it for highlighting.
+"""
+
+import re
+
+TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+SNIPPET_CHARS = 160
+
+
+class SearchQuery:
+    """A parsed `q` parameter; raises ValueError if it has nothing to search for"""
+
+    def __init__(self, text, regex=None):
+        self.words = []
+        self.phrases = []
+        self.wildcards = []
+        for phrase, token in TOKEN.findall(text or ''):
+            if phrase.strip():
+                self.phrases.append(' '.join(phrase.split()))
+                continue
+            # A stray quote (unbalanced, or inside a word) would end the term's
+            # quotes in the $text search early, so it only separates words
+            for word in token.replace('"', ' ').split():
+                if '*' in word or '?' in word:
+                    if word.strip('*?'):
+                        self.wildcards.append(word)
+                else:
+                    self.words.append(word)
+
+        self.regex = None
+        if regex:
+            try:
+                self.regex = re.compile(regex, re.IGNORECASE)
+            except re.error as e:
+                raise ValueError(f"invalid regex: {e}")
+
+        if not (self.words or self.phrases or self.wildcards or self.regex):
+            raise ValueError("q or regex is required")
+
+        # Whole-word matchers for highlighting (and for wildcard filtering)
+        self.patterns = [re.compile(wildcard_pattern(w), re.IGNORECASE) for w in self.wildcards]
+        self.patterns += [re.compile(r'\b' + re.escape(w) + r'\b', re.IGNORECASE) for w in self.words]
+        self.patterns += [
+            re.compile(r'\b' + r'\s+'.join(map(re.escape, p.split())) + r'\b', re.IGNORECASE)
+            for p in self.phrases
+        ]
+        if self.regex:
+            self.patterns.append(self.regex)
+
+    @property
+    def uses_text_index(self):
+        return bool(self.words or self.phrases)
+
+    def filter(self):
+        """Mongo filter for the message conditions"""
+        clauses = []
+        if self.uses_text_index:
+            # Quoting every term makes each one required (bare terms are OR'ed)
+            terms = self.words + self.phrases
+            clauses.append({"$text": {"$search": ' '.join(f'"{t}"' for t in terms)}})
+        for wildcard in self.wildcards:
+            clauses.append({"message": {"$regex": wildcard_pattern(wildcard), "$options": "i"}})
+        if self.regex:
+            clauses.append({"message": {"$regex": self.regex.pattern, "$options": "i"}})
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def highlight(self, message):
+        """(snippet, [[start, end], ...]) for the matches in `message`"""
+        message = message or ''
+        spans = sorted(
+            (m.start(), m.end())
+            for pattern in self.patterns
+            for m in pattern.finditer(message)
+            if m.end() > m.start()
+        )
+        if len(message) <= SNIPPET_CHARS:
+            start, end = 0, len(message)
+        else:
+            first = spans[0][0] if spans else 0
+            start = max(0, min(first - SNIPPET_CHARS // 4, len(message) - SNIPPET_CHARS))
+            end = start + SNIPPET_CHARS
+
+        highlights = []
+        for span_start, span_end in spans:
+            if span_start < start or span_end > end:
+                continue
+            if highlights and span_start - start <= highlights[-1][1]:
+                highlights[-1][1] = max(highlights[-1][1], span_end - start)
+            else:
+                highlights.append([span_start - start, span_end - start])
+
+        snippet = message[start:end]
+        if start > 0:
+            snippet = '…' + snippet
+            highlights = [[s + 1, e + 1] for s, e in highlights]
+        if end < len(message):
+            snippet += '…'
+        return snippet, highlights
+
+
+def wildcard_pattern(term):
+    """Regex for a word with `*` (any run of word characters) and `?` (one)"""
+    body = ''.join(
+        r'\w*' if char == '*' else r'\w' if char == '?' else re.escape(char)
+        for char in term
+    )
+    return r'\b' + body + r'\b'
@@ -0,0 +1,127 @@
+"""
+Per-hour sketches of high-cardinality log statistics.
+
+Counts per level and service are exact in `db.log_rollups` (see rollups.py),
+but distinct users, the long tail of services and messages, and response-time
+percentiles can't be kept exactly in bounded space. Each collector process
+folds flushed logs into one `LogSketches` per hour (distinct users and
+services, top services and messages, response-time digest; see sketches.py)
+and periodically writes them to `db.log_sketches`, one document per hour
+and process:
+
+    {
+        "_id": "hour:2025-01-01T10:3f2a9c1b7d4e",
+        "bucket": "2025-01-01T10",
+        "replica": "3f2a9c1b7d4e",
+        "total": 120,
+        "users": {...}, "services": {...}, "topServices": {...},
+        "topMessages": {...}, "responseTime": {...},
+        "expireAt": ...
+    }
+
+Readers merge every document in a range (across hours and replicas) into
+one set of sketches; nothing is ever read-modify-written concurrently,
+because each process only writes its own documents.
+"""
+
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from pymongo import ReplaceOne
+
+from logviz_common.sketches import LogSketches
+from rollups import bucket_key
+
+SKETCH_TTL = timedelta(days=8)
+
+
+class SketchWriter:
+    """Folds flushed logs into per-hour sketches and persists them in the background"""
+
+    def __init__(self, collection, top_k=100, keep_hours=2):
+        self.collection = collection
+        self.top_k = top_k
+        self.keep_hours = keep_hours
+        # Unique per process: replicas never overwrite each other's documents
+        self.replica = uuid.uuid4().hex[:12]
+        self._hours = {}      # bucket -> LogSketches
+        self._dirty = set()
+        self._stored = set()  # buckets whose stored document is already in memory
+        self._lock = threading.Lock()
+        self.stats = {"logs": 0, "flushes": 0, "documents": 0, "errors": 0}
+
+    def ensure_indexes(self):
+        self.collection.create_index("bucket")
+        self.collection.create_index("expireAt", expireAfterSeconds=0)
+
+    def apply(self, logs):
+        """Add logs that were just written"""
+        by_hour = {}
+        for log in logs:
+            key = bucket_key(log.get('timestamp'), "hour")
+            if key is not None:
+                by_hour.setdefault(key, []).append(log)
+        with self._lock:
+            for key, hour_logs in by_hour.items():
+                sketches = self._hours.get(key)
+                if sketches is None:
+                    sketches = self._hours[key] = LogSketches(self.top_k)
+                sketches.update(hour_logs)
+                self._dirty.add(key)
+            self.stats["logs"] += sum(len(hour_logs) for hour_logs in by_hour.values())
+
+    def _load_stored(self, key):
+        """Fold in this process's stored document for an hour it had evicted from memory"""
+        doc = self.collection.find_one({"_id": self._doc_id(key)})
+        with self._lock:
+            if doc is not None:
+                self._hours[key].merge(LogSketches.from_doc(doc))
+            self._stored.add(key)
+
+    def _doc_id(self, key):
+        return f"hour:{key}:{self.replica}"
+
+    def flush(self):
+        """Write every hour changed since the last flush, then drop hours no longer written to"""
+        with self._lock:
+            keys = sorted(self._dirty)
+        for key in keys:
+            if key not in self._stored:
+                self._load_stored(key)
+
+        with self._lock:
+            # Hours first seen since the loads above wait for the next flush
+            ready = self._dirty & self._stored
+            docs = {key: self._hours[key].to_doc() for key in ready}
+            self._dirty -= ready
+        if docs:
+            expire_at = datetime.utcnow() + SKETCH_TTL
+            operations = [
+                ReplaceOne(
+                    {"_id": self._doc_id(key)},
+                    {**doc, "bucket": key, "replica": self.replica, "expireAt": expire_at},
+                    upsert=True
+                )
+                for key, doc in docs.items()
+            ]
+            try:
+                self.collection.bulk_write(operations, ordered=False)
+                self.stats["documents"] += len(operations)
+            except Exception:
+                with self._lock:
+                    self._dirty.update(docs)
+                self.stats["errors"] += 1
+                raise
+        self.stats["flushes"] += 1
+
+        oldest = bucket_key(datetime.utcnow() - timedelta(hours=self.keep_hours), "hour")
+        with self._lock:
+            for key in [k for k in self._hours if k < oldest and k not in self._dirty]:
+                del self._hours[key]
+                self._stored.discard(key)
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, "replica": self.replica, "hours": len(self._hours)}
+
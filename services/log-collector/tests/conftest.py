@@ -0,0 +1,50 @@
+import os
+import sys
+
+import fakeredis
+import mongomock
+import pytest
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+
+from logviz_common import connections
+
+# Modules are imported the way the service runs them: from the service directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _bulk_write(collection, operations, ordered=True, **kwargs):
+    """Apply bulk operations one at a time (mongomock's bulk_write predates pymongo's `sort` option)"""
+    for op in operations:
+        if isinstance(op, InsertOne):
+            collection.insert_one(op._doc)
+        elif isinstance(op, UpdateOne):
+            collection.update_one(op._filter, op._doc, upsert=op._upsert)
+        elif isinstance(op, UpdateMany):
+            collection.update_many(op._filter, op._doc, upsert=op._upsert)
+        elif isinstance(op, ReplaceOne):
+            collection.replace_one(op._filter, op._doc, upsert=op._upsert)
+        elif isinstance(op, DeleteOne):
+            collection.delete_one(op._filter)
+        elif isinstance(op, DeleteMany):
+            collection.delete_many(op._filter)
+        else:
+            raise TypeError(f"unsupported bulk operation {op!r}")
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(mongomock.Collection, "bulk_write", _bulk_write)
+    return mongomock.MongoClient().logvizpro
+
+
+@pytest.fixture(scope="session")
+def collector(tmp_path_factory):
+    """app.py on mongomock and fakeredis, without eventlet or background workers"""
+    patch = pytest.MonkeyPatch()
+    patch.setenv("EVENTLET_MONKEY_PATCH", "false")
+    patch.setenv("WRITE_BUFFER_SPILL_PATH", str(tmp_path_factory.mktemp("spill") / "ingest-spill.jsonl"))
+    patch.setattr(connections, "mongo_client", lambda *args, **kwargs: mongomock.MongoClient())
+    patch.setattr(connections, "redis_client", lambda *args, **kwargs: fakeredis.FakeRedis(decode_responses=True))
+    import app
+    yield app
+    patch.undo()
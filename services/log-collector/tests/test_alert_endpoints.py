@@ -0,0 +1,81 @@
+import pytest
+
+OWNER, OTHER = "owner@example.com", "other@example.com"
+
+
+@pytest.fixture
+def alerts(collector):
+    collector.users_collection.delete_many({})
+    collector.alerts_collection.delete_many({})
+    collector.alert_engine.load()
+    for email in (OWNER, OTHER):
+        collector.users_collection.insert_one({"email": email, "name": email.split("@")[0], "role": "user"})
+    return collector
+
+
+def headers(app, email):
+    return {"Authorization": f"Bearer {app.authenticator.issue(app.users_collection.find_one({'email': email}))}"}
+
+
+def create(app, email, **fields):
+    body = {"name": "errors", "description": "", "condition": "error_rate", "threshold": 50,
+            "severity": "critical", **fields}
+    return app.app.test_client().post("/api/alerts", json=body, headers=headers(app, email))
+
+
+def socket(app, email=None):
+    auth = {"token": headers(app, email)["Authorization"][7:]} if email else None
+    return app.socketio.test_client(app.app, auth=auth)
+
+
+def alert_events(client):
+    return [message["args"][0] for message in client.get_received() if message["name"] == "alert"]
+
+
+def test_alert_events_reach_only_the_owners_sockets(alerts):
+    create(alerts, OWNER, service="api")
+    owner, other, anonymous = socket(alerts, OWNER), socket(alerts, OTHER), socket(alerts)
+    for client in (owner, other, anonymous):
+        client.get_received()
+
+    alerts.alert_engine.observe([{"service": "api", "level": "error"}] * 20)
+
+    events = alert_events(owner)
+    assert [event["status"] for event in events] == ["firing"]
+    assert "userEmail" not in events[0]
+    assert alert_events(other) == [] and alert_events(anonymous) == []
+
+
+def test_invalid_tokens_do_not_join_any_alert_room(alerts):
+    create(alerts, OWNER)
+    client = alerts.socketio.test_client(alerts.app, auth={"token": "forged"})
+    client.get_received()
+
+    alerts.alert_engine.observe([{"service": "api", "level": "error"}] * 20)
+
+    assert client.is_connected() and alert_events(client) == []
+
+
+def test_update_validates_and_recompiles_the_rule(alerts):
+    alert_id = create(alerts, OWNER).json["data"]["id"]
+    client = alerts.app.test_client()
+
+    rejected = client.put(f"/api/alerts/{alert_id}", json={"threshold": -5}, headers=headers(alerts, OWNER))
+    response = client.put(f"/api/alerts/{alert_id}", json={"threshold": 90, "service": ""},
+                          headers=headers(alerts, OWNER))
+
+    assert rejected.status_code == 400 and "positive" in rejected.json["error"]
+    assert response.status_code == 200 and response.json["data"]["threshold"] == 90
+    stored = alerts.alerts_collection.find_one()
+    assert stored["threshold"] == 90 and stored["service"] is None
+    assert alerts.alert_engine._rules[alert_id].limit == 90
+
+
+def test_update_is_limited_to_the_owner(alerts):
+    alert_id = create(alerts, OWNER).json["data"]["id"]
+
+    response = alerts.app.test_client().put(f"/api/alerts/{alert_id}", json={"threshold": 1},
+                                            headers=headers(alerts, OTHER))
+
+    assert response.status_code == 404
+    assert alerts.alerts_collection.find_one()["threshold"] == 50
@@ -0,0 +1,77 @@
+import pytest
+
+from alerting import ANY, DEFAULT_WINDOWS, AlertEngine, Rule
+
+
+def rule(**alert):
+    return Rule({"_id": "a1", "name": "test", **alert})
+
+
+@pytest.mark.parametrize("alert,message", [
+    ({"condition": "cpu_usage", "threshold": 5}, "condition must be one of"),
+    ({"condition": None, "threshold": 5}, "condition must be one of"),
+    ({"condition": "error_rate", "threshold": 5, "severity": "urgent"}, "severity must be one of"),
+    ({"condition": "error_rate", "threshold": "lots"}, "threshold must be a number"),
+    ({"condition": "error_rate", "threshold": None}, "threshold must be a number"),
+    ({"condition": "log_volume", "threshold": 0}, "threshold must be a positive number"),
+    ({"condition": "log_volume", "threshold": -10}, "threshold must be a positive number"),
+    ({"condition": "log_volume", "threshold": "nan"}, "threshold must be a positive number"),
+    ({"condition": "service_inactive", "threshold": "inf"}, "threshold must be a positive number"),
+    ({"condition": "keyword_match", "threshold": "   "}, "threshold must be the keyword"),
+    ({"condition": "error_rate", "threshold": 5, "window": "soon"}, "window must be a number"),
+    ({"condition": "error_rate", "threshold": 5, "window": -3}, "window must be a positive number"),
+    ({"condition": "log_volume", "threshold": 5, "window": "nan"}, "window must be a positive number"),
+])
+def test_invalid_rules_raise_value_error(alert, message):
+    with pytest.raises(ValueError, match=message):
+        rule(**alert)
+
+
+def test_threshold_accepts_percent_strings():
+    assert rule(condition="error_rate", threshold=" 12.5% ").limit == 12.5
+
+
+def test_defaults_scope_to_any_service_and_level():
+    compiled = rule(condition="error_rate", threshold=5)
+
+    assert compiled.severity == "warning"
+    assert compiled.service == ANY and compiled.level == ANY
+    assert compiled.window.seconds == DEFAULT_WINDOWS["error_rate"] * 60
+
+
+def test_keyword_rules_match_case_insensitively():
+    compiled = rule(condition="keyword_match", threshold=" OutOfMemory ", service="api")
+
+    assert compiled.keyword == "outofmemory" and compiled.limit is None
+    compiled.observe(0, [{"message": "java.lang.OUTOFMEMORY error"}, {"message": "fine"}])
+    assert compiled.evaluate(0, min_samples=1)
+    assert compiled.event()["service"] == "api"
+
+
+def test_service_inactive_window_is_the_threshold():
+    compiled = rule(condition="service_inactive", threshold=10, window=1)
+
+    assert compiled.window.seconds == 600
+    assert not compiled.evaluate(now=540, min_samples=1, last_seen=0)
+    assert compiled.evaluate(now=600, min_samples=1, last_seen=0)
+
+
+def test_error_rate_waits_for_min_samples():
+    compiled = rule(condition="error_rate", threshold=50)
+    compiled.observe(0, [{"level": "error"}] * 3)
+
+    assert not compiled.evaluate(0, min_samples=20)
+    assert compiled.evaluate(0, min_samples=3)
+    assert compiled.value == 100
+
+
+def test_engine_passes_the_owner_beside_the_event(db):
+    db.alerts.insert_one({"name": "errors", "condition": "error_rate", "threshold": 50, "userEmail": "a@example.com"})
+    received = []
+    engine = AlertEngine(db.alerts, on_event=lambda owner, event: received.append((owner, event)), min_samples=1)
+    engine.load()
+
+    events = engine.observe([{"service": "api", "level": "error"}])
+
+    assert [owner for owner, _ in received] == ["a@example.com"]
+    assert events == [event for _, event in received] and "userEmail" not in events[0]
@@ -0,0 +1,101 @@
+import pytest
+
+
+@pytest.fixture
+def users(collector):
+    collector.users_collection.delete_many({})
+    collector.authenticator.drop_users(["admin@example.com", "user@example.com"])
+    for email, role in (("admin@example.com", "admin"), ("user@example.com", "user")):
+        collector.users_collection.insert_one({"email": email, "name": email.split("@")[0], "role": role})
+    return collector
+
+
+def token_for(app, email):
+    return app.authenticator.issue(app.users_collection.find_one({"email": email}))
+
+
+def put(app, path, token, body):
+    client = app.app.test_client()
+    return client.put(path, json=body, headers={"Authorization": f"Bearer {token}"})
+
+
+def get_profile(app, token):
+    return app.app.test_client().get("/api/auth/profile", headers={"Authorization": f"Bearer {token}"})
+
+
+def test_role_change_requires_an_admin(users):
+    token = token_for(users, "user@example.com")
+
+    response = put(users, "/api/auth/users/user@example.com/role", token, {"role": "admin"})
+
+    assert response.status_code == 403
+    assert users.users_collection.find_one({"email": "user@example.com"})["role"] == "user"
+
+
+def test_role_change_requires_a_token(users):
+    response = users.app.test_client().put("/api/auth/users/user@example.com/role", json={"role": "admin"})
+
+    assert response.status_code == 401
+
+
+def test_role_change_rejects_unknown_roles_and_users(users):
+    token = token_for(users, "admin@example.com")
+
+    assert put(users, "/api/auth/users/user@example.com/role", token, {"role": "root"}).status_code == 400
+    assert put(users, "/api/auth/users/nobody@example.com/role", token, {"role": "admin"}).status_code == 404
+
+
+def test_role_change_revokes_the_users_cached_tokens(users):
+    user_token = token_for(users, "user@example.com")
+    assert get_profile(users, user_token).json["user"]["role"] == "user"
+
+    response = put(users, "/api/auth/users/user@example.com/role", token_for(users, "admin@example.com"),
+                   {"role": "admin"})
+
+    assert response.status_code == 200
+    assert get_profile(users, user_token).status_code == 401
+    assert get_profile(users, token_for(users, "user@example.com")).json["user"]["role"] == "admin"
+
+
+def test_demoted_admin_loses_admin_access_at_once(users):
+    admin_token = token_for(users, "admin@example.com")
+    assert get_profile(users, admin_token).status_code == 200
+    users.users_collection.update_one({"email": "user@example.com"}, {"$set": {"role": "admin"}})
+
+    put(users, "/api/auth/users/admin@example.com/role", token_for(users, "user@example.com"), {"role": "user"})
+
+    response = put(users, "/api/auth/users/user@example.com/role", admin_token, {"role": "user"})
+    assert response.status_code == 401
+
+
+def test_profile_update_changes_only_the_callers_name(users):
+    old_token = token_for(users, "user@example.com")
+
+    response = put(users, "/api/auth/profile", old_token, {"name": "Renamed", "role": "admin",
+                                                           "email": "admin@example.com"})
+
+    assert response.status_code == 200
+    assert response.json["user"] == {"name": "Renamed", "email": "user@example.com", "role": "user"}
+    assert users.users_collection.find_one({"email": "admin@example.com"})["name"] == "admin"
+    assert get_profile(users, old_token).status_code == 401
+    assert get_profile(users, response.json["token"]).json["user"]["name"] == "Renamed"
+
+
+def test_profile_update_requires_a_name(users):
+    response = put(users, "/api/auth/profile", token_for(users, "user@example.com"), {"name": "  "})
+
+    assert response.status_code == 400
+
+
+def login(app, email, address="10.0.0.1"):
+    return app.app.test_client().post("/api/auth/login", json={"email": email, "password": "wrong"},
+                                      environ_base={"REMOTE_ADDR": address})
+
+
+def test_login_throttle_is_per_address_and_account(users):
+    for _ in range(users.login_throttle.max_attempts):
+        login(users, "ghost@example.com")
+
+    assert login(users, "ghost@example.com").status_code == 429
+    assert login(users, "Other@example.com").status_code == 401
+    assert login(users, "ghost@example.com", address="10.0.0.2").status_code == 401
@@ -0,0 +1,131 @@
+import pytest
+
+from broadcast import LogBroadcaster
+
+
+class FakeSocketIO:
+    """Records emits; acks are delivered by calling the stored callback"""
+
+    def __init__(self):
+        self.sent = []
+
+    def emit(self, event, data, to=None, callback=None):
+        self.sent.append((to, data, callback))
+
+    def frames(self, sid):
+        return [data for to, data, _ in self.sent if to == sid]
+
+    def ack(self, sid):
+        for to, _, callback in reversed(self.sent):
+            if to == sid:
+                callback()
+                return
+
+
+def logs(n, service="api", level="info", start=0):
+    return [{"n": start + i, "service": service, "level": level} for i in range(n)]
+
+
+@pytest.fixture
+def socketio():
+    return FakeSocketIO()
+
+
+def test_frames_are_built_once_per_distinct_subscription(socketio, monkeypatch):
+    broadcaster = LogBroadcaster(socketio)
+    for sid in ("a", "b", "c"):
+        broadcaster.connect(sid)
+    broadcaster.subscribe("c", levels=["error"])
+    built = []
+    build = broadcaster._build_frame
+    monkeypatch.setattr(broadcaster, "_build_frame", lambda *args: built.append(1) or build(*args))
+    broadcaster.publish(logs(3) + logs(2, level="error", start=3))
+
+    broadcaster.flush()
+
+    assert len(built) == 2
+    assert [log["n"] for log in socketio.frames("a")[0]["logs"]] == [4, 3, 2, 1, 0]
+    assert socketio.frames("a")[0]["logs"] == socketio.frames("b")[0]["logs"]
+    only_errors = socketio.frames("c")[0]
+    assert [log["n"] for log in only_errors["logs"]] == [4, 3]
+    assert only_errors["counts"]["total"] == 5 and only_errors["counts"]["errors"] == 2
+
+
+def test_busy_client_gets_one_coalesced_frame_after_its_ack(socketio):
+    broadcaster = LogBroadcaster(socketio, max_logs=3)
+    broadcaster.connect("a")
+    for start in (0, 2, 4):
+        broadcaster.publish(logs(2, start=start))
+        broadcaster.flush()
+    assert len(socketio.frames("a")) == 1
+
+    socketio.ack("a")
+    broadcaster.flush()
+
+    frames = socketio.frames("a")
+    assert len(frames) == 2
+    assert [log["n"] for log in frames[1]["logs"]] == [5, 4, 3]
+    assert frames[1]["matched"] == 4 and frames[1]["skipped"] == 1
+    assert frames[1]["counts"]["total"] == 4
+
+
+def test_unacknowledged_frame_is_given_up_after_the_timeout(socketio, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("broadcast.time.monotonic", lambda: now[0])
+    broadcaster = LogBroadcaster(socketio, ack_timeout=5)
+    broadcaster.connect("a")
+    broadcaster.publish(logs(1))
+    broadcaster.flush()
+    broadcaster.publish(logs(1, start=1))
+    broadcaster.flush()
+    assert len(socketio.frames("a")) == 1
+
+    now[0] += 6
+    broadcaster.flush()
+    stale_ack = socketio.sent[0][2]
+    stale_ack()
+    broadcaster.publish(logs(1, start=2))
+    broadcaster.flush()
+
+    assert len(socketio.frames("a")) == 2
+
+
+def test_slow_client_queue_folds_the_oldest_frames(socketio):
+    broadcaster = LogBroadcaster(socketio, max_queue=2)
+    broadcaster.connect("a")
+    for start in range(0, 10, 2):
+        broadcaster.publish(logs(2, start=start))
+        broadcaster.flush()
+
+    socketio.ack("a")
+    broadcaster.flush()
+
+    frame = socketio.frames("a")[1]
+    assert [log["n"] for log in frame["logs"]] == [9, 8, 7, 6]
+    assert frame["matched"] == 8 and frame["skipped"] == 4 and frame["counts"]["total"] == 8
+    assert broadcaster.snapshot()["skippedForSlowClients"] == 4
+
+
+def test_pending_overflow_drops_the_oldest_logs_but_keeps_their_counts(socketio):
+    broadcaster = LogBroadcaster(socketio, max_pending=5)
+    broadcaster.connect("a")
+    broadcaster.publish(logs(4))
+    broadcaster.publish(logs(4, start=4))
+
+    broadcaster.flush()
+
+    frame = socketio.frames("a")[0]
+    assert [log["n"] for log in frame["logs"]] == [7, 6, 5, 4, 3]
+    assert frame["counts"]["total"] == 8
+    assert broadcaster.snapshot()["dropped"] == 3
+
+
+def test_disconnected_clients_are_not_sent_frames(socketio):
+    broadcaster = LogBroadcaster(socketio)
+    broadcaster.connect("a")
+    broadcaster.disconnect("a")
+    broadcaster.publish(logs(1))
+
+    broadcaster.flush()
+
+    assert socketio.sent == [] and broadcaster.snapshot()["clients"] == 0
@@ -0,0 +1,154 @@
+import os
+import signal
+import sys
+import threading
+import time
+
+import fakeredis
+import pytest
+
+import cluster
+from cluster import LeaderLease, LogRelay
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def client(server):
+    return fakeredis.FakeRedis(server=server, decode_responses=True)
+
+
+def test_only_one_worker_holds_the_lease(server):
+    first, second = LeaderLease(client(server), "leader", ttl=10), LeaderLease(client(server), "leader", ttl=10)
+
+    assert first.renew() and not second.renew()
+    assert first.renew() and first.held and not second.held
+    assert client(server).get("leader") == first.token
+
+
+def test_renewing_extends_the_lease(server):
+    redis = client(server)
+    lease = LeaderLease(redis, "leader", ttl=10)
+    lease.renew()
+    redis.expire("leader", 2)
+
+    assert lease.renew()
+    assert redis.ttl("leader") > 2
+
+
+def test_expired_lease_passes_to_another_worker(server):
+    first, second = LeaderLease(client(server), "leader", ttl=1), LeaderLease(client(server), "leader", ttl=1)
+    first.renew()
+
+    time.sleep(1.1)
+
+    assert second.renew() and not first.renew()
+    assert client(server).get("leader") == second.token
+
+
+def test_lease_is_given_up_while_redis_is_unreachable(server):
+    lease = LeaderLease(client(server), "leader")
+    lease.renew()
+
+    server.connected = False
+
+    assert not lease.renew() and not lease.held
+
+
+def test_keep_renews_only_once_a_third_of_the_ttl_has_passed(server, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("cluster.time.monotonic", lambda: now[0])
+    redis = client(server)
+    lease = LeaderLease(redis, "leader", ttl=30)
+    lease.renew()
+    redis.expire("leader", 5)
+
+    now[0] += 9
+    assert lease.keep() and redis.ttl("leader") <= 5
+
+    now[0] += 1
+    assert lease.keep() and redis.ttl("leader") > 5
+
+    redis.set("leader", "someone else")
+    now[0] += 10
+    assert not lease.keep()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+def subscribed(redis, channel):
+    return lambda: dict(redis.pubsub_numsub(channel)).get(channel, 0) > 0
+
+
+def test_relay_delivers_published_logs_to_every_worker(server):
+    received = {"a": [], "b": []}
+    relays = [LogRelay(client(server), received[name].extend) for name in received]
+    for relay in relays:
+        relay.start()
+    try:
+        wait_for(lambda: dict(client(server).pubsub_numsub(cluster.LIVE_CHANNEL))[cluster.LIVE_CHANNEL] == 2)
+
+        relays[0].publish([{"message": "one"}, {"message": "two"}])
+
+        wait_for(lambda: len(received["a"]) == 2 and len(received["b"]) == 2)
+    finally:
+        for relay in relays:
+            relay.stop()
+
+    assert received["a"] == received["b"] == [{"message": "one"}, {"message": "two"}]
+    assert relays[0].stats["published"] == 2 and relays[1].stats["received"] == 2
+
+
+def test_relay_resubscribes_after_an_error(server):
+    redis = client(server)
+    received = []
+    relay = LogRelay(client(server), received.extend, channel="relay-test")
+    relay.start()
+    try:
+        wait_for(subscribed(redis, "relay-test"))
+        redis.publish("relay-test", "not json")
+        wait_for(lambda: relay.stats["errors"] == 1)
+
+        # Logs published before the relay is back are lost; keep going until one arrives
+        wait_for(lambda: relay.publish([{"message": "after"}]) or received)
+    finally:
+        relay.stop()
+
+    assert received[0] == {"message": "after"} and relay.stats["errors"] == 1
+    assert dict(redis.pubsub_numsub("relay-test"))["relay-test"] == 0
+
+
+WORKER = """
+import os, sys, time
+with open(sys.argv[1], "a") as out:
+    out.write(os.environ["TEST_WORKER"] + "\\n")
+# Worker 0 crashes straight away; worker 1 stays up until it is terminated
+time.sleep(0 if os.environ["TEST_WORKER"] == "0" else 60)
+sys.exit(3)
+"""
+
+
+def test_workers_are_restarted_until_the_supervisor_is_stopped(tmp_path, monkeypatch):
+    script, starts = tmp_path / "worker.py", tmp_path / "starts.txt"
+    script.write_text(WORKER)
+    monkeypatch.setattr(sys, "argv", [str(script), str(starts)])
+    handlers = {sig: signal.getsignal(sig) for sig in (signal.SIGTERM, signal.SIGINT)}
+    timer = threading.Timer(2.5, os.kill, (os.getpid(), signal.SIGTERM))
+    timer.start()
+    try:
+        cluster.run_workers(2, worker_env="TEST_WORKER")
+    finally:
+        timer.cancel()
+        for sig, handler in handlers.items():
+            signal.signal(sig, handler)
+
+    started = starts.read_text().split()
+    assert started.count("1") == 1 and started.count("0") >= 2
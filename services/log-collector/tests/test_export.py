@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import export
+from pagination import SORT
+
+
+def test_sample_fields_reads_only_the_newest_documents(db):
+    db.logs.insert_many([
+        {"timestamp": datetime(2025, 1, 1, 0, minute), "level": "info", "message": "m", f"field{minute}": 1}
+        for minute in range(10)
+    ])
+
+    names = export.sample_fields(db.logs, {}, SORT, sample=3)
+
+    assert names == {"_id", "timestamp", "level", "message", "field9", "field8", "field7"}
+
+
+def test_sample_fields_respects_the_query(db):
+    db.logs.insert_many([
+        {"timestamp": datetime(2025, 1, 1), "level": "error", "message": "m", "statusCode": 500},
+        {"timestamp": datetime(2025, 1, 2), "level": "info", "message": "m", "userId": "u1"},
+    ])
+
+    names = export.sample_fields(db.logs, {"level": "error"}, SORT)
+
+    assert "statusCode" in names and "userId" not in names
+
+
+def test_csv_columns_lead_with_the_fixed_columns():
+    names = {"userId", "message", "_id", "level", "metadata", "timestamp"}
+
+    assert export.csv_columns(names) == ["_id", "timestamp", "level", "message", "metadata", "userId"]
+
+
+def test_encode_csv_leaves_unsampled_fields_out():
+    logs = [{"_id": "1", "message": "a"}, {"_id": "2", "message": "b", "late": "x"}]
+
+    text = "".join(export.encode(logs, "csv", ["_id", "message"]))
+
+    assert text.splitlines() == ["_id,message", "1,a", "2,b"]
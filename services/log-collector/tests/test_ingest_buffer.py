@@ -0,0 +1,147 @@
+import os
+
+import mongomock
+import pytest
+from pymongo.errors import BulkWriteError
+
+from ingest_buffer import DUPLICATE_KEY_ERROR, WriteBehindBuffer
+
+
+def make_logs(n, start=0):
+    return [{"message": f"log {start + i}", "level": "info", "service": "api"} for i in range(n)]
+
+
+def flush_one(buffer):
+    """Flush one batch the way the worker thread does"""
+    with buffer._lock:
+        batch = [buffer._queue.popleft() for _ in range(min(buffer.batch_size, len(buffer._queue)))]
+    assert buffer._flush(batch)
+
+
+def journal_size(buffer):
+    return sum(os.path.getsize(path) for path in buffer._segment_paths())
+
+
+@pytest.fixture
+def collection():
+    return mongomock.MongoClient().db.logs
+
+
+@pytest.fixture
+def spill_path(tmp_path):
+    return str(tmp_path / "ingest-spill.jsonl")
+
+
+def test_journal_stays_bounded_while_the_queue_never_drains(collection, spill_path):
+    buffer = WriteBehindBuffer(collection, batch_size=50, spill_path=spill_path, segment_bytes=4096)
+    buffer.offer(make_logs(100))
+    sizes = []
+    for round_ in range(200):
+        buffer.offer(make_logs(50, start=100 + round_ * 50))
+        flush_one(buffer)
+        assert buffer.depth() >= 100
+        sizes.append(journal_size(buffer))
+
+    assert collection.count_documents({}) == 200 * 50
+    # Unflushed entries (about 100 lines) plus at most one partly flushed segment
+    assert max(sizes[100:]) <= max(sizes[:10]) + 2 * 4096
+    assert len(buffer._segment_paths()) <= 4
+
+
+def test_drained_queue_leaves_no_journal(collection, spill_path):
+    buffer = WriteBehindBuffer(collection, batch_size=50, spill_path=spill_path)
+    buffer.offer(make_logs(120))
+    while buffer.depth():
+        flush_one(buffer)
+    assert buffer._segment_paths() == []
+    buffer.offer(make_logs(1))
+    assert len(buffer._segment_paths()) == 1
+
+
+def test_restart_replays_only_unflushed_entries(collection, spill_path):
+    buffer = WriteBehindBuffer(collection, batch_size=50, spill_path=spill_path, segment_bytes=2048)
+    buffer.offer(make_logs(175))
+    flush_one(buffer)
+    flush_one(buffer)
+    # Crash: nothing else is flushed and the process is gone
+
+    restarted = WriteBehindBuffer(collection, batch_size=50, spill_path=spill_path, segment_bytes=2048)
+    restarted._recover()
+    assert restarted.stats["replayed"] == 75
+    while restarted.depth():
+        flush_one(restarted)
+    assert collection.count_documents({}) == 175
+    assert restarted._segment_paths() == []
+
+    # New entries continue the sequence instead of reusing flushed numbers
+    restarted.offer(make_logs(1))
+    assert restarted._seq == 176
+
+
+def test_replaying_already_written_entries_is_idempotent(collection, spill_path):
+    buffer = WriteBehindBuffer(collection, batch_size=50, spill_path=spill_path)
+    buffer.offer(make_logs(50))
+    with buffer._lock:
+        batch = list(buffer._queue)
+    collection.insert_many([entry for _, entry in batch])
+    # Written, but the checkpoint never made it to disk
+
+    restarted = WriteBehindBuffer(collection, batch_size=50, spill_path=spill_path)
+    restarted._recover()
+    assert restarted.stats["replayed"] == 50
+    flush_one(restarted)
+    assert collection.count_documents({}) == 50
+    assert restarted.stats["duplicates"] == 50
+
+
+def test_pre_segment_journal_is_replayed(collection, spill_path):
+    buffer = WriteBehindBuffer(collection, batch_size=50, spill_path=spill_path)
+    buffer.offer(make_logs(10))
+    buffer._close_segment()
+    # A journal written before segments existed lives at the bare spill path
+    os.replace(buffer._segments.pop()[0], spill_path)
+
+    restarted = WriteBehindBuffer(collection, batch_size=50, spill_path=spill_path)
+    restarted._recover()
+    assert restarted.stats["replayed"] == 10
+    flush_one(restarted)
+    assert not os.path.exists(spill_path)
+
+
+def test_full_buffer_rejects_without_journaling(collection, spill_path):
+    buffer = WriteBehindBuffer(collection, max_size=10, spill_path=spill_path)
+    assert buffer.offer(make_logs(10))
+    assert not buffer.offer(make_logs(1))
+    assert buffer.stats["dropped"] == 1
+    assert buffer._seq == 10
+
+
+def test_failed_journal_write_queues_nothing(collection, spill_path, monkeypatch):
+    buffer = WriteBehindBuffer(collection, spill_path=spill_path)
+    buffer.offer(make_logs(2))
+
+    def disk_full(first_seq, entries):
+        raise OSError("No space left on device")
+    monkeypatch.setattr(buffer, "_journal", disk_full)
+    with pytest.raises(OSError):
+        buffer.offer(make_logs(3))
+
+    assert buffer.depth() == 2 and buffer.stats["accepted"] == 2
+
+
+def test_write_errors_are_not_counted_as_flushed(collection, spill_path, monkeypatch):
+    written = []
+
+    def insert_many(docs, ordered=True):
+        written.extend(docs[2:])
+        raise BulkWriteError({"writeErrors": [{"index": 0, "code": 121, "errmsg": "failed validation"},
+                                              {"index": 1, "code": DUPLICATE_KEY_ERROR}]})
+    monkeypatch.setattr(collection, "insert_many", insert_many)
+    flushed = []
+    buffer = WriteBehindBuffer(collection, spill_path=spill_path, on_flush=flushed.extend)
+    buffer.offer(make_logs(4))
+
+    flush_one(buffer)
+
+    assert buffer.stats["flushed"] == 2 and buffer.stats["duplicates"] == 1
+    assert flushed == written
@@ -0,0 +1,154 @@
+import pytest
+import requests
+
+from notifier import NotificationDispatcher
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+
+class StubSession:
+    """Stands in for the pooled requests session; replies are scripted"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.posted = []
+
+    def post(self, url, json=None, timeout=None):
+        self.posted.append(json)
+        reply = self.replies.pop(0) if self.replies else 200
+        if isinstance(reply, Exception):
+            raise reply
+        if isinstance(reply, tuple):
+            return FakeResponse(*reply)
+        return FakeResponse(reply)
+
+
+def dispatcher(*replies, **kwargs):
+    notifier = NotificationDispatcher("http://hooks.test/slack", rate=1000, burst=5, **kwargs)
+    notifier.session = StubSession(*replies)
+    return notifier
+
+
+def error(service="api", message="db down", level="error", at="2026-01-01T00:00:00Z"):
+    return {"service": service, "message": message, "level": level, "timestamp": at}
+
+
+def test_burst_is_sent_as_one_digest_per_service():
+    notifier = dispatcher()
+    for i in range(3):
+        notifier.submit(error(at=f"t{i}"))
+    notifier.submit(error(message="disk full", level="fatal", at="t3"))
+    notifier.submit(error(service="web"))
+    notifier.submit({"service": "api", "message": "ok", "level": "info"})
+
+    notifier.flush()
+
+    api, web = notifier.session.posted
+    assert "4 critical logs" in api["text"] and "*api*" in api["text"]
+    fields = api["attachments"][0]["fields"]
+    assert fields[0]["value"] == "3× db down\n1× disk full"
+    assert fields[2]["value"] == "t0 → t3" and api["attachments"][0]["color"] == "#ff0000"
+    assert "ERROR" in web["text"] and web["attachments"][0]["fields"][0]["value"] == "db down"
+    assert notifier.snapshot()["pendingServices"] == 0
+
+
+def test_repeated_messages_are_deduplicated_and_capped():
+    notifier = dispatcher()
+    for i in range(8):
+        notifier.submit(error(message=f"failure {i}"))
+    notifier.submit(error(message="failure 0"))
+
+    notifier.flush()
+
+    lines = notifier.session.posted[0]["attachments"][0]["fields"][0]["value"].split("\n")
+    assert lines[0] == "2× failure 0" and len(lines) == 5
+    assert notifier.stats["deduplicated"] == 1 and notifier.stats["submitted"] == 9
+
+
+def test_disabled_dispatcher_ignores_logs():
+    notifier = NotificationDispatcher("")
+
+    notifier.submit(error())
+
+    assert notifier.snapshot()["submitted"] == 0 and notifier.snapshot()["pendingServices"] == 0
+
+
+def test_new_services_beyond_the_limit_are_dropped():
+    notifier = dispatcher(max_services=1)
+    notifier.submit(error(service="api"))
+    notifier.submit(error(service="web"))
+
+    notifier.flush()
+
+    assert len(notifier.session.posted) == 1 and notifier.stats["dropped"] == 1
+
+
+@pytest.mark.parametrize("reply", [(429, {"Retry-After": "0.01"}), 503, requests.ConnectionError("reset")])
+def test_transient_failures_are_retried(reply):
+    notifier = dispatcher(reply)
+    notifier.submit(error())
+
+    notifier.flush()
+
+    first, second = notifier.session.posted
+    assert first == second
+    assert notifier.stats["sent"] == 1 and notifier.stats["retried"] == 1 and notifier.stats["failed"] == 0
+
+
+def test_digest_is_given_up_after_the_last_attempt():
+    notifier = dispatcher(503, 503, 503, max_attempts=3)
+    notifier.submit(error())
+
+    notifier.flush()
+
+    assert len(notifier.session.posted) == 3
+    assert notifier.stats["failed"] == 1 and notifier.stats["retried"] == 2 and notifier.stats["sent"] == 0
+
+
+def test_client_errors_are_not_retried():
+    notifier = dispatcher(404)
+    notifier.submit(error())
+
+    notifier.flush()
+
+    assert len(notifier.session.posted) == 1 and notifier.stats["failed"] == 1
+
+
+def test_rate_limit_spaces_out_sends(monkeypatch):
+    notifier = NotificationDispatcher("http://hooks.test/slack", rate=1, burst=1)
+    notifier.session = StubSession()
+    clock, slept = [0.0], []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr("notifier.time.monotonic", lambda: clock[0])
+    monkeypatch.setattr("notifier.time.sleep", sleep)
+    notifier.bucket.updated = 0.0
+
+    for service in ("a", "b", "c"):
+        notifier.submit(error(service=service))
+    notifier.flush()
+
+    assert len(notifier.session.posted) == 3 and sum(slept) == pytest.approx(2.0)
+
+
+def test_pending_digests_are_dropped_when_stopping_on_the_rate_limit():
+    notifier = NotificationDispatcher("http://hooks.test/slack", rate=0.001, burst=1)
+    notifier.session = StubSession()
+    for service in ("a", "b"):
+        notifier.submit(error(service=service))
+    notifier._stop.set()
+
+    notifier.flush()
+
+    assert len(notifier.session.posted) == 1 and notifier.stats["dropped"] == 1
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from pagination import SORT, after_cursor, decode_cursor, encode_cursor, projection
+
+
+def test_cursor_round_trips_datetimes_and_legacy_strings():
+    log_id = ObjectId()
+    at = datetime(2025, 1, 1, 10, 0, 0, 123000)
+
+    assert decode_cursor(encode_cursor({"_id": log_id, "timestamp": at})) == (at, log_id)
+    legacy = "2024-12-31T23:59:59.000Z"
+    assert decode_cursor(encode_cursor({"_id": log_id, "timestamp": legacy})) == (legacy, log_id)
+
+
+def test_cursor_is_url_safe_without_padding():
+    cursor = encode_cursor({"_id": ObjectId(), "timestamp": datetime(2025, 1, 1)})
+
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "e30", "eyJkIjoieCIsImlkIjoiMSJ9"])
+def test_malformed_cursors_raise_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_pages_visit_every_log_once_newest_first(db):
+    start = datetime(2025, 1, 1)
+    # Pairs of logs share a timestamp, so the _id tie-breaker decides within a pair
+    db.logs.insert_many([{"timestamp": start + timedelta(seconds=i // 2), "n": i} for i in range(25)])
+    expected = [doc["_id"] for doc in db.logs.find().sort(SORT)]
+
+    seen, cursor = [], None
+    while True:
+        query = after_cursor(cursor) if cursor else {}
+        page = list(db.logs.find(query).sort(SORT).limit(4))
+        seen += [doc["_id"] for doc in page]
+        if len(page) < 4:
+            break
+        cursor = encode_cursor(page[-1])
+
+    assert seen == expected
+
+
+def test_only_datetime_cursors_admit_legacy_string_timestamps():
+    legacy = {"timestamp": {"$type": "string"}}
+
+    assert legacy in after_cursor(encode_cursor({"_id": ObjectId(), "timestamp": datetime(2025, 1, 1)}))["$or"]
+    assert legacy not in after_cursor(encode_cursor({"_id": ObjectId(), "timestamp": "2025-01-01"}))["$or"]
+
+
+def test_projection_keeps_the_sort_key_and_drops_operators():
+    assert projection(None) is None
+    assert projection(" message, $where ,service,") == {"message": 1, "service": 1, "timestamp": 1, "_id": 1}
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import fakeredis
+import pytest
+
+import passwords
+from passwords import LoginThrottle, PasswordHasher, PasswordQueueFull
+
+
+def test_hash_and_check_round_trip():
+    hasher = PasswordHasher(workers=1, rounds=4)
+
+    hashed = hasher.hash("s3cret")
+
+    assert hasher.check("s3cret", hashed) and not hasher.check("guess", hashed)
+    assert hasher.snapshot()["hashed"] == 1 and hasher.snapshot()["checked"] == 2
+
+
+def test_calls_beyond_the_queue_are_rejected(monkeypatch):
+    # Plain threads: eventlet's pool is only driven from the hub
+    monkeypatch.setattr(passwords, "tpool", None)
+    hasher = PasswordHasher(workers=1, max_queue=0, rounds=4)
+    started, release = threading.Event(), threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+
+    worker = threading.Thread(target=hasher._run, args=(hold,))
+    worker.start()
+    started.wait(5)
+    try:
+        with pytest.raises(PasswordQueueFull):
+            hasher.hash("s3cret")
+    finally:
+        release.set()
+        worker.join()
+
+    assert hasher.snapshot()["rejected"] == 1 and hasher.snapshot()["pending"] == 0
+    assert hasher.check("s3cret", hasher.hash("s3cret"))
+
+
+@pytest.fixture
+def throttle():
+    return LoginThrottle(fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True),
+                         max_attempts=3, window=1)
+
+
+def test_only_failures_count_towards_the_limit(throttle):
+    for _ in range(10):
+        assert throttle.retry_after("10.0.0.1", "a@example.com") == 0
+    for _ in range(2):
+        throttle.failed("10.0.0.1", "a@example.com")
+    assert throttle.retry_after("10.0.0.1", "a@example.com") == 0
+
+    throttle.failed("10.0.0.1", " A@Example.com ")
+
+    assert throttle.retry_after("10.0.0.1", "a@example.com") == 1
+    assert throttle.retry_after("10.0.0.2", "a@example.com") == 0
+    assert throttle.retry_after("10.0.0.1", "b@example.com") == 0
+    assert throttle.stats == {"throttled": 1, "failed": 3}
+
+
+def test_limit_lifts_when_the_window_expires(throttle):
+    for _ in range(3):
+        throttle.failed("10.0.0.1", "a@example.com")
+    assert throttle.retry_after("10.0.0.1", "a@example.com")
+
+    time.sleep(1.1)
+
+    assert throttle.retry_after("10.0.0.1", "a@example.com") == 0
+
+
+def test_success_clears_the_failures(throttle):
+    for _ in range(2):
+        throttle.failed("10.0.0.1", "a@example.com")
+
+    throttle.succeeded("10.0.0.1", "a@example.com")
+    throttle.failed("10.0.0.1", "a@example.com")
+
+    assert throttle.retry_after("10.0.0.1", "a@example.com") == 0
+
+
+def test_redis_outage_fails_open():
+    server = fakeredis.FakeServer()
+    server.connected = False
+    throttle = LoginThrottle(fakeredis.FakeRedis(server=server), max_attempts=1)
+
+    throttle.failed("10.0.0.1", "a@example.com")
+
+    assert throttle.retry_after("10.0.0.1", "a@example.com") == 0
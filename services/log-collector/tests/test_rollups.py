@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from logviz_common.field_names import unescape_key
+from ingest_buffer import WriteBehindBuffer
+from rollups import COVERAGE_ID, RollupWriter, bucket_key
+
+
+def log(timestamp, level="info", service="api", accepted=None):
+    doc = {"timestamp": timestamp, "level": level, "service": service, "message": "m"}
+    if accepted is not None:
+        doc["_id"] = ObjectId.from_datetime(accepted)
+    return doc
+
+
+def hour_doc(db, timestamp):
+    return db.log_rollups.find_one({"_id": f"hour:{bucket_key(timestamp, 'hour')}"})
+
+
+def test_apply_counts_levels_services_and_errors(db):
+    writer = RollupWriter(db.log_rollups)
+    at = datetime(2025, 1, 1, 10, 5)
+    writer.apply([log(at), log(at, "error", "auth.v2"), log(at.isoformat(), "fatal")])
+    doc = hour_doc(db, at)
+    assert doc["total"] == 3
+    assert doc["errors"] == 2
+    assert {unescape_key(k): v for k, v in doc["services"].items()} == {"api": 2, "auth.v2": 1}
+    assert db.log_rollups.find_one({"_id": "minute:2025-01-01T10:05"})["total"] == 3
+
+
+def test_first_collector_marks_coverage_incomplete(db):
+    writer = RollupWriter(db.log_rollups)
+    writer.mark_live()
+    coverage = writer.coverage()
+    assert coverage["complete"] is False
+    live_since = coverage["liveSince"]
+    writer.mark_live()
+    assert writer.coverage()["liveSince"] == live_since
+
+
+def test_existing_rollups_are_taken_as_complete(db):
+    writer = RollupWriter(db.log_rollups)
+    writer.apply([log(datetime(2025, 1, 1, 10))])
+    writer.mark_live()
+    assert writer.coverage()["complete"] is True
+    assert writer.backfill_before_live(db.logs) is None
+
+
+def test_backfill_counts_only_logs_accepted_before_live_rollups(db):
+    writer = RollupWriter(db.log_rollups)
+    live_since = datetime.utcnow().replace(microsecond=0)
+    db.log_rollups.insert_one({"_id": COVERAGE_ID, "liveSince": live_since, "complete": False})
+    at = datetime(2025, 1, 1, 10, 30)
+
+    old = [log(at, accepted=live_since - timedelta(minutes=i + 1)) for i in range(5)]
+    # Accepted after live rollups started (even with an old timestamp): already counted live
+    new = [log(at, "error", accepted=live_since + timedelta(seconds=i + 1)) for i in range(3)]
+    db.logs.insert_many(old + new)
+    writer.apply(new)
+
+    assert writer.backfill_before_live(db.logs, batch_size=2) == 5
+    doc = hour_doc(db, at)
+    assert doc["total"] == 8
+    assert doc["errors"] == 3
+    assert writer.coverage()["complete"] is True
+    assert writer.backfill_before_live(db.logs) is None
+    assert hour_doc(db, at)["total"] == 8
+
+
+def test_interrupted_backfill_writes_nothing(db):
+    writer = RollupWriter(db.log_rollups)
+    live_since = datetime.utcnow().replace(microsecond=0)
+    db.log_rollups.insert_one({"_id": COVERAGE_ID, "liveSince": live_since, "complete": False})
+    at = datetime(2025, 1, 1, 10, 30)
+    db.logs.insert_many([log(at, accepted=live_since - timedelta(seconds=i + 1)) for i in range(4)])
+
+    def lose_lease():
+        raise RuntimeError("lease lost")
+
+    try:
+        writer.backfill_before_live(db.logs, batch_size=2, pause=lose_lease)
+    except RuntimeError:
+        pass
+    assert hour_doc(db, at) is None
+    assert writer.backfill_before_live(db.logs) == 4
+    assert hour_doc(db, at)["total"] == 4
+
+
+def test_rebuild_leaves_the_current_hour_to_the_live_writer(db):
+    writer = RollupWriter(db.log_rollups)
+    now = datetime.utcnow()
+    current = now.replace(minute=0, second=0, microsecond=0)
+    past = current - timedelta(hours=2)
+    db.logs.insert_many([log(past), log(past), log(current)])
+    writer.apply([log(current), log(current)])   # live counts for the current hour
+    writer.apply([log(past)])                    # stale counts the rebuild replaces
+
+    assert writer.backfill(db.logs, hours=24) == 2
+    assert hour_doc(db, past)["total"] == 2
+    assert hour_doc(db, current)["total"] == 2
+
+
+def test_logs_accepted_around_mark_live_are_counted_once(db):
+    writer = RollupWriter(db.log_rollups)
+    at = datetime(2025, 1, 1, 10, 30)
+    db.logs.insert_many([log(at) for _ in range(5)])   # fresh ObjectIds, same second as mark_live
+    writer.mark_live()
+    accepted_live = log(at, "error")
+    db.logs.insert_one(accepted_live)
+    writer.apply([accepted_live])
+
+    assert writer.backfill_before_live(db.logs) == 5
+    assert hour_doc(db, at)["total"] == 6
+
+
+def test_spill_replayed_after_mark_live_is_counted_once(db, tmp_path):
+    spill_path = str(tmp_path / "ingest-spill.jsonl")
+    at = datetime(2025, 1, 1, 10, 30)
+    crashed = WriteBehindBuffer(db.logs, spill_path=spill_path)
+    crashed.offer([log(at) for _ in range(4)])   # journaled, never flushed
+    writer = RollupWriter(db.log_rollups)
+    writer.mark_live()
+
+    restarted = WriteBehindBuffer(db.logs, spill_path=spill_path, on_flush=writer.apply)
+    restarted._recover()
+    assert not restarted.replay_flushed()
+    with restarted._lock:
+        batch = list(restarted._queue)
+        restarted._queue.clear()
+    restarted._flush(batch)
+    assert restarted.replay_flushed()
+    fresh = log(at, "error")
+    restarted.offer([fresh])
+    restarted._flush([(restarted._seq, fresh)])
+
+    assert writer.backfill_before_live(db.logs) == 4
+    assert hour_doc(db, at)["total"] == 5
@@ -0,0 +1,106 @@
+import re
+
+import pytest
+
+from search import SNIPPET_CHARS, SearchQuery, wildcard_pattern
+
+
+def test_query_splits_words_phrases_and_wildcards():
+    search = SearchQuery('payment  "card   declined" time* pay?ent')
+
+    assert search.words == ["payment"]
+    assert search.phrases == ["card declined"]
+    assert search.wildcards == ["time*", "pay?ent"]
+    assert search.uses_text_index
+
+
+@pytest.mark.parametrize("text,regex", [(None, None), ("", None), ("   ", None), ('"" *', None), ("**", "")])
+def test_query_needs_something_to_search_for(text, regex):
+    with pytest.raises(ValueError):
+        SearchQuery(text, regex)
+
+
+def test_invalid_regex_is_a_value_error():
+    with pytest.raises(ValueError, match="invalid regex"):
+        SearchQuery(None, "(unclosed")
+
+
+def test_filter_requires_every_text_term():
+    assert SearchQuery('timeout "upstream reset"').filter() == {"$text": {"$search": '"timeout" "upstream reset"'}}
+
+
+def test_filter_combines_text_wildcards_and_regex():
+    search = SearchQuery("timeout conn*", regex=r"5\d\d")
+
+    assert not SearchQuery("conn*").uses_text_index
+    assert search.filter() == {"$and": [
+        {"$text": {"$search": '"timeout"'}},
+        {"message": {"$regex": r"\bconn\w*\b", "$options": "i"}},
+        {"message": {"$regex": r"5\d\d", "$options": "i"}},
+    ]}
+
+
+def test_wildcards_match_whole_words_only():
+    pattern = re.compile(wildcard_pattern("pay?ent"), re.IGNORECASE)
+
+    assert pattern.search("PAYMENT failed")
+    assert not pattern.search("prepayments")
+
+
+def test_wildcard_terms_escape_other_regex_characters():
+    pattern = re.compile(wildcard_pattern("v1.2*"))
+
+    assert pattern.search("upgrade to v1.23")
+    assert not pattern.search("upgrade to v1x23")
+
+
+def test_highlight_marks_every_match():
+    snippet, highlights = SearchQuery('timeout "card declined"').highlight("Card  declined after timeout")
+
+    assert snippet == "Card  declined after timeout"
+    assert [snippet[s:e] for s, e in highlights] == ["Card  declined", "timeout"]
+
+
+def test_highlight_snippet_centres_on_the_first_match():
+    message = "x" * 300 + " timeout " + "y" * 300
+
+    snippet, highlights = SearchQuery("timeout").highlight(message)
+
+    assert snippet.startswith("…") and snippet.endswith("…")
+    assert len(snippet) == SNIPPET_CHARS + 2
+    assert [snippet[s:e] for s, e in highlights] == ["timeout"]
+
+
+@pytest.mark.parametrize("text,words", [
+    ('abc"def', ["abc", "def"]),
+    ('"unbalanced timeout', ["unbalanced", "timeout"]),
+    ('error" "', ["error"]),
+])
+def test_stray_quotes_only_separate_words(text, words):
+    search = SearchQuery(text)
+
+    assert search.words == words and search.phrases == []
+    assert search.filter() == {"$text": {"$search": " ".join(f'"{w}"' for w in words)}}
+
+
+class EmptyCursor:
+    def sort(self, *args):
+        return self
+
+    def limit(self, count):
+        return self
+
+    def max_time_ms(self, ms):
+        return []
+
+
+def test_endpoint_lets_the_text_sort_spill_to_disk(collector, monkeypatch):
+    calls = []
+    monkeypatch.setattr(collector.logs_collection, "find", lambda *args, **kwargs: calls.append(kwargs) or EmptyCursor())
+    client = collector.app.test_client()
+
+    responses = [client.get("/api/logs/search", query_string={"q": "timeout", "sort": sort})
+                 for sort in ("time", "relevance")]
+
+    assert [response.status_code for response in responses] == [200, 200]
+    assert [call.get("allow_disk_use") for call in calls] == [True, True]
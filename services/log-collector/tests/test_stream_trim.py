@@ -0,0 +1,58 @@
+import pytest
+
+
+@pytest.fixture
+def stream(collector, monkeypatch):
+    monkeypatch.setattr(collector, "RECENT_LOGS_MAX", 5)
+    monkeypatch.setattr(collector, "LOGS_STREAM_GROUPS", ["fast", "slow"])
+    collector.redis_client.delete(collector.LOGS_STREAM_KEY)
+    collector.ensure_stream_groups()
+    return collector
+
+
+def publish(app, count):
+    return [app.redis_client.xadd(app.LOGS_STREAM_KEY, {"data": "{}"}) for _ in range(count)]
+
+
+def read(app, group, count):
+    response = app.redis_client.xreadgroup(group, "c1", {app.LOGS_STREAM_KEY: ">"}, count=count)
+    return [entry_id for entry_id, _ in response[0][1]]
+
+
+def remaining(app):
+    return [entry_id for entry_id, _ in app.redis_client.xrange(app.LOGS_STREAM_KEY)]
+
+
+def test_floor_is_the_slowest_groups_oldest_pending_entry(stream):
+    ids = publish(stream, 30)
+    stream.redis_client.xack(stream.LOGS_STREAM_KEY, "fast", *read(stream, "fast", 30))
+    slow = read(stream, "slow", 12)
+    stream.redis_client.xack(stream.LOGS_STREAM_KEY, "slow", *slow[:8])
+
+    assert stream.logs_stream_floor() == ids[8]
+
+    stream.redis_client.xack(stream.LOGS_STREAM_KEY, "slow", *slow[8:])
+    assert stream.logs_stream_floor() == ids[11]
+
+
+def test_floor_keeps_undelivered_entries_and_the_recent_logs(stream):
+    ids = publish(stream, 20)
+    assert stream.logs_stream_floor() == "0-0"
+
+    for group in ("fast", "slow"):
+        stream.redis_client.xack(stream.LOGS_STREAM_KEY, group, *read(stream, group, 20))
+    assert stream.logs_stream_floor() == ids[-5]
+    stream.redis_client.delete(stream.LOGS_STREAM_KEY)
+    publish(stream, 4)
+    assert stream.logs_stream_floor() is None
+
+
+def test_trim_never_drops_entries_a_group_still_needs(stream):
+    ids = publish(stream, 30)
+    stream.redis_client.xack(stream.LOGS_STREAM_KEY, "fast", *read(stream, "fast", 30))
+    read(stream, "slow", 3)
+
+    stream.trim_logs_stream()
+
+    # `~` trimming only drops whole stream nodes, so more may be kept
+    assert set(ids) <= set(remaining(stream))
@@ -1,8 +1,7 @@
 from fastapi import FastAPI, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pymongo import MongoClient
-import redis
 import numpy as np
+import pandas as pd
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 from datetime import datetime, timedelta, timezone
@@ -11,7 +10,16 @@ import os
 import logging
 from collections import defaultdict
 import joblib
+import json
+import shutil
+import threading
+import time
+import schedule
 from pathlib import Path
+from streaming import StreamingDetector
+from logviz_common.connections import mongo_client as connect_mongo, redis_client as connect_redis, probe
+from logviz_common.sketches import HyperLogLog
+from logviz_common.timestamps import since_filter
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -27,12 +35,12 @@ app.add_middleware(
 )
 
 # DB connections
-mongo_client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+mongo_client = connect_mongo('ml-analyzer')
 db = mongo_client.logvizpro
 logs_collection = db.logs
 anomalies_collection = db.anomalies
 
-redis_client = redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379'), decode_responses=True)
+redis_client = connect_redis()
 
 # IST timezone
 IST = ZoneInfo("Asia/Kolkata")
@@ -42,23 +50,209 @@ MODEL_DIR = Path("models")
 MODEL_DIR.mkdir(exist_ok=True)
 MODEL_PATH = MODEL_DIR / "isolation_forest.pkl"
 SCALER_PATH = MODEL_DIR / "scaler.pkl"
+MODEL_VERSIONS_DIR = MODEL_DIR / "versions"
+MODEL_VERSIONS_DIR.mkdir(exist_ok=True)
+CURRENT_VERSION_PATH = MODEL_DIR / "current"
+MODEL_KEEP_VERSIONS = int(os.getenv('MODEL_KEEP_VERSIONS', 5))
+RETRAIN_INTERVAL_HOURS = int(os.getenv('RETRAIN_INTERVAL_HOURS', 6))
+STREAM_DETECTION_ENABLED = os.getenv('STREAM_DETECTION_ENABLED', 'true').lower() == 'true'
+
+# Feature buckets
+EPOCH = pd.Timestamp(0, tz="UTC")
+BUCKET_SIZE = pd.Timedelta(minutes=5)
+# Logs pulled from the cursor per batch; only these fields are read
+LOG_BATCH_SIZE = int(os.getenv('LOG_BATCH_SIZE', 5000))
+# Count distinct services/users per bucket with HyperLogLog (~3% error, 1 KB
+# per bucket) instead of sets that grow with the number of users
+APPROXIMATE_FEATURES = os.getenv('APPROXIMATE_FEATURES', 'false').lower() == 'true'
+FEATURE_HLL_PRECISION = 10
+FEATURE_PROJECTION = {
+    "_id": 0, "timestamp": 1, "level": 1, "service": 1,
+    "userId": 1, "responseTime": 1, "statusCode": 1
+}
 
 def get_ist_time():
     """Get current time in IST"""
     return datetime.now(IST)
 
-def utc_to_ist(dt):
-    """Convert UTC datetime to IST"""
-    if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=timezone.utc)
-    return dt.astimezone(IST)
+class FeatureAccumulator:
+    """Running per-bucket aggregates that logs can be folded into in batches.
+
+    Each batch is parsed and bucketed once with vectorized pandas operations;
+    counts and response-time sums are added, and distinct services/users are
+    kept as per-bucket sets, or HyperLogLog sketches when `approximate`.
+    """
+    
+    SUM_COLUMNS = ['total', 'errors', 'warns', 'rt_sum', 'rt_count', 'status_5xx', 'status_4xx']
+    
+    def __init__(self, approximate=None):
+        self.approximate = APPROXIMATE_FEATURES if approximate is None else approximate
+        self.sums = pd.DataFrame(columns=self.SUM_COLUMNS, dtype=float)
+        self.services = defaultdict(self._distinct)
+        self.users = defaultdict(self._distinct)
+        self.total_logs = 0
+    
+    def _distinct(self):
+        """An empty distinct-value counter; both kinds support len()"""
+        return HyperLogLog(FEATURE_HLL_PRECISION) if self.approximate else set()
+    
+    def add(self, logs, min_bucket=None):
+        """Fold a batch of log documents into the accumulators.
+
+        Logs in buckets before `min_bucket` (already closed) are skipped;
+        returns how many were skipped.
+        """
+        self.total_logs += len(logs)
+        frame = pd.DataFrame({
+            'timestamp': [log.get('timestamp') for log in logs],
+            'level': [log.get('level') for log in logs],
+            'service': [log.get('service', 'unknown') for log in logs],
+            'user': [log.get('userId', 'unknown') for log in logs],
+            'response_time': [log.get('responseTime') for log in logs],
+            'status': [log.get('statusCode', '') for log in logs],
+        })
+        if frame.empty:
+            return 0
+        
+        # Parse once; naive timestamps are UTC, unparseable ones are dropped
+        parsed = pd.to_datetime(frame['timestamp'], utc=True, format='ISO8601', errors='coerce')
+        valid = parsed.notna()
+        frame = frame[valid]
+        if frame.empty:
+            return 0
+        # IST is UTC+5:30, a whole number of 5-minute buckets, so UTC bucket ids line up
+        status = frame['status'].astype(str)
+        response_time = pd.to_numeric(frame['response_time'], errors='coerce')
+        frame = frame.assign(
+            bucket=(parsed[valid] - EPOCH) // BUCKET_SIZE,
+            errors=frame['level'] == 'error',
+            warns=frame['level'] == 'warn',
+            # Only truthy response times count towards the average
+            response_time=response_time.where(response_time != 0),
+            status_5xx=status.str.startswith('5'),
+            status_4xx=status.str.startswith('4'),
+        )
+        
+        late = 0
+        if min_bucket is not None:
+            on_time = frame['bucket'] >= min_bucket
+            late = int((~on_time).sum())
+            frame = frame[on_time]
+            if frame.empty:
+                return late
+        
+        grouped = frame.groupby('bucket')
+        batch_sums = pd.DataFrame({
+            'total': grouped.size(),
+            'errors': grouped['errors'].sum(),
+            'warns': grouped['warns'].sum(),
+            'rt_sum': grouped['response_time'].sum(),
+            'rt_count': grouped['response_time'].count(),
+            'status_5xx': grouped['status_5xx'].sum(),
+            'status_4xx': grouped['status_4xx'].sum(),
+        }).astype(float)
+        self.sums = batch_sums if self.sums.empty else self.sums.add(batch_sums, fill_value=0)
+        
+        if self.approximate:
+            for bucket, group in frame[['bucket', 'service', 'user']].groupby('bucket'):
+                self.services[bucket].update(group['service'].unique())
+                self.users[bucket].update(group['user'].unique())
+            return late
+        for bucket, service in frame[['bucket', 'service']].drop_duplicates().itertuples(index=False):
+            self.services[bucket].add(service)
+        for bucket, user in frame[['bucket', 'user']].drop_duplicates().itertuples(index=False):
+            self.users[bucket].add(user)
+        return late
+    
+    def features(self, feature_names):
+        """Feature matrix and IST bucket keys, ordered by bucket"""
+        if self.sums.empty:
+            return np.empty((0, len(feature_names))), []
+        
+        sums = self.sums.sort_index()
+        stats = pd.DataFrame({
+            'total_logs': sums['total'],
+            'errors': sums['errors'],
+            'warnings': sums['warns'],
+            'error_rate': sums['errors'] / sums['total'] * 100,
+            'warn_rate': sums['warns'] / sums['total'] * 100,
+            'unique_services': [len(self.services[b]) for b in sums.index],
+            'unique_users': [len(self.users[b]) for b in sums.index],
+            'avg_response_time': (sums['rt_sum'] / sums['rt_count']).fillna(0),
+            'status_5xx_count': sums['status_5xx'],
+            'status_4xx_count': sums['status_4xx'],
+            'log_velocity': sums['total'] / 5.0,
+        }, index=sums.index)
+        
+        timestamps = [bucket_key(bucket) for bucket in sums.index]
+        return stats[feature_names].to_numpy(dtype=float), timestamps
+    
+    def pop_closed(self, before_bucket, feature_names):
+        """Features for buckets older than `before_bucket`, removing them from the accumulators"""
+        closed = self.sums.index[self.sums.index < before_bucket]
+        done = FeatureAccumulator(self.approximate)
+        if len(closed):
+            done.sums = self.sums.loc[closed]
+            self.sums = self.sums.drop(closed)
+            for bucket in closed:
+                if bucket in self.services:
+                    done.services[bucket] = self.services.pop(bucket)
+                if bucket in self.users:
+                    done.users[bucket] = self.users.pop(bucket)
+        return done.features(feature_names)
+    
+    def open_buckets(self):
+        return list(self.sums.index)
+    
+    def merge(self, other):
+        """Fold another accumulator's buckets into this one"""
+        self.total_logs += other.total_logs
+        if other.sums.empty:
+            return self
+        self.sums = other.sums.copy() if self.sums.empty else self.sums.add(other.sums, fill_value=0)
+        for mine, theirs in ((self.services, other.services), (self.users, other.users)):
+            for bucket, values in theirs.items():
+                if self.approximate:
+                    mine[bucket].merge(values)
+                else:
+                    mine[bucket].update(values)
+        return self
+    
+    def bucket_state(self, bucket):
+        """One bucket's sums and its distinct services/users (sets, or HyperLogLogs when approximate)"""
+        return self.sums.loc[bucket].to_dict(), self.services[bucket], self.users[bucket]
+    
+    def restore_bucket(self, bucket, sums, services, users):
+        """Reinstate a bucket saved with bucket_state()"""
+        row = pd.DataFrame([sums], index=pd.Index([bucket], dtype='int64'), columns=self.SUM_COLUMNS).astype(float)
+        self.sums = row if self.sums.empty else pd.concat([self.sums.drop(bucket, errors='ignore'), row])
+        self.services[bucket] = services
+        self.users[bucket] = users
+
+def bucket_key(bucket_id):
+    """IST bucket key for an integer 5-minute bucket id"""
+    return datetime.fromtimestamp(int(bucket_id) * 300, tz=IST).isoformat()
+
+class ModelBundle:
+    """A fitted scaler/model pair and its version metadata"""
+    
+    def __init__(self, model, scaler, version, meta=None):
+        self.model = model
+        self.scaler = scaler
+        self.version = version
+        self.meta = meta or {}
 
 class AnomalyDetector:
-    """Enhanced anomaly detection with persistent learning"""
+    """Enhanced anomaly detection with persistent learning.
+
+    Scoring only ever uses the currently loaded, already-fitted model; new
+    models are trained by `train` (retrain endpoint or the scheduled job),
+    saved as a new version and swapped in with a single reference assignment.
+    """
     
     def __init__(self):
-        self.model = None
-        self.scaler = None
+        self.bundle = None
+        self._train_lock = threading.Lock()
         self.feature_names = [
             'total_logs', 'errors', 'warnings', 'error_rate', 'warn_rate',
             'unique_services', 'unique_users', 'avg_response_time',
@@ -66,127 +260,155 @@ class AnomalyDetector:
         ]
         self.load_or_create_model()
     
+    @property
+    def model(self):
+        return self.bundle.model if self.bundle else None
+    
+    @property
+    def scaler(self):
+        return self.bundle.scaler if self.bundle else None
+    
+    @property
+    def version(self):
+        return self.bundle.version if self.bundle else None
+    
+    def new_model(self):
+        return IsolationForest(
+            contamination=0.1,
+            random_state=42,
+            n_estimators=200,
+            max_samples=256,
+            bootstrap=True,
+            n_jobs=-1
+        )
+    
     def load_or_create_model(self):
-        """Load existing model or create new one"""
+        """Load the current model version, or a legacy unversioned model"""
         try:
-            if MODEL_PATH.exists() and SCALER_PATH.exists():
-                self.model = joblib.load(MODEL_PATH)
-                self.scaler = joblib.load(SCALER_PATH)
-                logger.info("Loaded existing model and scaler")
-            else:
-                self.model = IsolationForest(
-                    contamination=0.1,
-                    random_state=42,
-                    n_estimators=200,
-                    max_samples=256,
-                    bootstrap=True,
-                    n_jobs=-1
-                )
-                self.scaler = StandardScaler()
-                logger.info("Created new model and scaler")
+            if CURRENT_VERSION_PATH.exists():
+                self.bundle = self.load_version(int(CURRENT_VERSION_PATH.read_text().strip()))
+                logger.info(f"Loaded model version {self.bundle.version}")
+            elif MODEL_PATH.exists() and SCALER_PATH.exists():
+                model = joblib.load(MODEL_PATH)
+                if hasattr(model, "estimators_"):
+                    self.bundle = ModelBundle(model, joblib.load(SCALER_PATH), 0, {"legacy": True})
+                    logger.info("Loaded legacy unversioned model as version 0")
+            if self.bundle is None:
+                logger.info("No trained model yet; waiting for retraining")
         except Exception as e:
             logger.error(f"Error loading model: {e}")
-            self.model = IsolationForest(contamination=0.1, random_state=42)
-            self.scaler = StandardScaler()
+            self.bundle = None
     
-    def save_model(self):
-        """Persist model to disk"""
-        try:
-            joblib.dump(self.model, MODEL_PATH)
-            joblib.dump(self.scaler, SCALER_PATH)
-            logger.info("Model and scaler saved successfully")
-        except Exception as e:
-            logger.error(f"Error saving model: {e}")
-    
-    def extract_features(self, logs, time_buckets):
-        """Extract enhanced features from logs"""
-        features = []
-        timestamps = []
-        
-        for bucket_time, counts in sorted(time_buckets.items()):
-            # Get logs for this bucket
-            bucket_logs = [
-                log for log in logs 
-                if self._get_bucket_time(log['timestamp']) == bucket_time
-            ]
-            
-            # Calculate rates
-            total = counts["total"]
-            error_rate = (counts["errors"] / total * 100) if total > 0 else 0
-            warn_rate = (counts["warns"] / total * 100) if total > 0 else 0
-            
-            # Extract additional features
-            unique_services = len(set(log.get('service', 'unknown') for log in bucket_logs))
-            unique_users = len(set(log.get('userId', 'unknown') for log in bucket_logs))
-            
-            # Response time analysis
-            response_times = [
-                log.get('responseTime', 0) 
-                for log in bucket_logs 
-                if log.get('responseTime')
-            ]
-            avg_response_time = np.mean(response_times) if response_times else 0
-            
-            # HTTP status codes
-            status_5xx = sum(1 for log in bucket_logs if str(log.get('statusCode', '')).startswith('5'))
-            status_4xx = sum(1 for log in bucket_logs if str(log.get('statusCode', '')).startswith('4'))
-            
-            # Log velocity (logs per minute in this bucket)
-            log_velocity = total / 5.0
-            
-            feature_vector = [
-                total,
-                counts["errors"],
-                counts["warns"],
-                error_rate,
-                warn_rate,
-                unique_services,
-                unique_users,
-                avg_response_time,
-                status_5xx,
-                status_4xx,
-                log_velocity
-            ]
-            
-            features.append(feature_vector)
-            timestamps.append(bucket_time)
-        
-        return np.array(features), timestamps
+    def load_version(self, version):
+        path = MODEL_VERSIONS_DIR / f"v{version}"
+        model = joblib.load(path / "model.pkl")
+        # Scoring a few hundred buckets is faster without joblib fan-out
+        model.set_params(n_jobs=1)
+        return ModelBundle(
+            model,
+            joblib.load(path / "scaler.pkl"),
+            version,
+            json.loads((path / "meta.json").read_text())
+        )
     
-    def _get_bucket_time(self, timestamp_str):
-        """Convert timestamp to bucket key (in IST)"""
-        try:
-            if isinstance(timestamp_str, str):
-                timestamp_str = timestamp_str.replace('Z', '+00:00')
-                timestamp = datetime.fromisoformat(timestamp_str)
-            else:
-                timestamp = timestamp_str
-            
-            # Convert to IST
-            timestamp_ist = utc_to_ist(timestamp)
+    def list_versions(self):
+        versions = []
+        paths = [p for p in MODEL_VERSIONS_DIR.glob("v*") if p.name[1:].isdigit()]
+        for path in sorted(paths, key=lambda p: int(p.name[1:])):
+            try:
+                versions.append(json.loads((path / "meta.json").read_text()))
+            except (OSError, ValueError):
+                continue
+        return versions
+    
+    def train(self, features_array):
+        """Fit a new scaler/model, persist it as the next version and swap it in"""
+        with self._train_lock:
+            scaler = StandardScaler()
+            features_scaled = scaler.fit_transform(features_array)
+            model = self.new_model()
+            model.fit(features_scaled)
+            model.set_params(n_jobs=1)
             
-            bucket = timestamp_ist.replace(
-                minute=(timestamp_ist.minute // 5) * 5, 
-                second=0, 
-                microsecond=0
-            )
-            return bucket.isoformat()
-        except Exception as e:
-            logger.warning(f"Error getting bucket time: {e}")
-            return None
+            scores = model.score_samples(features_scaled)
+            existing = [int(p.name[1:]) for p in MODEL_VERSIONS_DIR.glob("v*") if p.name[1:].isdigit()]
+            version = max(existing, default=0) + 1
+            meta = {
+                "version": version,
+                "trainedAt": get_ist_time().isoformat(),
+                "samples": int(len(features_array)),
+                "scoreMean": float(np.mean(scores)),
+                "scoreStd": float(np.std(scores)),
+                "featureNames": self.feature_names,
+            }
+            bundle = ModelBundle(model, scaler, version, meta)
+            self.save_model(bundle)
+            self.activate(bundle)
+            return bundle
+    
+    def save_model(self, bundle):
+        """Persist a model version; the directory appears atomically"""
+        tmp_path = MODEL_VERSIONS_DIR / f".v{bundle.version}.tmp"
+        tmp_path.mkdir(parents=True, exist_ok=True)
+        joblib.dump(bundle.model, tmp_path / "model.pkl")
+        joblib.dump(bundle.scaler, tmp_path / "scaler.pkl")
+        (tmp_path / "meta.json").write_text(json.dumps(bundle.meta))
+        os.replace(tmp_path, MODEL_VERSIONS_DIR / f"v{bundle.version}")
+        logger.info(f"Model version {bundle.version} saved")
+        
+        # Keep a few recent versions around for rollback
+        old = sorted(
+            (int(p.name[1:]) for p in MODEL_VERSIONS_DIR.glob("v*") if p.name[1:].isdigit()),
+            reverse=True
+        )[MODEL_KEEP_VERSIONS:]
+        for version in old:
+            if version != self.version:
+                shutil.rmtree(MODEL_VERSIONS_DIR / f"v{version}", ignore_errors=True)
+    
+    def activate(self, bundle):
+        """Make `bundle` the scoring model, here and across restarts"""
+        tmp_path = CURRENT_VERSION_PATH.with_suffix(".tmp")
+        tmp_path.write_text(str(bundle.version))
+        os.replace(tmp_path, CURRENT_VERSION_PATH)
+        self.bundle = bundle
+        logger.info(f"Activated model version {bundle.version}")
+    
+    def extract_features_from_cursor(self, cursor, batch_size=LOG_BATCH_SIZE):
+        """Stream a Mongo cursor into per-bucket accumulators.
+
+        Raw logs are dropped after each batch is folded in, so memory is
+        bounded by the number of buckets rather than the number of logs.
+        Returns (features, timestamps, total_logs).
+        """
+        accumulator = FeatureAccumulator()
+        batch = []
+        for log in cursor.batch_size(batch_size):
+            batch.append(log)
+            if len(batch) >= batch_size:
+                accumulator.add(batch)
+                batch = []
+        if batch:
+            accumulator.add(batch)
+        
+        features, timestamps = accumulator.features(self.feature_names)
+        return features, timestamps, accumulator.total_logs
     
     def detect(self, features_array, timestamps, features_list):
-        """Detect anomalies with confidence scores"""
+        """Score buckets against the loaded model (no fitting)"""
+        bundle = self.bundle
+        if bundle is None:
+            raise RuntimeError("Model has not been trained yet")
+        
         # Scale features
-        features_scaled = self.scaler.fit_transform(features_array)
+        features_scaled = bundle.scaler.transform(features_array)
         
-        # Detect anomalies
-        predictions = self.model.fit_predict(features_scaled)
-        scores = self.model.score_samples(features_scaled)
+        # Detect anomalies (same rule as IsolationForest.predict, one pass over the trees)
+        scores = bundle.model.score_samples(features_scaled)
+        predictions = np.where(scores - bundle.model.offset_ < 0, -1, 1)
         
-        # Calculate dynamic thresholds based on score distribution
-        score_mean = np.mean(scores)
-        score_std = np.std(scores)
+        # Z-scores relative to the training score distribution when known
+        score_mean = bundle.meta.get("scoreMean", np.mean(scores))
+        score_std = bundle.meta.get("scoreStd", np.std(scores))
         
         anomalies = []
         for i, (pred, score) in enumerate(zip(predictions, scores)):
@@ -275,12 +497,35 @@ class AnomalyDetector:
 # Initialize detector
 detector = AnomalyDetector()
 
+# Continuous detection over the collector's log stream
+stream_detector = StreamingDetector(
+    redis_client,
+    detector,
+    anomalies_collection,
+    FeatureAccumulator,
+    grace_seconds=int(os.getenv('STREAM_GRACE_SECONDS', 30)),
+    min_confidence=float(os.getenv('STREAM_MIN_CONFIDENCE', 0.5))
+)
+
+@app.on_event("startup")
+def ensure_indexes():
+    """Indexes for anomaly listing, stats and acknowledgement"""
+    try:
+        anomalies_collection.create_index([("detectedAt", -1)])
+        anomalies_collection.create_index([("severity", 1), ("detectedAt", -1)])
+        anomalies_collection.create_index("timestamp")
+    except Exception as e:
+        logger.error(f"Failed to create anomaly indexes: {e}")
+
 @app.get("/health")
 def health():
     return {
         "status": "healthy", 
         "service": "ml-analyzer",
         "model_loaded": detector.model is not None,
+        "model_version": detector.version,
+        "stream_detection": STREAM_DETECTION_ENABLED,
+        "dependencies": probe(mongo_client, redis_client),
         "currentTime": get_ist_time().isoformat(),
         "timezone": "Asia/Kolkata (IST)"
     }
@@ -294,46 +539,37 @@ def detect_anomalies(
     try:
         # Get logs (using UTC for MongoDB query)
         time_ago = datetime.now(timezone.utc) - timedelta(hours=hours)
-        logs = list(logs_collection.find({
-            "timestamp": {"$gte": time_ago.isoformat()}
-        }))
+        cursor = logs_collection.find(since_filter(time_ago), FEATURE_PROJECTION)
+        
+        # Stream logs into time buckets and extract features
+        features_array, timestamps, total_logs = detector.extract_features_from_cursor(cursor)
         
-        if len(logs) < 50:
+        if total_logs < 50:
             return {
                 "success": True,
-                "message": f"Not enough data (have {len(logs)}, need 50+)",
+                "message": f"Not enough data (have {total_logs}, need 50+)",
                 "anomalies": [],
-                "totalLogs": len(logs),
+                "totalLogs": total_logs,
                 "currentTime": get_ist_time().isoformat()
             }
         
-        # Group into time buckets
-        time_buckets = defaultdict(lambda: {"total": 0, "errors": 0, "warns": 0})
-        
-        for log in logs:
-            try:
-                bucket_key = detector._get_bucket_time(log['timestamp'])
-                if bucket_key:
-                    time_buckets[bucket_key]["total"] += 1
-                    if log.get('level') == 'error':
-                        time_buckets[bucket_key]["errors"] += 1
-                    elif log.get('level') == 'warn':
-                        time_buckets[bucket_key]["warns"] += 1
-            except Exception as e:
-                logger.warning(f"Error processing log: {e}")
-                continue
-        
-        if len(time_buckets) < 3:
+        if len(timestamps) < 3:
             return {
                 "success": True,
                 "message": "Not enough time buckets",
                 "anomalies": [],
-                "buckets": len(time_buckets),
+                "buckets": len(timestamps),
                 "currentTime": get_ist_time().isoformat()
             }
         
-        # Extract features
-        features_array, timestamps = detector.extract_features(logs, time_buckets)
+        if detector.model is None:
+            return {
+                "success": True,
+                "message": "Model not trained yet; POST /api/ml/retrain or wait for the scheduled retrain",
+                "anomalies": [],
+                "totalLogs": total_logs,
+                "currentTime": get_ist_time().isoformat()
+            }
         
         # Detect anomalies
         anomalies = detector.detect(features_array, timestamps, features_array.tolist())
@@ -351,10 +587,6 @@ def detect_anomalies(
             except Exception as e:
                 logger.error(f"Failed to save anomaly: {e}")
         
-        # Save updated model periodically
-        if len(features_array) >= 50:
-            detector.save_model()
-        
         logger.info(f"Detected {len(filtered_anomalies)} high-confidence anomalies")
         
         return {
@@ -364,8 +596,9 @@ def detect_anomalies(
             "totalAnomalies": len(anomalies),
             "filteredAnomalies": len(filtered_anomalies),
             "analysisWindow": f"{hours} hours",
-            "totalLogs": len(logs),
+            "totalLogs": total_logs,
             "minConfidence": min_confidence,
+            "modelVersion": detector.version,
             "currentTime": get_ist_time().isoformat(),
             "timezone": "IST"
         }
@@ -458,6 +691,8 @@ def get_ml_stats():
                 "last24Hours": recent_count,
                 "modelStatus": {
                     "trained": detector.model is not None,
+                    "version": detector.version,
+                    "trainedAt": detector.bundle.meta.get("trainedAt") if detector.bundle else None,
                     "features": len(detector.feature_names),
                     "algorithm": "Isolation Forest"
                 }
@@ -468,55 +703,113 @@ def get_ml_stats():
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+def retrain_from_history():
+    """Train a new model version on the last 7 days of logs"""
+    # Get historical data
+    week_ago = datetime.now(timezone.utc) - timedelta(days=7)
+    cursor = logs_collection.find(since_filter(week_ago), FEATURE_PROJECTION)
+    features_array, _, total_logs = detector.extract_features_from_cursor(cursor)
+    
+    if total_logs < 100 or len(features_array) < 3:
+        return {
+            "success": False,
+            "message": "Not enough historical data for retraining",
+            "currentTime": get_ist_time().isoformat()
+        }
+    
+    # Retrain and hot-swap
+    bundle = detector.train(features_array)
+    
+    logger.info(f"Model version {bundle.version} trained on {len(features_array)} samples")
+    
+    return {
+        "success": True,
+        "message": "Model retrained successfully",
+        "modelVersion": bundle.version,
+        "samplesUsed": len(features_array),
+        "logsUsed": total_logs,
+        "dataWindow": "7 days",
+        "retrainedAt": get_ist_time().isoformat(),
+        "timezone": "IST"
+    }
+
 @app.post("/api/ml/retrain")
 def retrain_model():
     """Manually trigger model retraining"""
     try:
-        # Get historical data
-        week_ago = datetime.now(timezone.utc) - timedelta(days=7)
-        logs = list(logs_collection.find({
-            "timestamp": {"$gte": week_ago.isoformat()}
-        }).limit(10000))
-        
-        if len(logs) < 100:
-            return {
-                "success": False,
-                "message": "Not enough historical data for retraining",
-                "currentTime": get_ist_time().isoformat()
-            }
-        
-        # Process and retrain
-        time_buckets = defaultdict(lambda: {"total": 0, "errors": 0, "warns": 0})
-        for log in logs:
-            bucket_key = detector._get_bucket_time(log['timestamp'])
-            if bucket_key:
-                time_buckets[bucket_key]["total"] += 1
-                if log.get('level') == 'error':
-                    time_buckets[bucket_key]["errors"] += 1
-                elif log.get('level') == 'warn':
-                    time_buckets[bucket_key]["warns"] += 1
-        
-        features_array, _ = detector.extract_features(logs, time_buckets)
-        
-        # Retrain
-        features_scaled = detector.scaler.fit_transform(features_array)
-        detector.model.fit(features_scaled)
-        detector.save_model()
-        
-        logger.info(f"Model retrained on {len(features_array)} samples")
-        
-        return {
-            "success": True,
-            "message": "Model retrained successfully",
-            "samplesUsed": len(features_array),
-            "dataWindow": "7 days",
-            "retrainedAt": get_ist_time().isoformat(),
-            "timezone": "IST"
-        }
+        return retrain_from_history()
     except Exception as e:
         logger.error(f"Retraining failed: {e}")
         return {"success": False, "error": str(e)}
 
+@app.get("/api/ml/models")
+def list_models():
+    """List persisted model versions"""
+    return {
+        "success": True,
+        "activeVersion": detector.version,
+        "versions": detector.list_versions()
+    }
+
+@app.post("/api/ml/models/{version}/activate")
+def activate_model(version: int):
+    """Roll the scoring model back (or forward) to a persisted version"""
+    try:
+        detector.activate(detector.load_version(version))
+        return {"success": True, "activeVersion": detector.version}
+    except FileNotFoundError:
+        return {"success": False, "error": f"Model version {version} not found"}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+def run_retrain_schedule():
+    """Background loop: bootstrap a model if there is none, then retrain periodically"""
+    def scheduled_retrain():
+        try:
+            result = retrain_from_history()
+            if not result["success"]:
+                logger.info(f"Scheduled retrain skipped: {result['message']}")
+        except Exception as e:
+            logger.error(f"Scheduled retrain failed: {e}")
+    
+    def bootstrap():
+        # Keep trying every few minutes until there is enough data for a first model
+        if detector.model is None:
+            scheduled_retrain()
+        if detector.model is not None:
+            return schedule.CancelJob
+    
+    if bootstrap() is None:
+        schedule.every(10).minutes.do(bootstrap)
+    schedule.every(RETRAIN_INTERVAL_HOURS).hours.do(scheduled_retrain)
+    while True:
+        schedule.run_pending()
+        time.sleep(30)
+
+@app.get("/api/ml/stream/status")
+def stream_status():
+    """Continuous detection progress and the most recent closed buckets"""
+    return {
+        "success": True,
+        "enabled": STREAM_DETECTION_ENABLED,
+        "stats": stream_detector.snapshot(),
+        "recentBuckets": [
+            {"timestamp": ts, "features": dict(zip(detector.feature_names, values))}
+            for ts, values in list(stream_detector.history)[-12:]
+        ],
+        "currentTime": get_ist_time().isoformat()
+    }
+
+@app.on_event("startup")
+def start_stream_detection():
+    if STREAM_DETECTION_ENABLED:
+        stream_detector.start()
+
+@app.on_event("startup")
+def start_retrain_schedule():
+    if RETRAIN_INTERVAL_HOURS > 0:
+        threading.Thread(target=run_retrain_schedule, name="retrain-schedule", daemon=True).start()
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv('PORT', 8001))
@@ -0,0 +1,256 @@
+"""
+Continuous anomaly detection over live ingest.
+
+log-collector publishes every persisted log to the `logs:stream` Redis
+Stream. A worker thread here reads it through the `ml-analyzer` consumer
+group, folds new entries into per-bucket accumulators and, once a 5-minute
+bucket has closed (plus a grace period for stragglers), scores it exactly
+once against the loaded model and stores any anomaly. Per-bucket cost is
+constant and alerts land within about a minute of the window ending, instead
+of whenever someone opens the dashboard.
+
+After each batch is folded, the open buckets it touched are checkpointed to
+Redis (one hash per bucket) in the same transaction that acknowledges the
+batch. Only the batch being processed is ever pending, and a restarted worker
+reloads the open buckets from their checkpoints rather than relying on the
+pending entries still being in the (trimmed) stream.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+from logviz_common.events import StreamConsumer
+from logviz_common.sketches import HyperLogLog
+
+logger = logging.getLogger(__name__)
+
+CONSUMER_GROUP = "ml-analyzer"
+# First bucket not yet scored, so a restarted worker resumes where it stopped
+NEXT_BUCKET_KEY = "ml:stream:next_bucket"
+# Checkpointed accumulator of each open bucket: sums hash, plus distinct sets unless approximate
+OPEN_BUCKETS_KEY = "ml:stream:open_buckets"
+BUCKET_STATE_KEY = "ml:stream:bucket:{}"
+BUCKET_SECONDS = 300
+
+
+class StreamingDetector:
+    """Consumes the log stream and scores buckets as they close"""
+
+    def __init__(self, redis_client, detector, anomalies_collection, accumulator_factory,
+                 grace_seconds=30, min_confidence=0.5, history_size=288,
+                 read_count=1000, block_ms=1000, claim_idle_ms=60000):
+        self.redis = redis_client
+        self.detector = detector
+        self.anomalies_collection = anomalies_collection
+        self.accumulator_factory = accumulator_factory
+        self.grace_seconds = grace_seconds
+        self.min_confidence = min_confidence
+        self.read_count = read_count
+        self.block_ms = block_ms
+
+        self.consumer = StreamConsumer(
+            redis_client, CONSUMER_GROUP, count=read_count, block_ms=block_ms, claim_idle_ms=claim_idle_ms
+        )
+        self.accumulator = accumulator_factory()
+        # Set when memory may be ahead of the checkpoint; cleared by reloading it
+        self._restore_needed = True
+        # Feature vectors of recently closed buckets: (bucket key, features)
+        self.history = deque(maxlen=history_size)
+        self.next_bucket = None
+        self._thread = None
+        self._stop = threading.Event()
+
+        self.stats = {
+            "consumed": 0,
+            "lateDropped": 0,
+            "bucketsScored": 0,
+            "anomaliesFound": 0,
+            "lastScoredBucket": None,
+            "lastEventAt": None,
+            "restoredBuckets": 0,
+            "errors": 0,
+        }
+
+    # ---------- lifecycle ----------
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="stream-detector", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def snapshot(self):
+        return {
+            **self.stats,
+            "openBuckets": len(self.accumulator.open_buckets()),
+            "closedBuckets": len(self.history),
+            "group": CONSUMER_GROUP,
+            "consumer": self.consumer.consumer,
+            "stream": self.consumer.stats,
+            "modelVersion": self.detector.version,
+        }
+
+    # ---------- worker ----------
+
+    def _run(self):
+        self.next_bucket = self._load_next_bucket()
+        while not self._stop.is_set():
+            try:
+                self.consumer.ensure_group()
+                break
+            except Exception as e:
+                logger.error(f"Stream detector cannot reach Redis: {e}")
+                self._stop.wait(5)
+
+        while not self._stop.is_set():
+            try:
+                if self._restore_needed:
+                    self.restore()
+                entries = self.consumer.read()
+                if entries:
+                    self._consume(entries)
+                self.close_ready_buckets()
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"Stream detector error: {e}")
+                self._stop.wait(1)
+
+    def _load_next_bucket(self):
+        """Resume after the last scored bucket, or start with the current one"""
+        current = self._current_bucket()
+        try:
+            stored = self.redis.get(NEXT_BUCKET_KEY)
+        except Exception:
+            stored = None
+        if stored is None:
+            return current
+        # Don't re-score buckets from a long outage that nobody has replayed
+        return max(int(stored), current - 1)
+
+    def restore(self):
+        """Reload the open buckets from their checkpoints and re-read anything unacknowledged"""
+        accumulator = self.accumulator_factory()
+        stale = []
+        for bucket in sorted(int(b) for b in self.redis.smembers(OPEN_BUCKETS_KEY)):
+            if bucket < self.next_bucket:
+                stale.append(bucket)
+                continue
+            key = BUCKET_STATE_KEY.format(bucket)
+            state = self.redis.hgetall(key)
+            sums = {column: float(state.get(column, 0)) for column in accumulator.SUM_COLUMNS}
+            if accumulator.approximate:
+                services, users = (_decode_sketch(state.get(name)) for name in ("services", "users"))
+            else:
+                services, users = self.redis.smembers(f"{key}:services"), self.redis.smembers(f"{key}:users")
+            accumulator.restore_bucket(bucket, sums, services, users)
+        if stale:
+            self._forget(stale)
+        self.accumulator = accumulator
+        self.consumer.replay_pending()
+        self._restore_needed = False
+        self.stats["restoredBuckets"] += len(accumulator.open_buckets())
+
+    def _consume(self, entries):
+        logs = [log for _, log in entries]
+        self.stats["consumed"] += len(logs)
+        self.stats["lastEventAt"] = time.time()
+        batch = self.accumulator_factory()
+        self.stats["lateDropped"] += batch.add(logs, min_bucket=self.next_bucket)
+        self.accumulator.merge(batch)
+        try:
+            self._checkpoint(batch, [entry_id for entry_id, _ in entries])
+        except Exception:
+            # Neither saved nor acknowledged: go back to the checkpoint and read the batch again
+            self._restore_needed = True
+            raise
+
+    def _checkpoint(self, batch, ids):
+        """Save the buckets `batch` touched and acknowledge it, atomically"""
+        pipe = self.redis.pipeline(transaction=True)
+        for bucket in map(int, batch.open_buckets()):
+            key = BUCKET_STATE_KEY.format(bucket)
+            sums, services, users = self.accumulator.bucket_state(bucket)
+            if self.accumulator.approximate:
+                sums = {**sums, "services": _encode_sketch(services), "users": _encode_sketch(users)}
+            else:
+                # Sets only grow, so adding the batch's members is enough
+                _, new_services, new_users = batch.bucket_state(bucket)
+                if new_services:
+                    pipe.sadd(f"{key}:services", *new_services)
+                if new_users:
+                    pipe.sadd(f"{key}:users", *new_users)
+            pipe.hset(key, mapping=sums)
+            pipe.sadd(OPEN_BUCKETS_KEY, bucket)
+        if ids:
+            pipe.xack(self.consumer.stream, self.consumer.group, *ids)
+        pipe.execute()
+        self.consumer.stats["acked"] += len(ids)
+
+    def _current_bucket(self):
+        return int(time.time() // BUCKET_SECONDS)
+
+    def close_ready_buckets(self):
+        """Score every bucket whose window (plus grace) has fully passed"""
+        closable = int((time.time() - self.grace_seconds) // BUCKET_SECONDS)
+        if closable <= self.next_bucket:
+            return
+        closed = [int(bucket) for bucket in self.accumulator.open_buckets() if bucket < closable]
+        self.next_bucket = closable
+        self._score_closed(closable)
+        try:
+            self._forget(closed)
+        except Exception as e:
+            # Reloaded after a restart only if the next bucket wasn't saved either
+            logger.error(f"Failed to clear closed bucket checkpoints: {e}")
+
+    def _score_closed(self, closable):
+        features, timestamps = self.accumulator.pop_closed(closable, self.detector.feature_names)
+        for i, bucket_time in enumerate(timestamps):
+            self.history.append((bucket_time, features[i].tolist()))
+        if not timestamps:
+            return
+
+        self.stats["bucketsScored"] += len(timestamps)
+        self.stats["lastScoredBucket"] = timestamps[-1]
+        if self.detector.model is None:
+            return
+
+        anomalies = self.detector.detect(features, timestamps, features.tolist())
+        for anomaly in anomalies:
+            if anomaly.get("confidence", 0) < self.min_confidence:
+                continue
+            anomaly["source"] = "stream"
+            try:
+                self.anomalies_collection.insert_one(anomaly)
+                self.stats["anomaliesFound"] += 1
+                logger.info(f"Streaming anomaly at {anomaly['timestamp']}: {anomaly['message']}")
+            except Exception as e:
+                logger.error(f"Failed to save anomaly: {e}")
+
+    def _forget(self, buckets):
+        """Drop the checkpoints of closed buckets and record where scoring resumes"""
+        pipe = self.redis.pipeline(transaction=True)
+        for bucket in buckets:
+            key = BUCKET_STATE_KEY.format(bucket)
+            pipe.delete(key, f"{key}:services", f"{key}:users")
+        if buckets:
+            pipe.srem(OPEN_BUCKETS_KEY, *buckets)
+        pipe.set(NEXT_BUCKET_KEY, self.next_bucket)
+        pipe.execute()
+
+
+def _encode_sketch(sketch):
+    return f"{sketch.p}:{sketch.registers.tobytes().hex()}"
+
+
+def _decode_sketch(text):
+    p, registers = text.split(":")
+    return HyperLogLog.from_doc({"p": int(p), "registers": bytes.fromhex(registers)})
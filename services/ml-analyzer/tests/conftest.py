@@ -0,0 +1,22 @@
+import os
+import sys
+
+import fakeredis
+import mongomock
+import pytest
+
+from logviz_common import connections
+
+# Modules are imported the way the service runs them: from the service directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def ml():
+    """detector.py on mongomock and fakeredis; its background workers are never started"""
+    patch = pytest.MonkeyPatch()
+    patch.setattr(connections, "mongo_client", lambda *args, **kwargs: mongomock.MongoClient())
+    patch.setattr(connections, "redis_client", lambda *args, **kwargs: fakeredis.FakeRedis(decode_responses=True))
+    import detector
+    yield detector
+    patch.undo()
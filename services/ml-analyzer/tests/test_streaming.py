@@ -0,0 +1,105 @@
+import json
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import fakeredis
+import mongomock
+import pytest
+
+from logviz_common.events import LOGS_STREAM_KEY
+from streaming import BUCKET_SECONDS, CONSUMER_GROUP, NEXT_BUCKET_KEY, OPEN_BUCKETS_KEY, StreamingDetector
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def streaming(ml, redis, approximate=False, **kwargs):
+    detector = SimpleNamespace(feature_names=ml.detector.feature_names, model=None, version=None)
+    stream = StreamingDetector(redis, detector, mongomock.MongoClient().db.anomalies,
+                               lambda: ml.FeatureAccumulator(approximate), block_ms=None, **kwargs)
+    stream.consumer.consumer = "worker-1"
+    stream.consumer.ensure_group("0")
+    stream.next_bucket = stream._current_bucket()
+    stream.restore()
+    return stream
+
+
+def publish(redis, count, level="info", user=None):
+    at = datetime.now(timezone.utc).isoformat()
+    for i in range(count):
+        log = {"timestamp": at, "level": level, "service": f"svc{i % 3}", "userId": user or f"u{i}"}
+        redis.xadd(LOGS_STREAM_KEY, {"data": json.dumps(log)})
+
+
+def consume(stream):
+    stream._consume(stream.consumer.read())
+
+
+def pending(redis):
+    return redis.xpending(LOGS_STREAM_KEY, CONSUMER_GROUP)["pending"]
+
+
+def features(stream):
+    return stream.accumulator.features(stream.detector.feature_names)[0].tolist()
+
+
+def test_each_batch_is_acknowledged_once_checkpointed(ml, redis):
+    stream = streaming(ml, redis)
+    publish(redis, 5)
+
+    consume(stream)
+
+    assert pending(redis) == 0
+    assert redis.smembers(OPEN_BUCKETS_KEY) == {str(stream.next_bucket)}
+
+
+@pytest.mark.parametrize("approximate", [False, True])
+def test_restart_resumes_the_open_bucket_from_its_checkpoint(ml, redis, approximate):
+    stream = streaming(ml, redis, approximate)
+    publish(redis, 6, level="error")
+    consume(stream)
+    publish(redis, 4, user="u0")
+    consume(stream)
+    before = features(stream)
+    redis.xtrim(LOGS_STREAM_KEY, maxlen=0)
+
+    restarted = streaming(ml, redis, approximate)
+
+    assert features(restarted) == before
+    assert before[0][:2] == [10, 6] and before[0][5:7] == [3, 6]
+
+
+def test_failed_checkpoint_leaves_the_batch_pending_and_rereads_it(ml, redis, monkeypatch):
+    stream = streaming(ml, redis)
+    publish(redis, 3)
+    consume(stream)
+    publish(redis, 2)
+    monkeypatch.setattr(stream, "_checkpoint", lambda batch, ids: (_ for _ in ()).throw(ConnectionError("down")))
+
+    with pytest.raises(ConnectionError):
+        consume(stream)
+    monkeypatch.undo()
+
+    assert pending(redis) == 2 and stream._restore_needed
+    stream.restore()
+    consume(stream)
+    assert features(stream)[0][0] == 5 and pending(redis) == 0
+
+
+def test_closed_buckets_are_scored_once_and_their_checkpoints_dropped(ml, redis, monkeypatch):
+    stream = streaming(ml, redis)
+    publish(redis, 4)
+    consume(stream)
+    bucket = stream.next_bucket
+    later = (bucket + 1) * BUCKET_SECONDS + stream.grace_seconds + 1
+    monkeypatch.setattr(time, "time", lambda: later)
+
+    stream.close_ready_buckets()
+    stream.close_ready_buckets()
+
+    assert stream.stats["bucketsScored"] == 1 and stream.accumulator.open_buckets() == []
+    assert redis.smembers(OPEN_BUCKETS_KEY) == set() and redis.keys("ml:stream:bucket:*") == []
+    assert int(redis.get(NEXT_BUCKET_KEY)) == bucket + 1
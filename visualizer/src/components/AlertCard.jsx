@@ -22,6 +22,9 @@ function AlertCard({ alert, onDelete }) {
               <Badge bg={getBadgeVariant(alert.severity)} className="ms-2">
                 {alert.severity}
               </Badge>
+              {alert.live?.firing && (
+                <Badge bg="danger" className="ms-2">firing</Badge>
+              )}
             </div>
             <Card.Text className="text-muted mb-2">
               {alert.description}
@@ -27,6 +27,26 @@ const formatToIST = (timestamp) => {
   }
 };
 
+// Fold a frame's counters into the summary until the next periodic refresh
+const applyFrameCounts = (stats, counts) => {
+  if (!stats || !counts?.total) return stats;
+  const add = (base = {}, delta = {}) => {
+    const merged = { ...base };
+    Object.entries(delta).forEach(([key, value]) => { merged[key] = (merged[key] || 0) + value; });
+    return merged;
+  };
+  const byLevel = add(stats.byLevel, counts.byLevel);
+  const totalLogs = (stats.totalLogs || 0) + counts.total;
+  const errors = (byLevel.error || 0) + (byLevel.fatal || 0);
+  return {
+    ...stats,
+    totalLogs,
+    byLevel,
+    byService: add(stats.byService, counts.byService),
+    errorRate: totalLogs ? (errors / totalLogs) * 100 : 0,
+  };
+};
+
 function Dashboard() {
   const [logs, setLogs] = useState([]);
   const [stats, setStats] = useState(null);
@@ -39,7 +59,12 @@ function Dashboard() {
   const [timeRange, setTimeRange] = useState('24h');
 
   useEffect(() => {
-    const socket = io('http://localhost:3001');
+    // Websocket only: collector workers behind a load balancer don't share polling sessions
+    const socket = io('http://localhost:3001', {
+      transports: ['websocket'],
+      // Alert events are only sent to sockets that authenticate
+      auth: { token: localStorage.getItem('token') }
+    });
     
     socket.on('connect', () => {
       console.log('✅ WebSocket connected');
@@ -51,11 +76,13 @@ function Dashboard() {
       setConnected(false);
     });
     
-    socket.on('new_log', (log) => {
-      console.log('📨 New log received:', log);
-      setLogs(prev => [log, ...prev].slice(0, 100));
-      // Fetch stats after new log (debounced)
-      setTimeout(() => fetchStats(), 1000);
+    // Logs arrive in frames (newest first) with counters for everything ingested since the last one
+    socket.on('log_frame', (frame, ack) => {
+      if (frame.logs.length) {
+        setLogs(prev => [...frame.logs, ...prev].slice(0, 100));
+      }
+      setStats(prev => applyFrameCounts(prev, frame.counts));
+      if (ack) ack();
     });
 
     fetchInitialData();